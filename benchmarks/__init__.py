@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Микро-бенчмарки горячих участков приложения.
+
+Запуск: python -m benchmarks.<имя модуля>
+
+"""
+
+import sys
+from os import path
+
+sys.path.append(path.join(path.dirname(path.dirname(path.abspath(__file__))), "src"))
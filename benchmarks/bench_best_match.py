@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Выбор лучших раздач из результатов поиска, записанных локальной заглушкой трекеров.
+
+old - прежний get_best_match со списком фильтров, каждый из которых
+заново создает список раздач.
+
+Результаты поиска размножаются со случайными сидами, размером и количеством
+файлов, как при выдаче нескольких трекеров.
+
+"""
+
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from media_bot_v2.app_enums import MediaType
+from media_bot_v2.crawler.Workers.TorrentTrackers import Trackers
+from media_bot_v2.crawler.Workers.torrent_match import TorrentMatcher
+
+from tests.tracker_stub import TrackerStub, get_stub_config, get_stub_trackers
+
+QUERY = 'Игра престолов 2011 сезон 1'
+REPEAT = 200
+
+
+def old_best_match(data, job, serial_torrents=8):
+
+    if len(data) == 0:
+        return None
+
+    f_list = [lambda x: not x.kinopoisk_id == '']
+    f_data = filter(lambda x: not x.kinopoisk_id == '', data)
+
+    if len(list(f_data)) > 5 or len(list(f_data)) >= len(data) / 2:
+        if not job.media_id == -1:
+            f_list.append(lambda x: x.kinopoisk_id == job.media_id)
+
+    if job.season == '':
+        f_list.append(lambda x: x.file_amount < 4)
+        f_list.append(lambda x: x.size <= float(15))
+        f_list.append(lambda x: x.size >= float(3.5))
+
+    sound_f = lambda x: 'RUSSIAN' in x.sound
+    if len(list(filter(sound_f, data))) != 0 or len(data) == 1:
+        f_list.append(sound_f)
+
+    f_list.append(lambda x: not x.with_advertising)
+
+    result = data
+    for filter_func in f_list:
+        new_data = list(filter(filter_func, result))
+        result = new_data
+
+    if len(list(result)) == 0:
+        current_year = int(time.asctime().split(' ')[-1])
+        if job.year < current_year - 15:
+            result = data
+        else:
+            return None
+
+    s_data = sorted(list(result), key=lambda x: x.pier, reverse=True)
+    res = list(s_data)
+
+    return res[0:serial_torrents]
+
+
+def record_search():
+    with TrackerStub(delay=0) as stub, tempfile.TemporaryDirectory() as tmp_path:
+        config = get_stub_config(tmp_path, theam_cache_ttl=0)
+        with mock.patch.object(Trackers, 'get_trackers', lambda conf: get_stub_trackers(conf, stub.url)):
+            return Trackers.search(config, QUERY)
+
+
+def get_data(recorded, amount):
+    random.seed(amount)
+    data = []
+    for i in range(amount):
+        torrent = SimpleNamespace(**vars(random.choice(recorded)))
+        torrent.pier = random.randint(0, 5000)
+        torrent.size = round(random.uniform(1, 40), 2)
+        torrent.file_amount = random.choice((1, 1, 2, 10))
+        data.append(torrent)
+    return data
+
+
+def measure(func, data, job):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func(data, job)
+    return 1000000 * (time.perf_counter() - start) / REPEAT, len(result or [])
+
+
+def main():
+    recorded = record_search()
+    jobs = {
+        'serial': SimpleNamespace(media_id=944947, season=1, year=2011, media_type=MediaType.SERIALS),
+        'film': SimpleNamespace(media_id=944947, season='', year=2011, media_type=MediaType.FILMS),
+    }
+    matcher = TorrentMatcher()
+    print('{:>8} {:>10} {:>14} {:>14} {:>8}'.format('job', 'torrents', 'old, us', 'new, us', 'found'))
+    for name, job in jobs.items():
+        for amount in (len(recorded), 500, 5000):
+            data = recorded if amount == len(recorded) else get_data(recorded, amount)
+            old, old_found = measure(old_best_match, data, job)
+            new, new_found = measure(matcher.best_match, data, job)
+            print('{:>8} {:>10} {:>14.1f} {:>14.1f} {:>8}'.format(name, amount, old, new, new_found))
+
+
+if __name__ == '__main__':
+    main()
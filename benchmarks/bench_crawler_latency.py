@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Задержка от получения сообщения краулером до запуска воркера.
+
+Сравнивается прежний цикл с проверкой раз в 10 секунд и цикл,
+пробуждаемый новыми задачами и событиями воркеров.
+
+"""
+
+import multiprocessing
+import pathlib
+import random
+import threading
+import time
+
+from media_bot_v2.app_enums import ActionType, ComponentType, MediaType
+from media_bot_v2.config import read_config
+from media_bot_v2.crawler import Crawler
+from media_bot_v2.crawler.Workers.WorkerABC import Worker
+from media_bot_v2.crawler.Workers.utils import MediaTask
+from media_bot_v2.database import MediaData
+from media_bot_v2.mediator import CrawlerData, crawler_message
+
+CONFIG = pathlib.Path(__file__).parent.parent / 'tests' / 'test_config.json'
+
+
+class StartWorker(Worker):
+    """
+    Воркер, записывающий задержку запуска
+    """
+
+    def __init__(self, job, config, latency: list):
+        super(StartWorker, self).__init__(job, config)
+        self.latency = latency
+
+    def get_target(self):
+        def work():
+            self.latency.append(time.perf_counter() - self.job.received)
+        return work
+
+
+class BenchCrawler(Crawler):
+
+    def __init__(self, config, latency: list):
+        super(BenchCrawler, self).__init__(multiprocessing.Queue(), multiprocessing.Queue(), config, 10)
+        self.latency = latency
+        self.db_handler.get_job_list = self.get_job_list
+
+    @staticmethod
+    def get_job_list(message):
+        media = MediaData(message.data.media_id, 'Игра', 1997, '', None, '', '', None, MediaType.FILMS, None)
+        return [MediaTask(message.action, message.data.client_id, media, message.data, received=message.received)]
+
+    def get_worker(self, job):
+        return StartWorker(job, self.config, self.latency)
+
+
+class PollingCrawler(BenchCrawler):
+    """
+    Прежнее поведение: проход основного потока раз в poll_interval секунд
+    """
+
+    def main_actions(self):
+        while True:
+            time.sleep(self.config.crawler_cfg.poll_interval)
+            self.update_jobs()
+
+    def wake(self, worker=None):
+        pass
+
+
+def measure(crawler_class, messages, duration):
+    config = read_config(CONFIG)
+    latency = []
+    crawler = crawler_class(config, latency)
+    threading.Thread(target=crawler.main_actions, daemon=True).start()
+    rnd = random.Random(1)
+    times = sorted(rnd.uniform(0, duration) for _ in range(messages))
+    start = time.perf_counter()
+    for i, at in enumerate(times):
+        time.sleep(max(0.0, start + at - time.perf_counter()))
+        message = crawler_message(ComponentType.CLIENT, 1, {'media_id': i + 1}, ActionType.FORCE_CHECK)
+        message.received = time.perf_counter()
+        crawler.handle_message(message)
+    deadline = time.perf_counter() + config.crawler_cfg.poll_interval + 1
+    while len(latency) < messages and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    latency.sort()
+    return latency[len(latency) // 2], latency[-1], len(latency)
+
+
+def main(messages=20, duration=20.0):
+    print('{:>10} {:>12} {:>12} {:>8}'.format('loop', 'median, ms', 'max, ms', 'started'))
+    for name, crawler_class in (('polling', PollingCrawler), ('events', BenchCrawler)):
+        median, worst, started = measure(crawler_class, messages, duration)
+        print('{:>10} {:>12.1f} {:>12.1f} {:>8}'.format(name, median * 1e3, worst * 1e3, started))
+
+
+if __name__ == '__main__':
+    main()
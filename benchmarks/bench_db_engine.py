@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Количество проверок прав пользователя (AbstractHandler.check_rule) в секунду.
+
+Сравнивается создание engine и схемы при каждом обращении к DbManager.engine,
+общий для процесса engine с пулом соединений и кэш результатов проверки.
+
+"""
+
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from media_bot_v2.command_handler.commandhandler_class import AbstractHandler
+from media_bot_v2.config import DbConfig
+from media_bot_v2.database import DbManager, dispose_engines
+from media_bot_v2.database.alch_db import init_db
+
+
+class EnginePerCallDbManager(DbManager):
+    """
+    Прежнее поведение: engine, схема и фабрика сессий создаются при каждом обращении
+    """
+
+    @property
+    def engine(self):
+        return init_db(self.config.dns)
+
+    def get_session(self):
+        return sessionmaker(bind=self.engine)()
+
+
+def commands_per_second(db_manager, users, duration=2.0):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        assert AbstractHandler.check_rule(users[count % len(users)], db_manager)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main(users=100):
+    with tempfile.TemporaryDirectory() as tmp_path:
+        config = DbConfig(
+            dns='sqlite:///{}/bench.db'.format(tmp_path), db_name='bench', admin_id='0', auth_cache_ttl=0
+        )
+        db = DbManager(config)
+        session = db.get_session()
+        for client_id in range(1, users + 1):
+            db.add_user(client_id, session=session)
+        session.close()
+
+        client_ids = list(range(1, users + 1))
+        print('{:>16} {:>14}'.format('engine', 'commands/s'))
+        print('{:>16} {:>14.0f}'.format('per call', commands_per_second(EnginePerCallDbManager(config), client_ids)))
+        print('{:>16} {:>14.0f}'.format('shared', commands_per_second(DbManager(config), client_ids)))
+        cached = DbManager(config.model_copy(update={'auth_cache_ttl': 300}))
+        print('{:>16} {:>14.0f}'.format('auth cache', commands_per_second(cached, client_ids)))
+        print('{:>16} {}'.format('', cached.auth_cache.metrics()))
+        dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Стоимость поиска по базе из 100 000 фильмов и сезонов сериалов с индексами и без них.
+
+Большинство записей завершены (status ENDED), как в долго работающей базе.
+
+"""
+
+import random
+import tempfile
+import time
+
+from sqlalchemy import bindparam, inspect, insert, select, text
+
+from media_bot_v2.app_enums import LockingStatus, MediaType, UserOptions
+from media_bot_v2.config import DbConfig
+from media_bot_v2.database import DbManager, dispose_engines
+from media_bot_v2.database.alch_db.model import Base, Film, MediaData, Serial, User, UserOptionsT
+
+
+def seed(db: DbManager, media=100000, users=10000):
+    serials = media // 2
+    with db.engine.begin() as connection:
+        connection.execute(insert(MediaData), [
+            {
+                'id': i,
+                'label': 'Media {}'.format(i),
+                'year': 2000 + i % 25,
+                'status': LockingStatus.ENDED if i % 50 else LockingStatus.IN_PROGRESS,
+                'type': MediaType.SERIALS if i <= serials else MediaType.FILMS,
+                'kinopoisk_id': str(i // 10 if i <= serials else i),
+            }
+            for i in range(1, media + 1)
+        ])
+        connection.execute(insert(Serial.__table__), [
+            {'id': i, 'kinopoisk_id': str(i // 10), 'season': i % 10, 'series': 10, 'current_series': 0}
+            for i in range(1, serials + 1)
+        ])
+        connection.execute(insert(Film.__table__), [{'id': i} for i in range(serials + 1, media + 1)])
+        connection.execute(insert(User), [{'id': i, 'client_id': i} for i in range(1, users + 1)])
+        connection.execute(insert(UserOptionsT), [
+            {'option': UserOptions.NOTIFICATION, 'value': int(i % 100 == 0), 'user_id': i}
+            for i in range(1, users + 1)
+        ])
+
+
+def timed(connection, statement, params, number):
+    start = time.perf_counter()
+    for i in range(number):
+        connection.execute(statement, params(i)).fetchall()
+    return (time.perf_counter() - start) / number
+
+
+def lookups(db: DbManager, media=100000, users=10000, number=300):
+    """
+    Время запросов с условиями отбора DbManager, без затрат на создание ORM объектов
+    """
+    rnd = random.Random(1)
+    serials = [rnd.randint(10, media // 2) for _ in range(number)]
+    queries = {
+        'find serial': (
+            select(Serial.id).where(Serial.kinopoisk_id == bindparam('kinopoisk_id'), Serial.season == bindparam('season')),
+            lambda i: {'kinopoisk_id': str(serials[i] // 10), 'season': serials[i] % 10},
+        ),
+        'find film': (
+            select(Film.id).where(Film.kinopoisk_id == bindparam('kinopoisk_id')),
+            lambda i: {'kinopoisk_id': str(media // 2 + 1 + serials[i])},
+        ),
+        'find user': (
+            select(User.id).where(User.client_id == bindparam('client_id')),
+            lambda i: {'client_id': serials[i] % users + 1},
+        ),
+        'not ended media': (
+            select(MediaData.id).where(MediaData.status != LockingStatus.ENDED),
+            lambda i: {},
+        ),
+        'notification': (
+            select(UserOptionsT.user_id).where(
+                UserOptionsT.option == UserOptions.NOTIFICATION, UserOptionsT.value == 1
+            ),
+            lambda i: {},
+        ),
+    }
+    with db.engine.connect() as connection:
+        return {name: timed(connection, statement, params, number) for name, (statement, params) in queries.items()}
+
+
+def drop_indexes(db: DbManager):
+    insp = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in insp.get_indexes(table.name):
+                connection.execute(text('DROP INDEX {}'.format(index['name'])))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_path:
+        db = DbManager(DbConfig(dns='sqlite:///{}/bench.db'.format(tmp_path), db_name='bench', admin_id='0'))
+        seed(db)
+        indexed = lookups(db)
+        drop_indexes(db)
+        plain = lookups(db)
+        dispose_engines()
+
+    print('{:>16} {:>14} {:>14}'.format('lookup', 'no index, ms', 'index, ms'))
+    for name in indexed:
+        print('{:>16} {:>14.3f} {:>14.3f}'.format(name, plain[name] * 1e3, indexed[name] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Чтение всех данных для плановой проверки (DbManager.find_all_media).
+
+Сравнивается прежний путь через ORM объекты Film/Serial и построчное
+чтение выбранных колонок в MediaData со слотами.
+
+"""
+
+import pickle
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from media_bot_v2.app_enums import LockingStatus, MediaType
+from media_bot_v2.config import DbConfig
+from media_bot_v2.database import DbManager, dispose_engines
+from media_bot_v2.database.alch_db.model import Film, MediaData, Serial
+
+
+def seed(db: DbManager, media):
+    serials = media // 2
+    with db.engine.begin() as connection:
+        connection.execute(insert(MediaData), [
+            {
+                'id': i,
+                'label': 'Media {}'.format(i),
+                'year': 2000 + i % 25,
+                'status': LockingStatus.IN_PROGRESS,
+                'type': MediaType.SERIALS if i <= serials else MediaType.FILMS,
+                'kinopoisk_id': str(i),
+                'kinopoisk_url': 'https://www.kinopoisk.ru/film/{}/'.format(i),
+                'download_url': 'https://d.rutor.info/download/{}'.format(i),
+                'theam_id': 'https://rutor.info/torrent/{}'.format(i),
+            }
+            for i in range(1, media + 1)
+        ])
+        connection.execute(insert(Serial.__table__), [
+            {'id': i, 'kinopoisk_id': str(i), 'season': 1, 'series': 10, 'current_series': 0}
+            for i in range(1, serials + 1)
+        ])
+        connection.execute(insert(Film.__table__), [{'id': i} for i in range(serials + 1, media + 1)])
+
+
+def orm_media(db: DbManager, media_type):
+    session = db.get_session()
+    result = [db.construct_media_by_orm_object(elem) for elem in db._find_all_media(media_type, session)]
+    session.close()
+    return result
+
+
+def row_media(db: DbManager, media_type):
+    session = db.get_session()
+    result = db.find_all_media(media_type, session)
+    session.close()
+    return result
+
+
+def measure(func, db, media_type):
+    start = time.perf_counter()
+    result = func(db, media_type)
+    duration = time.perf_counter() - start
+    # Память измеряется отдельным запуском, tracemalloc сильно замедляет выполнение
+    tracemalloc.start()
+    func(db, media_type)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak, len(pickle.dumps(result)), len(result)
+
+
+def main(media=20000):
+    with tempfile.TemporaryDirectory() as tmp_path:
+        db = DbManager(DbConfig(dns='sqlite:///{}/bench.db'.format(tmp_path), db_name='bench', admin_id='0'))
+        seed(db, media)
+        print('{:>12} {:>6} {:>8} {:>10} {:>14} {:>12}'.format('media', 'path', 'rows', 'time, s', 'peak mem, MB', 'pickle, KB'))
+        for media_type in (MediaType.FILMS, MediaType.SERIALS, MediaType.BASE_MEDIA):
+            for name, func in (('orm', orm_media), ('rows', row_media)):
+                duration, peak, pickled, rows = measure(func, db, media_type)
+                print('{:>12} {:>6} {:>8} {:>10.3f} {:>14.1f} {:>12.0f}'.format(
+                    media_type.name, name, rows, duration, peak / 2 ** 20, pickled / 1024
+                ))
+        dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
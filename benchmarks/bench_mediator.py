@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Стоимость маршрутизации одного сообщения в AppMediator в зависимости от числа клиентов.
+
+Сравнивается прежний линейный перебор клиентов с таблицей маршрутизации.
+
+Пропускная способность очереди медиатора при рассылке с пакетной отправкой и без нее.
+
+"""
+
+import time
+import timeit
+from itertools import cycle
+from multiprocessing import Process, Queue
+
+from media_bot_v2.app_enums import ActionType, ComponentType
+from media_bot_v2.mediator import (
+    AppMediator, ClientData, MediatorActionMessage, MessageBatcher, send_message, unpack_messages
+)
+
+
+class NullQueue:
+
+    def put(self, item):
+        pass
+
+
+class FakeClient:
+    CLIENT_TYPE = None
+    CLIENT_ACTIONS = list()
+
+    def __init__(self, client_type, actions):
+        self.CLIENT_TYPE = client_type
+        self.CLIENT_ACTIONS = actions
+        self.queue = NullQueue()
+
+
+def get_clients(amount):
+    actions = list(ActionType)
+    types = cycle(t for t in ComponentType if t != ComponentType.CLIENT)
+    clients = [FakeClient(ComponentType.CLIENT, [ActionType.SEND_MESSAGE])]
+    for i in range(amount - 1):
+        clients.append(FakeClient(next(types), actions[i % len(actions):][:3]))
+    return clients
+
+
+def linear_send_message(clients, message):
+    for client in clients:
+        if not (client.CLIENT_TYPE.value == message.component.value
+                and message.action.value in [a.value for a in client.CLIENT_ACTIONS]):
+            continue
+        client.queue.put(message)
+
+
+def consume(queue: Queue, amount: int, done: Queue):
+    received = 0
+    while received < amount:
+        received += len(unpack_messages(queue.get()))
+    done.put(received)
+
+
+def broadcast(amount: int, batch_window: float):
+    queue = Queue()
+    done = Queue()
+    consumer = Process(target=consume, args=(queue, amount, done))
+    consumer.start()
+    batcher = MessageBatcher(queue, batch_window, 100) if batch_window > 0 else None
+
+    start = time.perf_counter()
+    for user_id in range(amount):
+        message = send_message(
+            ComponentType.COMMAND_HANDLER,
+            {'user_id': user_id, 'message_text': 'Новая серия будет скачана', 'choices': []}
+        )
+        if batcher is None:
+            queue.put(message)
+        else:
+            batcher.put(message)
+    done.get()
+    elapsed = time.perf_counter() - start
+    consumer.join()
+    return amount / elapsed
+
+
+def main(number=20000):
+    message = MediatorActionMessage(ComponentType.CLIENT, ActionType.SEND_MESSAGE, ComponentType.CRAWLER)
+    message.data = ClientData(1, 'bench', [])
+
+    print('{:>8} {:>16} {:>16}'.format('users', 'single, msg/s', 'batched, msg/s'))
+    for amount in (1000, 10000):
+        print('{:>8} {:>16.0f} {:>16.0f}'.format(amount, broadcast(amount, 0), broadcast(amount, 0.01)))
+
+    print('{:>8} {:>14} {:>14}'.format('clients', 'linear, us', 'indexed, us'))
+    for amount in (4, 16, 64, 256):
+        clients = get_clients(amount)
+        mediator = AppMediator(None, clients)
+        linear = timeit.timeit(lambda: linear_send_message(clients, message), number=number)
+        indexed = timeit.timeit(lambda: mediator.send_message(message), number=number)
+        print('{:>8} {:>14.3f} {:>14.3f}'.format(amount, linear / number * 1e6, indexed / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
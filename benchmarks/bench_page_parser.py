@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Время разбора сохраненных страниц трекеров из fixtures.
+
+bs4 - прежний разбор деревом BeautifulSoup, lxml - скомпилированные XPath page_parser.
+Страница темы разбирается для раздачи с разрешением в названии.
+
+"""
+
+import pathlib
+import tempfile
+import time
+
+from media_bot_v2.crawler.Workers.TorrentTrackers.Trackers import Rutor, Rutracker
+
+from tests.tracker_stub import get_stub_config
+
+FIXTURES = pathlib.Path(__file__).parent.parent / 'tests' / 'fixtures'
+REPEAT = 50
+
+
+class PageRutor(Rutor):
+
+    def __init__(self, config, page_text):
+        super(PageRutor, self).__init__(config)
+        self.page = type('Page', (), {'text': page_text})
+
+    @property
+    def connection(self):
+        return self
+
+    def get(self, url, **kwargs):
+        return self.page
+
+    def create_torrents(self, tor_dicts):
+        return tor_dicts
+
+
+class PageRutracker(Rutracker):
+
+    def __init__(self, config, page_text):
+        super(PageRutracker, self).__init__(config)
+        self.page_text = page_text
+        self._film_forums = '7'
+        self._serial_forums = '189'
+
+    def login(self):
+        return True
+
+    def get_search_page(self, search_url, params):
+        return type('Page', (), {'content': self.page_text.encode('utf-8'), 'encoding': 'utf-8'})
+
+    def create_torrents(self, tor_dicts):
+        return tor_dicts
+
+
+def measure(func):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func()
+    return 1000 * (time.perf_counter() - start) / REPEAT, result
+
+
+def main():
+    pages = {
+        'rutor': (
+            PageRutor,
+            (FIXTURES / 'rutor_search.html').read_text('utf-8'),
+            (FIXTURES / 'rutor_theam.html').read_text('utf-8'),
+        ),
+        'rutracker': (
+            PageRutracker,
+            (FIXTURES / 'rutracker_search.html').read_bytes().decode('windows-1251'),
+            (FIXTURES / 'rutracker_theam.html').read_bytes().decode('windows-1251'),
+        ),
+    }
+    tor_dict = {'label': 'Игра престолов 1080p'}
+    print('{:>10} {:>8} {:>6} {:>14} {:>14}'.format('tracker', 'parser', 'rows', 'search, ms', 'theam, ms'))
+    with tempfile.TemporaryDirectory() as tmp_path:
+        for name, (tracker_class, search_page, theam_page) in pages.items():
+            for html_parser in ('bs4', 'lxml'):
+                tracker = tracker_class(get_stub_config(tmp_path, html_parser=html_parser), search_page)
+                search_time, rows = measure(lambda: tracker.search('Игра престолов 2011 сезон 1'))
+                theam_time, _ = measure(lambda: tracker.parse_theam_page(theam_page, tor_dict))
+                print('{:>10} {:>8} {:>6} {:>14.2f} {:>14.2f}'.format(
+                    name, html_parser, len(rows), search_time, theam_time
+                ))
+
+
+if __name__ == '__main__':
+    main()
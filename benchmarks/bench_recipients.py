@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Определение получателей рассылки на 10 000 пользователей.
+
+Сравниваются прежние запросы по одному пользователю и через ORM связи
+с выборкой client_id одним SQL запросом.
+
+"""
+
+import tempfile
+import time
+
+from sqlalchemy import event, insert
+
+from media_bot_v2.app_enums import LockingStatus, MediaType, UserOptions
+from media_bot_v2.command_handler.commandhandler_class import SendMessageHandler
+from media_bot_v2.config import DbConfig
+from media_bot_v2.database import DbManager, dispose_engines
+from media_bot_v2.database.alch_db.model import MediaData, Serial, User, UserOptionsT, table_media_user_add
+
+
+def seed(db: DbManager, users):
+    with db.engine.begin() as connection:
+        connection.execute(insert(User), [{'id': i, 'client_id': i} for i in range(1, users + 1)])
+        connection.execute(insert(UserOptionsT), [
+            {'option': UserOptions.NOTIFICATION, 'value': int(i % 2 == 0), 'user_id': i}
+            for i in range(1, users + 1)
+        ])
+        connection.execute(insert(MediaData), [{
+            'id': 1, 'label': 'Serial', 'year': 2011, 'status': LockingStatus.IN_PROGRESS,
+            'type': MediaType.SERIALS, 'kinopoisk_id': '1',
+        }])
+        connection.execute(insert(Serial.__table__), [{'id': 1, 'kinopoisk_id': '1', 'season': 1}])
+        connection.execute(insert(table_media_user_add), [
+            {'user_id': i, 'media_id': 1} for i in range(1, users + 1, 3)
+        ])
+
+
+def old_recipients(db: DbManager, client_ids):
+    # Прежняя реализация SendMessageHandler.get_recipients
+    result = []
+    for client_id in set(client_ids):
+        if db.find_user(client_id) is not None:
+            result.append(client_id)
+    return result
+
+
+def old_audience(db: DbManager):
+    # Прежняя реализация send_message_by_media
+    users = db.get_users_for_notification(1, MediaType.SERIALS, season=1)
+    return set(i.client_id for i in users)
+
+
+def measure(db: DbManager, func):
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    start = time.perf_counter()
+    result = func()
+    duration = time.perf_counter() - start
+    event.remove(db.engine, 'before_cursor_execute', count)
+    db.close_session()
+    return duration, len(statements), len(result)
+
+
+def main(users=10000):
+    with tempfile.TemporaryDirectory() as tmp_path:
+        db = DbManager(DbConfig(dns='sqlite:///{}/bench.db'.format(tmp_path), db_name='bench', admin_id='0'))
+        seed(db, users)
+        client_ids = list(range(1, users + 1))
+        cases = (
+            ('client ids', 'old', lambda: old_recipients(db, client_ids)),
+            ('client ids', 'new', lambda: SendMessageHandler.get_recipients(client_ids, db)),
+            ('media audience', 'old', lambda: old_audience(db)),
+            ('media audience', 'new', lambda: db.get_notification_client_ids(1, MediaType.SERIALS, 1)),
+        )
+        print('{:>16} {:>6} {:>10} {:>12} {:>12}'.format('recipients', 'path', 'time, s', 'statements', 'users'))
+        for name, path, func in cases:
+            print('{:>16} {:>6} {:>10.3f} {:>12} {:>12}'.format(name, path, *measure(db, func)))
+        dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
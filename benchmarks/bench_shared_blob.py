@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Стоимость пересылки сообщения с torrent файлом через очереди медиатора.
+
+Сравнивается передача содержимого файла в сообщении и передача ссылки на разделяемую память.
+
+"""
+
+import pickle
+import timeit
+
+from media_bot_v2.app_enums import ActionType, ComponentType
+from media_bot_v2.mediator import crawler_message, share_blob, release_blob
+
+
+def get_message(torrent_data):
+    return crawler_message(
+        ComponentType.CRAWLER,
+        1,
+        {'torrent_id': '1', 'torrent_data': torrent_data},
+        ActionType.ADD_TORRENT_TO_TORRENT_CLIENT
+    )
+
+
+def main(number=200):
+    print('{:>10} {:>12} {:>14} {:>12} {:>14}'.format(
+        'size, KB', 'inline, B', 'inline, us', 'shared, B', 'shared, us'))
+    for size in (64 * 1024, 1024 * 1024, 8 * 1024 * 1024):
+        data = b'\0' * size
+        blob = share_blob(data)
+        inline = get_message(data)
+        shared = get_message(blob)
+        # Сообщение сериализуется дважды: в очередь медиатора и в очередь краулера
+        inline_time = timeit.timeit(lambda: pickle.loads(pickle.dumps(inline)), number=number) * 2
+        shared_time = timeit.timeit(lambda: pickle.loads(pickle.dumps(shared)), number=number) * 2
+        print('{:>10} {:>12} {:>14.1f} {:>12} {:>14.1f}'.format(
+            size // 1024,
+            len(pickle.dumps(inline)),
+            inline_time / number * 1e6,
+            len(pickle.dumps(shared)),
+            shared_time / number * 1e6,
+        ))
+        release_blob(blob)
+
+
+if __name__ == '__main__':
+    main()
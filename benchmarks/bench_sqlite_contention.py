@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Одновременная работа процессов с одной базой SQLite.
+
+Процесс обработчика команд обновляет медиа, процессы парсера и краулера
+читают данные. Сравнивается журнал по умолчанию и профиль WAL
+с соединениями только для чтения у читающих процессов.
+
+"""
+
+import multiprocessing
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from media_bot_v2.app_enums import LockingStatus, MediaType
+from media_bot_v2.config import DbConfig
+from media_bot_v2.database import DbManager, dispose_engines
+from media_bot_v2.database.alch_db.model import Film, MediaData
+
+
+def seed(db: DbManager, media):
+    with db.engine.begin() as connection:
+        connection.execute(insert(MediaData), [
+            {
+                'id': i, 'label': 'Media {}'.format(i), 'year': 2000, 'status': LockingStatus.IN_PROGRESS,
+                'type': MediaType.FILMS, 'kinopoisk_id': str(i),
+            }
+            for i in range(1, media + 1)
+        ])
+        connection.execute(insert(Film.__table__), [{'id': i} for i in range(1, media + 1)])
+
+
+def writer(config, media, duration, result):
+    db = DbManager(config)
+    done, errors, latency = 0, 0, []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        session = db.get_session()
+        start = time.perf_counter()
+        try:
+            db.update_media_params(str(done % media + 1), {'torrent_id': str(done)}, MediaType.FILMS, session=session)
+            done += 1
+        except OperationalError:
+            errors += 1
+        finally:
+            session.close()
+        latency.append(time.perf_counter() - start)
+    result.put(('write', done, errors, latency))
+
+
+def reader(config, read_only, media, duration, result):
+    db = DbManager(config, read_only=read_only)
+    done, errors = 0, 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        session = db.get_session()
+        try:
+            db.find_all_media(MediaType.FILMS, session)
+            db.find_media(str(done % media + 1), MediaType.FILMS, session=session)
+            done += 1
+        except OperationalError:
+            errors += 1
+        finally:
+            session.close()
+    result.put(('read', done, errors, []))
+
+
+def run(config, read_only, readers=3, media=500, duration=3.0):
+    result = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=writer, args=(config, media, duration, result))]
+    processes += [
+        multiprocessing.Process(target=reader, args=(config, read_only, media, duration, result))
+        for _ in range(readers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {'write': [0, 0], 'read': [0, 0]}
+    latency = []
+    for _ in processes:
+        kind, done, errors, times = result.get(timeout=duration + 60)
+        totals[kind][0] += done
+        totals[kind][1] += errors
+        latency += times
+    for process in processes:
+        process.join()
+    latency.sort()
+    return totals, latency[len(latency) // 2], latency[-1]
+
+
+def main(media=500):
+    profiles = (
+        # Журнал по умолчанию, ожидание блокировки 5 с как у sqlite3.connect
+        ('default', {'sqlite_wal': False, 'sqlite_mmap_size': 0}, False),
+        ('wal', {}, True),
+    )
+    print('{:>10} {:>8} {:>9} {:>13} {:>13} {:>8} {:>9}'.format(
+        'profile', 'writes', 'w errors', 'w median, ms', 'w max, ms', 'reads', 'r errors'
+    ))
+    for name, options, read_only in profiles:
+        with tempfile.TemporaryDirectory() as tmp_path:
+            config = DbConfig(
+                dns='sqlite:///{}/bench.db'.format(tmp_path), db_name='bench', admin_id='0', **options
+            )
+            seed(DbManager(config), media)
+            dispose_engines()
+            totals, median, worst = run(config, read_only, media=media)
+            print('{:>10} {:>8} {:>9} {:>13.1f} {:>13.1f} {:>8} {:>9}'.format(
+                name, *totals['write'], median * 1e3, worst * 1e3, *totals['read']
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Добавление раздач в qBittorrent через локальную заглушку Web API.
+
+per job - подключение и авторизация для каждой задачи, как раньше.
+pool - общие подключения, повторная авторизация только после истечения сессии,
+сессии сбрасываются заглушкой один раз в середине прогона.
+
+"""
+
+import io
+import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from media_bot_v2.config import read_config
+from media_bot_v2.crawler.Workers.TorrentClientWorker import QBitTorrent
+from media_bot_v2.crawler.Workers.client_pool import ClientPool
+
+from tests.qbit_stub import QBitStub, get_stub_client_config
+
+CONFIG = pathlib.Path(__file__).parent.parent / 'tests' / 'test_config.json'
+JOBS = 200
+WORKERS = 4
+
+
+def add_torrent(client):
+    client.download_from_file(io.BytesIO(b'd4:infod4:name4:testee'), savepath='/tmp/')
+
+
+def per_job(config):
+    add_torrent(QBitTorrent.connect(config))
+
+
+def run(stub, target, expire_at=None):
+    requests, logins = stub.requests, stub.logins
+    start = time.perf_counter()
+    with ThreadPoolExecutor(WORKERS) as executor:
+        futures = []
+        for i in range(JOBS):
+            if i == expire_at:
+                for future in futures:
+                    future.result()
+                stub.expire_sessions()
+            futures.append(executor.submit(target))
+        for future in futures:
+            future.result()
+    return time.perf_counter() - start, stub.requests - requests, stub.logins - logins
+
+
+def main():
+    print('{:>10} {:>10} {:>12} {:>10} {:>10}'.format('mode', 'time, s', 'ms per job', 'requests', 'logins'))
+    with QBitStub(delay=0.005) as stub:
+        config = get_stub_client_config(read_config(CONFIG), stub)
+        pool = ClientPool(QBitTorrent, config, config.torrent_client.pool_size)
+        for name, target, expire_at in (
+                ('per job', lambda: per_job(config), None),
+                ('pool', lambda: pool.call(add_torrent), JOBS // 2),
+        ):
+            elapsed, requests, logins = run(stub, target, expire_at)
+            print('{:>10} {:>10.2f} {:>12.2f} {:>10} {:>10}'.format(
+                name, elapsed, 1000 * elapsed / JOBS, requests, logins
+            ))
+        print('pool metrics: {}'.format(pool.metrics()))
+
+
+if __name__ == '__main__':
+    main()
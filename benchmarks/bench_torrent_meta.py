@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Подсчет медиа файлов в torrent файлах многосезонных раздач.
+
+Сравнивается полный разбор bencodepy с проверкой расширений по списку и
+повторным кодированием info для info hash, и потоковое чтение только путей
+файлов с проверкой по frozenset.
+
+"""
+
+import hashlib
+import timeit
+
+import bencodepy
+
+from media_bot_v2.crawler.Workers.TorrentTrackers.Trackers import get_torrent_details
+from media_bot_v2.crawler.Workers.TorrentTrackers.torrent_meta import MEDIA_EXTENSIONS
+
+
+def make_torrent(seasons, episodes, extras=2, piece_count=20000):
+    files = []
+    for season in range(1, seasons + 1):
+        for episode in range(1, episodes + 1):
+            name = 'Сериал.S{0:02}E{1:03}.1080p.WEB-DL'.format(season, episode)
+            files.append({b'length': 1500000000, b'path': ['Season {}'.format(season).encode(), (name + '.mkv').encode()]})
+            for extra in range(extras):
+                files.append({b'length': 50000, b'path': [b'Subs', '{0}.{1}.srt'.format(name, extra).encode()]})
+    return bencodepy.encode({
+        b'announce': b'http://bt.example.org/ann',
+        b'info': {
+            b'name': b'Serial.Complete',
+            b'piece length': 4194304,
+            b'pieces': hashlib.sha1().digest() * piece_count,
+            b'files': files,
+        },
+    })
+
+
+def get_ext(path):
+    p = path
+    if isinstance(path, bytes):
+        p = path.decode('utf-8')
+    path_part = p.split('.')
+    return path_part[-1]
+
+
+def media_ext():
+    # Прежний список расширений, создаваемый для каждого файла
+    return sorted(ext.decode() for ext in MEDIA_EXTENSIONS)
+
+
+def full_decode(data):
+    # Прежняя реализация get_torrent_details
+    details = bencodepy.decode(data)
+    hashlib.sha1(bencodepy.encode(details[b'info'])).hexdigest()
+    return len([i for i in details[b'info'][b'files'] if get_ext(i.get(b'path')[-1]) in media_ext()])
+
+
+def main(number=5):
+    print('{:>8} {:>10} {:>10} {:>14} {:>14}'.format('files', 'size, KB', 'media', 'decode, ms', 'stream, ms'))
+    for seasons, episodes in ((5, 20), (20, 50), (40, 100)):
+        data = make_torrent(seasons, episodes)
+        media = get_torrent_details({'data': data, 'id': '1'})['file_amount']
+        assert media == full_decode(data) == seasons * episodes
+        decode_time = timeit.timeit(lambda: full_decode(data), number=number)
+        stream_time = timeit.timeit(lambda: get_torrent_details({'data': data, 'id': '1'}), number=number)
+        print('{:>8} {:>10} {:>10} {:>14.1f} {:>14.1f}'.format(
+            seasons * episodes * 3,
+            len(data) // 1024,
+            media,
+            decode_time / number * 1e3,
+            stream_time / number * 1e3,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Время поиска по трекерам с загрузкой страниц тем от локальной заглушки трекеров.
+
+max_connections=1 - страницы тем загружаются последовательно, как раньше.
+
+Повторный поиск с кэшем страниц тем, как при регламентной проверке.
+
+jackett - поиск одним запросом к локальной заглушке Torznab API вместо разбора страниц.
+
+"""
+
+import tempfile
+import time
+from unittest import mock
+
+from media_bot_v2.crawler.Workers.TorrentTrackers import Trackers
+
+from tests.jackett_stub import JackettStub, get_stub_jackett_config
+from tests.tracker_stub import TrackerStub, get_stub_config, get_stub_trackers
+
+QUERY = 'Игра престолов 2011 сезон 1'
+
+
+def run_search(stub, config):
+    with mock.patch.object(Trackers, 'get_trackers', lambda conf: get_stub_trackers(conf, stub.url)):
+        requests = stub.requests
+        start = time.perf_counter()
+        torrents = Trackers.search(config, QUERY)
+        return time.perf_counter() - start, len(torrents), stub.requests - requests
+
+
+def main():
+    print('{:>16} {:>10} {:>10} {:>10}'.format('max_connections', 'time, s', 'torrents', 'requests'))
+    with TrackerStub(delay=0.05) as stub, tempfile.TemporaryDirectory() as tmp_path:
+        for max_connections in (1, 4, 8):
+            config = get_stub_config(tmp_path, max_connections=max_connections, theam_cache_ttl=0)
+            print('{:>16} {:>10.2f} {:>10} {:>10}'.format(max_connections, *run_search(stub, config)))
+
+        print('{:>16} {:>10} {:>10} {:>10}'.format('theam cache', 'time, s', 'torrents', 'requests'))
+        config = get_stub_config(tmp_path)
+        for name in ('cold', 'warm'):
+            print('{:>16} {:>10.2f} {:>10} {:>10}'.format(name, *run_search(stub, config)))
+
+    with JackettStub(delay=0.05) as jackett, tempfile.TemporaryDirectory() as tmp_path:
+        config = get_stub_config(tmp_path, jackett_cfg=get_stub_jackett_config(jackett))
+        start = time.perf_counter()
+        torrents = Trackers.search(config, QUERY)
+        print('{:>16} {:>10.2f} {:>10} {:>10}'.format(
+            'jackett', time.perf_counter() - start, len(torrents), jackett.requests
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Выполнение команд UPDATE_MEDIA после плановой проверки.
+
+Сравнивается транзакция на каждую команду и одна транзакция на пакет команд.
+
+"""
+
+import tempfile
+import time
+
+from sqlalchemy import event, insert
+
+from media_bot_v2.app_enums import ClientCommands, ComponentType, LockingStatus, MediaType
+from media_bot_v2.command_handler.commandhandler_class import AddDataHandler
+from media_bot_v2.config import DbConfig
+from media_bot_v2.database import DbManager, dispose_engines
+from media_bot_v2.database.alch_db.model import Film, MediaData
+from media_bot_v2.mediator import command_message
+
+
+def seed(db: DbManager, media):
+    with db.engine.begin() as connection:
+        connection.execute(insert(MediaData), [
+            {
+                'id': i, 'label': 'Media {}'.format(i), 'year': 2000, 'status': LockingStatus.IN_PROGRESS,
+                'type': MediaType.FILMS, 'kinopoisk_id': str(i),
+            }
+            for i in range(1, media + 1)
+        ])
+        connection.execute(insert(Film.__table__), [{'id': i} for i in range(1, media + 1)])
+
+
+def update_messages(media, admin_id):
+    return [
+        command_message(
+            ComponentType.CRAWLER,
+            ClientCommands.UPDATE_MEDIA,
+            {
+                'media_id': str(i),
+                'media_type': MediaType.FILMS,
+                'upd_data': {'status': LockingStatus.FIND_TORRENT, 'torrent_id': 'hash{}'.format(i)},
+            },
+            admin_id
+        ).data
+        for i in range(1, media + 1)
+    ]
+
+
+def per_message(db: DbManager, data_list):
+    for data in data_list:
+        AddDataHandler.update_media_data(data, db, None)
+
+
+def batched(db: DbManager, data_list, size=200):
+    for i in range(0, len(data_list), size):
+        AddDataHandler.update_media_batch(data_list[i:i + size], db, None)
+
+
+def measure(db: DbManager, func, data_list):
+    commits = []
+
+    def on_commit(connection):
+        commits.append(connection)
+
+    event.listen(db.engine, 'commit', on_commit)
+    start = time.perf_counter()
+    func(db, data_list)
+    duration = time.perf_counter() - start
+    event.remove(db.engine, 'commit', on_commit)
+    return duration, len(commits)
+
+
+def main(media=1000):
+    print('{:>12} {:>10} {:>10}'.format('path', 'time, s', 'commits'))
+    for name, func in (('per message', per_message), ('batch', batched)):
+        with tempfile.TemporaryDirectory() as tmp_path:
+            db = DbManager(DbConfig(dns='sqlite:///{}/bench.db'.format(tmp_path), db_name='bench', admin_id='0'))
+            seed(db, media)
+            print('{:>12} {:>10.3f} {:>10}'.format(name, *measure(db, func, update_messages(media, 0))))
+            dispose_engines()
+
+
+if __name__ == '__main__':
+    main()
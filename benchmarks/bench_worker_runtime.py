@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Накладные расходы запуска воркеров краулера.
+
+Сравнивается прежний запуск (multiprocessing.Queue и новый Thread на каждую задачу)
+и пул потоков с очередью результатов в памяти процесса.
+
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Queue
+from threading import Thread
+
+from media_bot_v2.crawler.Workers.WorkerABC import Worker
+
+
+class EmptyWorker(Worker):
+
+    def get_target(self):
+        return self.work
+
+    def work(self):
+        self.returned_data.put([])
+
+
+class ThreadWorker:
+    """
+    Прежний воркер: очередь multiprocessing и отдельный поток
+    """
+
+    def __init__(self):
+        self.returned_data = Queue()
+        self.process = None
+
+    def start(self):
+        self.process = Thread(target=self.work)
+        self.process.start()
+
+    def work(self):
+        self.returned_data.put([])
+
+    @property
+    def result(self):
+        return self.returned_data.get()
+
+
+def open_files() -> int:
+    return len(os.listdir('/proc/self/fd'))
+
+
+def thread_jobs(jobs, parallel):
+    peak = 0
+    start = time.perf_counter()
+    for i in range(0, jobs, parallel):
+        workers = [ThreadWorker() for _ in range(parallel)]
+        for worker in workers:
+            worker.start()
+        peak = max(peak, open_files())
+        for worker in workers:
+            worker.result
+            worker.process.join()
+    return time.perf_counter() - start, peak
+
+
+def pool_jobs(jobs, parallel):
+    peak = 0
+    executor = ThreadPoolExecutor(max_workers=parallel)
+    start = time.perf_counter()
+    for i in range(0, jobs, parallel):
+        workers = [EmptyWorker(None, None) for _ in range(parallel)]
+        for worker in workers:
+            worker.start(executor)
+        peak = max(peak, open_files())
+        for worker in workers:
+            worker.process.result()
+            worker.returned_data.get()
+    duration = time.perf_counter() - start
+    executor.shutdown()
+    return duration, peak
+
+
+def main(jobs=5000, parallel=10):
+    base = open_files()
+    print('{:>10} {:>14} {:>16}'.format('runtime', 'us per job', 'extra open fds'))
+    for name, func in (('thread', thread_jobs), ('pool', pool_jobs)):
+        duration, peak = func(jobs, parallel)
+        print('{:>10} {:>14.1f} {:>16}'.format(name, duration / jobs * 1e6, peak - base))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ from media_bot_v2.clients import BotProtocol
 from media_bot_v2.command_handler import CommandMessageHandler
 from media_bot_v2.config import Config
 from media_bot_v2.crawler import Crawler
+from media_bot_v2.database import prepare_db
 from media_bot_v2.mediator import AppMediator, crawler_message
 from media_bot_v2.parser import Parser
 
@@ -28,13 +29,14 @@ class MediatorMessagesFilter(logging.Filter):
 
 def start_app(cfg: Config):
     file_hndlrs = configure_logger(cfg)
+    prepare_db(cfg.db_cfg)
 
     mediator_q = Queue()
 
     clients = [
         Parser(Queue(), mediator_q, cfg),
         BotProtocol(Queue(), mediator_q, cfg),
-        Crawler(Queue(), mediator_q, cfg, 10),
+        Crawler(Queue(), mediator_q, cfg),
         CommandMessageHandler(Queue(), mediator_q, cfg),
     ]
 
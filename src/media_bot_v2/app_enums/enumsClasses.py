@@ -113,6 +113,7 @@ class TorrentType(MyEnum):
     NONE_TYPE = 0
     RUTRACKER = 1
     RUTOR = 2
+    JACKETT = 3
 
 
 class UserRule(MyEnum):
@@ -2,13 +2,15 @@ from abc import ABC, abstractmethod
 import inspect
 import sys
 import logging
+import time
+from queue import Empty
 from plexapi.server import PlexServer
 
 from media_bot_v2.mediator import (
     AppMediatorClient,
     MediatorActionMessage,
     CommandData,
-    parser_message, send_message, crawler_message, command_message
+    parser_message, send_message, crawler_message, command_message, unpack_messages
 )
 
 from media_bot_v2.app_enums import ClientCommands, ComponentType, ActionType, MediaType
@@ -38,6 +40,77 @@ class CommandMessageHandler(AppMediatorClient):
         logger.debug('Запуск клиента {}'.format(self.CLIENT_TYPE))
         self.listen()
 
+    def listen(self):
+        logger.debug('Клиент {} готов к приему сообщений.'.format(self.CLIENT_TYPE))
+        while True:
+            try:
+                messages = unpack_messages(self.queue.get())
+            except Empty:
+                continue
+            if any(is_update_media(message) for message in messages):
+                messages += self.collect_messages(len(messages))
+            self.handle_messages(messages)
+
+    def collect_messages(self, count: int) -> list:
+        """
+        Дочитывает сообщения, поступившие в окне пакетного обновления медиа
+
+        :param count: количество уже полученных сообщений
+        :return:
+        """
+        db_cfg = self.config.db_cfg
+        messages = []
+        deadline = time.monotonic() + db_cfg.update_batch_window
+        while count + len(messages) < db_cfg.update_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                messages += unpack_messages(self.queue.get(timeout=timeout))
+            except Empty:
+                break
+        return messages
+
+    def handle_messages(self, messages: list):
+        """
+        Обрабатывает сообщения по порядку, идущие подряд команды UPDATE_MEDIA
+        выполняются одной транзакцией
+
+        :param messages:
+        :return:
+        """
+        updates = []
+        for message in messages:
+            if is_update_media(message):
+                updates.append(message)
+                continue
+            self.handle_updates(updates)
+            updates = []
+            self.handle_safe(message)
+        self.handle_updates(updates)
+
+    def handle_updates(self, messages: list):
+        if len(messages) < 2:
+            for message in messages:
+                self.handle_safe(message)
+            return
+        try:
+            result = AddDataHandler.update_media_batch([i.data for i in messages], self.db_manager, self.config)
+        except Exception as ex:
+            logger.error('Ошибка пакетного обновления медиа, команды выполняются по одной %s', ex, exc_info=True)
+            for message in messages:
+                self.handle_safe(message)
+            return
+        logger.debug('Выполнено пакетное обновление медиа, команд: {}'.format(len(messages)))
+        for msg in result:
+            self.send_message(msg)
+
+    def handle_safe(self, message: MediatorActionMessage):
+        try:
+            self.handle_message(message)
+        except Exception as ex:
+            logger.error('Error while listning for new message! %s', ex, exc_info=True)
+
     def handle_message(self, message: MediatorActionMessage):
         """
         Handle message
@@ -76,14 +149,7 @@ class AbstractHandler(ABC):
     @classmethod
     def exsecute_command(cls, message_data: CommandData, db_manager, config):
         if not cls.check_rule(message_data.client_id, db_manager):
-            return [send_message(
-                ComponentType.COMMAND_HANDLER,
-                {
-                    'user_id': message_data.client_id,
-                    'message_text': 'Для авторизации скинь свой id Морозу. Вот он: {}'.format(message_data.client_id),
-                    'choices': []
-                }
-            )]
+            return [cls.auth_message(message_data.client_id)]
         command_dict = cls.get_command_list()
         message = command_dict[message_data.command.value](message_data, db_manager, config)
         result = []
@@ -93,12 +159,30 @@ class AbstractHandler(ABC):
             result = message
         return result
 
+    @classmethod
+    def auth_message(cls, client_id: int):
+        return send_message(
+            ComponentType.COMMAND_HANDLER,
+            {
+                'user_id': client_id,
+                'message_text': 'Для авторизации скинь свой id Морозу. Вот он: {}'.format(client_id),
+                'choices': []
+            }
+        )
+
     @classmethod
     def check_rule(cls, client_id: int, db_manager: DbManager):
+        allowed = db_manager.auth_cache.get(client_id)
+        if allowed is not None:
+            return allowed
         session = db_manager.get_session()
         user = db_manager.find_user(client_id, session)
         session.close()
-        return user is not None
+        allowed = user is not None
+        # Отказ не кэшируется: пользователя могут добавить через другой DbManager
+        if allowed:
+            db_manager.auth_cache.set(client_id, allowed)
+        return allowed
 
 
 class FilmHandler(AbstractHandler):
@@ -207,6 +291,8 @@ class UserHandler(AbstractHandler):
         :return:
         """
         messages = []
+        # Права запросившего авторизацию пользователя проверяются заново
+        db_manager.auth_cache.invalidate(data.command_data['client_id'])
         session = db_manager.get_session()
         if db_manager.is_admin(data.client_id):
             messages.append(
@@ -280,6 +366,7 @@ class AddDataHandler(AbstractHandler):
             session=session,
         )
         session.close()
+        db_manager.auth_cache.invalidate(data.command_data['client_id'])
         message_text = 'Пользователь с id:{} добавлен.'.format(data.command_data['client_id'])
         messages.append(
             send_message(
@@ -376,21 +463,62 @@ class AddDataHandler(AbstractHandler):
 
     @classmethod
     def update_media_data(cls, data: CommandData, db_manager: DbManager, config):
+        session = db_manager.get_session()
+        try:
+            return cls.apply_media_update(data, db_manager, session)
+        finally:
+            session.close()
+
+    @classmethod
+    def update_media_batch(cls, data_list: list, db_manager: DbManager, config) -> list:
+        """
+        Выполняет несколько команд UPDATE_MEDIA в одной транзакции
+
+        Ответные сообщения формируются для каждой команды так же, как при
+        выполнении по одной. Каждая команда выполняется в точке сохранения:
+        ошибка отдельной команды откатывает только ее изменения и записывается
+        в лог, ошибка фиксации транзакции передается вызывающему.
+
+        :param data_list: список CommandData
+        :return: ответные сообщения всех команд
+        """
+        messages = []
+        session = db_manager.get_session()
+        try:
+            db_manager.begin_transaction(session)
+            for data in data_list:
+                if not cls.check_rule(data.client_id, db_manager):
+                    messages.append(cls.auth_message(data.client_id))
+                    continue
+                try:
+                    with session.begin_nested():
+                        command_messages = cls.apply_media_update(data, db_manager, session, commit=False)
+                    messages += command_messages
+                except Exception as ex:
+                    logger.error('Ошибка обновления медиа {0}: {1}'.format(data.command_data, ex))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        return messages
+
+    @classmethod
+    def apply_media_update(cls, data: CommandData, db_manager: DbManager, session, commit=True) -> list:
         com_data = data.command_data
         if 'media_id' not in com_data.keys():
             raise AttributeError('Для обновлвения данных необходимо передать kinopoisk_id')
 
         messages = []
-        com_data = data.command_data
-        session = db_manager.get_session()
         db_manager.update_media_params(
             **com_data,
-            session=session
+            session=session,
+            commit=commit,
         )
 
         if 'next_messages' in com_data.keys() and isinstance(com_data['next_messages'], list):
             messages += com_data['next_messages']
-        session.close()
         return messages
 
     @classmethod
@@ -442,8 +570,9 @@ class SendMessageHandler(AbstractHandler):
         media_type = data.command_data['media_type']
         season = data.command_data['season'] if media_type.value == MediaType.SERIALS.value else 0
 
-        recips = db_manager.get_users_for_notification(media_id, media_type, season=season)
-        ids = set([i.client_id for i in recips])
+        session = db_manager.get_session()
+        ids = db_manager.get_notification_client_ids(media_id, media_type, season=season, session=session)
+        session.close()
         for recip in ids:
             messages.append(
                 cls.construct_send_message(
@@ -500,24 +629,29 @@ class SendMessageHandler(AbstractHandler):
             return []
         ids = set()
 
-        if client_id == 0:
-            result = db_manager.get_all_users()
-            ids = set([i.client_id for i in result])
-            return ids
-
         if isinstance(client_id, int):
             ids.add(client_id)
         if isinstance(client_id, list):
             ids.update(client_id)
 
-        result = []
-        for id in ids:
-            user = db_manager.find_user(id)
-            if user is not None:
-                result.append(id)
+        session = db_manager.get_session()
+        try:
+            if client_id == 0:
+                return db_manager.get_all_client_ids(session)
+            result = db_manager.find_client_ids(ids, session)
+            # Администратор добавляется в базу при первом обращении
+            for id in ids.difference(result):
+                if db_manager.is_admin(id) and db_manager.find_user(id, session) is not None:
+                    result.append(id)
+        finally:
+            session.close()
         return result
 
 
+def is_update_media(message) -> bool:
+    return isinstance(message.data, CommandData) and message.data.command == ClientCommands.UPDATE_MEDIA
+
+
 def get_command_handlers():
     mods = inspect.getmembers(
         sys.modules[__name__],
@@ -22,6 +22,22 @@ class DbConfig(BaseModel):
     dns: str
     db_name: str
     admin_id: str
+    # Пул соединений engine, общий для всех DbManager процесса
+    pool_size: int = 5
+    max_overflow: int = 10
+    # Время жизни соединения в секундах, -1 - без ограничения
+    pool_recycle: int = 3600
+    pool_pre_ping: bool = True
+    # Время хранения результата проверки прав пользователя в секундах, 0 - без кэша
+    auth_cache_ttl: float = 300
+    # Окно в секундах, за которое команды UPDATE_MEDIA собираются в одну транзакцию
+    update_batch_window: float = 0.1
+    update_batch_size: int = 200
+    # Профиль соединений SQLite: журнал WAL, ожидание блокировки в мс, размер mmap в байтах
+    sqlite_wal: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout: int = 5000
+    sqlite_mmap_size: int = 256 * 2 ** 20
 
 
 class TMDBConfig(BaseModel):
@@ -53,10 +69,65 @@ class AuthCfg(BaseModel):
     api_key: str|None = None
 
 
+class MatchConfig(BaseModel):
+    # Ограничения раздачи фильма: количество файлов и размер в ГБ
+    film_max_files: int = 3
+    film_min_size: float = 3.5
+    film_max_size: float = 15
+    # Если подходящих раздач нет, для фильма/сериала старше стольких лет предлагаются все найденные
+    old_media_years: int = 15
+    # Веса оценки раздачи, раздачи с большей оценкой предлагаются первыми.
+    # Сиды учитываются как log(1 + сиды), разрешение в тысячах строк.
+    seeders_weight: float = 1
+    resolution_weight: float = 0
+    sound_weight: float = 0
+    kinopoisk_weight: float = 0
+    advertising_weight: float = 0
+    # Записывать в лог причины отклонения раздач при каждом поиске
+    explain: bool = False
+
+
+class JackettConfig(BaseModel):
+    # Адрес со схемой, например http://127.0.0.1
+    host: str
+    port: int = 9117
+    api_key: str
+    # Индексатор Jackett, all - все настроенные
+    indexer: str = "all"
+    # Категории Torznab для фильмов и сериалов
+    film_categories: list[int] = [2000]
+    serial_categories: list[int] = [5000]
+    # Искать только через Jackett, не разбирая страницы трекеров.
+    # Скачивание и проверка тем уже найденных раздач выполняются трекерами
+    replace_trackers: bool = True
+    timeout: float = 60
+
+
 class TorrentTrackersConfig(BaseModel):
     tmp_path: pathlib.Path
     credentials: dict[str, AuthCfg]
     proxy_cfg: ProxyConfig | None = None
+    # Количество одновременно загружаемых страниц тем на один трекер
+    max_connections: int = 4
+    # Время актуальности кэша страниц тем в секундах, 0 - кэш выключен
+    theam_cache_ttl: int = 12 * 60 * 60
+    theam_cache_size: int = 5000
+    # Ограничение частоты запросов к одному домену трекера
+    requests_per_second: float = Field(default=4, gt=0)
+    requests_burst: int = 8
+    # Повторы запроса и максимальная пауза в секундах при ответах 429/5xx
+    max_retries: int = 3
+    max_backoff: float = 300
+    # Время ожидания ответа трекера в секундах, без него зависший запрос занимает поток воркера
+    request_timeout: float = 60
+    # Не скачивать torrent файл сериала, если раздача темы не изменилась
+    incremental_check: bool = True
+    # Разбор страниц трекеров: lxml - скомпилированные XPath, bs4 - прежний разбор BeautifulSoup
+    html_parser: str = "lxml"
+    # Выбор лучшей раздачи из результатов поиска
+    match_cfg: MatchConfig = Field(default_factory=MatchConfig)
+    # Поиск через Jackett (Torznab API)
+    jackett_cfg: JackettConfig | None = None
 
 class HttpApiConfig(BaseModel):
     user: str
@@ -73,6 +144,27 @@ class TorrentClientConfig(BaseModel):
     qbit_torrent: HttpApiConfig | None = None
     deluge_torrent: HttpApiConfig | None = None
     transmission_client: HttpApiConfig | None = None
+    # Количество одновременно открытых подключений к торрент клиенту в процессе
+    pool_size: int = 2
+
+
+class MediatorConfig(BaseModel):
+    # Окно накопления исходящих сообщений клиента в секундах, 0 - пакетная отправка выключена
+    batch_window: float = 0
+    batch_size: int = 100
+
+
+class CrawlerConfig(BaseModel):
+    # Интервал проверки результатов работающих воркеров в секундах.
+    # Новые задачи и завершение воркеров обрабатываются сразу.
+    poll_interval: float = 10
+    # Количество одновременно выполняемых воркеров
+    workers: int = 10
+    # Предельное время выполнения задачи в секундах, 0 - без ограничения
+    job_timeout: float = 30 * 60
+    # Интервал опроса торрент клиента о наблюдаемых загрузках и время наблюдения в секундах
+    watch_interval: float = 5 * 60
+    watch_timeout: float = 60 * 60
 
 
 class Config(BaseModel):
@@ -84,6 +176,8 @@ class Config(BaseModel):
     tmdb_cfg: TMDBConfig
     plex_cfg: PlexConfig
     proxy_cfg: ProxyConfig
+    mediator_cfg: MediatorConfig = Field(default_factory=MediatorConfig)
+    crawler_cfg: CrawlerConfig = Field(default_factory=CrawlerConfig)
 
 
 def read_config(path: pathlib.Path):
@@ -1,10 +1,10 @@
 import logging
 from queue import Empty
 
-from media_bot_v2.mediator import send_message, command_message, crawler_message
+from media_bot_v2.mediator import send_message, command_message, crawler_message, share_blob
 from media_bot_v2.app_enums import ComponentType, ClientCommands, MediaType, ActionType, LockingStatus
 from media_bot_v2.crawler.Workers.WorkerABC import Worker
-from media_bot_v2.crawler.Workers.TorrentTrackers import download
+from media_bot_v2.crawler.Workers.TorrentTrackers import download, topic_changed
 
 from .utils import construct_upd_data, add_media_keys
 
@@ -25,7 +25,16 @@ class DownloadWorker(Worker):
         torrent_data = []
         try:
             media = self.job.media
-            torrdata = download(self.config.tracker_cfg, media.download_url)
+            theam_url = self.get_incremental_theam(media)
+            if theam_url is not None and not topic_changed(self.config.tracker_cfg, theam_url, media.current_series):
+                logger.debug('Раздача {0} не изменилась, torrent файл не скачивается.'.format(theam_url))
+                self.returned_data.put(torrent_data)
+                return
+            torrdata = download(self.config.tracker_cfg, media.download_url, theam_url)
+            if torrdata is None:
+                logger.error('Не удалось скачать torrent файл {0}'.format(media.download_url))
+                self.returned_data.put(torrent_data)
+                return
 
             if torrdata['file_amount'] == 0 or not (media.media_type.value == MediaType.SERIALS.value and (torrdata['file_amount'] == media.current_series)):
                 torrent_data.append(torrdata)
@@ -36,6 +45,21 @@ class DownloadWorker(Worker):
             return    
         logger.debug('Torrent worker ended.')
 
+    def get_incremental_theam(self, media):
+        """
+        Возвращает тему раздачи сериала, изменения которой проверяются перед скачиванием
+
+        :param media:
+        :return: url темы или None, если torrent файл нужно скачивать всегда
+        """
+        if not self.config.tracker_cfg.incremental_check:
+            return None
+        if not media.media_type.value == MediaType.SERIALS.value:
+            return None
+        if not media.theam_id:
+            return None
+        return media.theam_id
+
     @property
     def result(self):
 
@@ -96,7 +120,7 @@ class DownloadWorker(Worker):
 
             add_torrent_data = {
                 'torrent_id': torrent_data['id'],
-                'torrent_data': torrent_data['data'],
+                'torrent_data': share_blob(torrent_data['data']),
             }
             add_media_keys(media, add_torrent_data)
 
@@ -1,14 +1,14 @@
 import logging
-import time
 import base64
 import math
 from queue import Empty
 
 from media_bot_v2.config import Config
 from media_bot_v2.app_enums import ComponentType, ClientCommands, ActionType, MediaType
-from media_bot_v2.mediator import command_message, crawler_message, send_message, MediatorMessage
+from media_bot_v2.mediator import command_message, crawler_message, send_message, MediatorMessage, load_blob, release_blob
 from media_bot_v2.crawler.Workers.WorkerABC import Worker
 
+from .client_pool import ClientUnavailableError, get_client_pool
 from .utils import add_media_keys, construct_upd_data
 
 logger = logging.getLogger(__name__)
@@ -16,12 +16,15 @@ logger = logging.getLogger(__name__)
 
 class TorrentWorker(Worker):
 
+    def __init__(self, job, config: Config):
+        super(TorrentWorker, self).__init__(job, config)
+        self._torrent_data = None
+
     def get_target(self):
         if self.job.action_type.value == ActionType.ADD_TORRENT_TO_TORRENT_CLIENT.value:
             return self.add_torrent
-        elif self.job.action_type.value == ActionType.ADD_TORRENT_WATCHER.value:
-            return self.work
         else:
+            # Наблюдение за загрузкой выполняет TorrentWatcher краулера
             raise NotImplementedError(f"no target for job type {self.job.action_type}")
 
     @property
@@ -38,48 +41,36 @@ class TorrentWorker(Worker):
 
         if 'torrent_id' in data.keys():
             messages.append(start_torrent_watcher_message(self.job, data))
-        if 'torrent_information' in data.keys():
-            messages += watcher_messages(self.job, data)
 
         return messages
 
     def add_torrent(self):
-        client = self.get_client()
-        if client is None:
-            self.save_file_to_folder()
-            return
-        if self.job.season == '':
-            dir_path = self.config.torrent_client.film_path
-        else:
-            dir_path = self.config.torrent_client.serial_path
-
-        torrent_id = self._add_torrent(client, dir_path)
+        try:
+            if self.job.season == '':
+                dir_path = self.config.torrent_client.film_path
+            else:
+                dir_path = self.config.torrent_client.serial_path
+
+            try:
+                torrent_id = get_client_pool(type(self), self.config).call(
+                    lambda client: self._add_torrent(client, dir_path)
+                )
+            except ClientUnavailableError:
+                self.save_file_to_folder()
+                return
+        finally:
+            release_blob(self.job.crawler_data.torrent_data)
 
         self.returned_data.put({'torrent_id': torrent_id})
 
-    def work(self):
-        client = self.get_client()
-        if client is None:
-            return
-        do = True
-        start_time = time.time()
-        first_time = True
-        while do:
-
-            torrent_information = self._get_torrent_information(client)
-
-            if self.job.crawler_data.force:
-                self.returned_data.put({'torrent_information': torrent_information})
-                break
-            if first_time:
-                self.returned_data.put({'torrent_information': torrent_information})
-                first_time = False
-            if torrent_information['progress'] == 100:
-                self.returned_data.put({'torrent_information': torrent_information})
-                break
-            if time.time() - start_time == 60 * 60:
-                break
-            time.sleep(60 * 5)
+    @property
+    def torrent_data(self) -> bytes:
+        """
+        Содержимое torrent файла, переданное в сообщении или через разделяемую память
+        """
+        if self._torrent_data is None:
+            self._torrent_data = load_blob(self.job.crawler_data.torrent_data)
+        return self._torrent_data
 
     def save_file_to_folder(self):
 
@@ -88,13 +79,45 @@ class TorrentWorker(Worker):
             dir_path = self.config.torrent_client.torrent_serial_path
 
         with open(f'{dir_path}{self.job.torrent_id}', 'wb') as file:
-            file.write(self.job.crawler_data.torrent_data)
+            file.write(self.torrent_data)
+
+    @classmethod
+    def connect(cls, config: Config):
+        """
+        Подключается к торрент клиенту
 
-    def _get_torrent_information(self, client):
+        :return: клиент или None, если подключиться не удалось
+        """
         pass
 
-    @staticmethod
-    def get_client():
+    @classmethod
+    def is_session_expired(cls, ex: Exception) -> bool:
+        """
+        Вызвана ли ошибка истечением сессии, после которого достаточно повторной авторизации
+        """
+        return False
+
+    @classmethod
+    def authenticate(cls, client, config: Config):
+        """
+        Восстанавливает сессию клиента
+
+        :return: авторизованный клиент
+        """
+        client = cls.connect(config)
+        if client is None:
+            raise ClientUnavailableError('Не удалось подключиться к торрент клиенту')
+        return client
+
+    @classmethod
+    def get_torrents_information(cls, client, torrent_ids: list) -> dict:
+        """
+        Запрашивает состояние нескольких раздач одним обращением к клиенту
+
+        :param client:
+        :param torrent_ids:
+        :return: {torrent_id: {'progress', 'total_done', 'total_size'}}, отсутствующих в клиенте раздач нет
+        """
         pass
 
     def _add_torrent(self, client, dir_path):
@@ -103,14 +126,15 @@ class TorrentWorker(Worker):
 
 class DelugeWorker(TorrentWorker):
 
-    def get_client(self, ):
+    @classmethod
+    def connect(cls, config: Config):
         from deluge_client import DelugeRPCClient, FailedToReconnectException
         try:
             deluge = DelugeRPCClient(
-                self.config.torrent_client.deluge_torrent.host,
-                int(self.config.torrent_client.deluge_torrent.port),
-                self.config.torrent_client.deluge_torrent.user,
-                self.config.torrent_client.deluge_torrent.password)
+                config.torrent_client.deluge_torrent.host,
+                int(config.torrent_client.deluge_torrent.port),
+                config.torrent_client.deluge_torrent.user,
+                config.torrent_client.deluge_torrent.password)
             deluge.connect()
             if not deluge.connected:
                 raise FailedToReconnectException
@@ -123,36 +147,42 @@ class DelugeWorker(TorrentWorker):
 
         torrent_options = {'download_location': dir_path}
 
-        torrend_data = base64.encodebytes(self.job.crawler_data.torrent_data)
+        torrend_data = base64.encodebytes(self.torrent_data)
         torrent_file_name = '{}.torrent'.format(self.job.torrent_id)
         torrent_id = client.call('core.add_torrent_file', torrent_file_name, torrend_data, torrent_options)
         return torrent_id
 
-    def _get_torrent_information(self, client):
-        data = client.call('core.get_torrents_status', {'id': self.job.torrent_id}, [
+    @classmethod
+    def get_torrents_information(cls, client, torrent_ids: list) -> dict:
+        data = client.call('core.get_torrents_status', {'id': list(torrent_ids)}, [
                 'progress',
                 'total_done',
                 'total_size'
             ])
-        torr_dict = data[bytes(self.job.torrent_id, 'utf-8')]
-        return {
-            'progress': int(torr_dict[b'progress']),
-            'total_done': torr_dict[b'total_done'],
-            'total_size': torr_dict[b'total_size'],
-        }
+        result = {}
+        for torrent_id, torr_dict in data.items():
+            if isinstance(torrent_id, bytes):
+                torrent_id = torrent_id.decode('utf-8')
+            result[torrent_id] = {
+                'progress': int(torr_dict[b'progress']),
+                'total_done': torr_dict[b'total_done'],
+                'total_size': torr_dict[b'total_size'],
+            }
+        return result
 
 
 class TransmissionWorker(TorrentWorker):
 
-    def get_client(self):
+    @classmethod
+    def connect(cls, config: Config):
         import transmissionrpc
 
         try:
             transmission = transmissionrpc.Client(
-                self.config.torrent_client.transmission_client.host,
-                int(self.config.torrent_client.transmission_client.port),
-                self.config.torrent_client.transmission_client.user,
-                self.config.torrent_client.transmission_client.password)
+                config.torrent_client.transmission_client.host,
+                int(config.torrent_client.transmission_client.port),
+                config.torrent_client.transmission_client.user,
+                config.torrent_client.transmission_client.password)
         except transmissionrpc.TransmissionError:
             logger.error('Не удалось соединиться с торрент торрент клиентом')
             return None
@@ -162,33 +192,40 @@ class TransmissionWorker(TorrentWorker):
 
         torrent_options = {'download_dir': dir_path}
 
-        torrent = client.add_torrent(base64.encodebytes(self.job.crawler_data.torrent_data), *torrent_options)
+        torrent = client.add_torrent(base64.encodebytes(self.torrent_data), *torrent_options)
         torrent.update()
 
         return torrent.id
 
-    def _get_torrent_information(self, client):
-        torrent = client.get_torrent(self.job.torrent_id)
-        torrent.update()
-
-        return {
-            'progress': int(torrent.progress),
-            'total_done': torrent._fields['sizeWhenDone'].value,
-            'total_size': torrent._fields['leftUntilDone'].value,
-        }
+    @classmethod
+    def get_torrents_information(cls, client, torrent_ids: list) -> dict:
+        ids = [int(torrent_id) for torrent_id in torrent_ids]
+        torrents = client.get_torrents(ids, arguments=['id', 'sizeWhenDone', 'leftUntilDone'])
+
+        result = {}
+        for torrent in torrents:
+            size = torrent._fields['sizeWhenDone'].value
+            left = torrent._fields['leftUntilDone'].value
+            result[str(torrent.id)] = {
+                'progress': int(100.0 * (size - left) / size) if size else 0,
+                'total_done': size - left,
+                'total_size': size,
+            }
+        return result
 
 
 class QBitTorrent(TorrentWorker):
 
-    def get_client(self):
+    @classmethod
+    def connect(cls, config: Config):
         from qbittorrent import Client
         from requests import ConnectionError
 
         try:
-            q_bit = Client(f'http://{self.config.torrent_client.qbit_torrent.host}:{int(self.config.torrent_client.qbit_torrent.port)}')
+            q_bit = Client(f'http://{config.torrent_client.qbit_torrent.host}:{int(config.torrent_client.qbit_torrent.port)}')
             res = q_bit.login(
-                username=self.config.torrent_client.qbit_torrent.user,
-                password=self.config.torrent_client.qbit_torrent.password,
+                username=config.torrent_client.qbit_torrent.user,
+                password=config.torrent_client.qbit_torrent.password,
             )
             if res == 'Fails.':
                 logger.error('Неверный пароль или логин для подключения к qBitTorrent')
@@ -199,30 +236,53 @@ class QBitTorrent(TorrentWorker):
 
         return q_bit
 
+    @classmethod
+    def is_session_expired(cls, ex: Exception) -> bool:
+        from qbittorrent.client import LoginRequired
+        from requests import HTTPError
+
+        if isinstance(ex, LoginRequired):
+            return True
+        return isinstance(ex, HTTPError) and ex.response is not None and ex.response.status_code == 403
+
+    @classmethod
+    def authenticate(cls, client, config: Config):
+        res = client.login(
+            username=config.torrent_client.qbit_torrent.user,
+            password=config.torrent_client.qbit_torrent.password,
+        )
+        if res == 'Fails.':
+            logger.error('Неверный пароль или логин для подключения к qBitTorrent')
+            raise ClientUnavailableError('Ошибка авторизации в qBitTorrent')
+        return client
+
     def _add_torrent(self, client, dir_path):
         import io
 
-        torrent_hash = self.get_torr_info_hash(self.job.crawler_data.torrent_data)
-        torrent_io = io.BytesIO(self.job.crawler_data.torrent_data)
+        torrent_hash = self.get_torr_info_hash(self.torrent_data)
+        torrent_io = io.BytesIO(self.torrent_data)
 
         client.download_from_file(torrent_io, savepath=dir_path)
 
         return torrent_hash
 
-    def _get_torrent_information(self, client):
-        torrent = client.get_torrent(self.job.torrent_id)
-
-        total_downloaded = torrent['total_downloaded']
-        size = torrent['total_size']
-        left = size - total_downloaded
-
-        progress = 100.0 * (size - left) / float(size)
-
-        return {
-            'progress': int(progress),
-            'total_done': total_downloaded,
-            'total_size': size,
-        }
+    @classmethod
+    def get_torrents_information(cls, client, torrent_ids: list) -> dict:
+        # Старый API query/torrents может не поддерживать отбор по hashes, лишние раздачи отбрасываются
+        hashes = set(torrent_ids)
+        torrents = client.torrents(hashes='|'.join(torrent_ids))
+
+        result = {}
+        for torrent in torrents:
+            if torrent['hash'] not in hashes:
+                continue
+            size = torrent['size']
+            result[torrent['hash']] = {
+                'progress': int(100 * torrent['progress']),
+                'total_done': int(size * torrent['progress']),
+                'total_size': size,
+            }
+        return result
 
     @staticmethod
     def get_torr_info_hash(data):
@@ -232,15 +292,19 @@ class QBitTorrent(TorrentWorker):
 
 
 def get_torrent_worker(job, worker_config: Config)-> TorrentWorker:
+    return get_torrent_worker_class(worker_config)(job, worker_config)
+
+
+def get_torrent_worker_class(worker_config: Config):
 
     torrent_client_type = int(worker_config.torrent_client.type)
 
     if torrent_client_type == 0:
-        return DelugeWorker(job, worker_config)
+        return DelugeWorker
     elif torrent_client_type == 1:
-        return TransmissionWorker(job, worker_config)
+        return TransmissionWorker
     elif torrent_client_type == 2:
-        return QBitTorrent(job, worker_config)
+        return QBitTorrent
     else:
         logger.error('Не удалось определить тип торрент клиента.')
         raise ValueError
@@ -1,17 +1,23 @@
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
-import bencodepy
 from bs4 import BeautifulSoup
 from http import cookiejar
-from os import path
+from os import path, getpid
+from queue import Queue
 import re
 import logging
 import requests
-from time import sleep
+import threading
 
 from media_bot_v2.app_enums import TorrentType
 from media_bot_v2.config import TorrentTrackersConfig
 
+from . import page_parser
+from .rate_limiter import RateLimitedSession, rate_limit_metrics
+from .theam_cache import TheamCache
+from .torrent_meta import TorrentMetaError, read_torrent_meta
+
 logger = logging.getLogger(__name__)
 
 HEADERS = {
@@ -78,6 +84,10 @@ class TorrentTracker(AbcTorrentTracker):
         self._film_forums = None
         self._serial_forums = None
         self._is_loggining_in = None
+        self._theam_cache = None
+        self._topic_markers = None
+        # Экземпляр трекера используется одновременно несколькими воркерами
+        self._lock = threading.RLock()
 
     def login(self):
         return None
@@ -86,12 +96,17 @@ class TorrentTracker(AbcTorrentTracker):
         return []
 
     def get_connection(self):
-        proxies = {
-            'https': self.config.proxy_cfg.build_proxy_str(),
-            'http': self.config.proxy_cfg.build_proxy_str()
-        }
-        session = requests.session()
-        session.proxies.update(proxies)
+        session = RateLimitedSession(self.config)
+        if self.config.proxy_cfg is not None:
+            proxies = {
+                'https': self.config.proxy_cfg.build_proxy_str(),
+                'http': self.config.proxy_cfg.build_proxy_str()
+            }
+            session.proxies.update(proxies)
+        # Страницы тем загружаются параллельно, пул соединений должен это позволять
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(self.config.max_connections, 10))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
         session.headers.update(HEADERS)
         if self.cookie is not None:
             session.cookies.update(self.cookie)
@@ -113,21 +128,14 @@ class TorrentTracker(AbcTorrentTracker):
         jar.save()
 
     def close(self):
+        if self._connection is None:
+            return
         self._connection.close()
         self._connection = None
 
     @staticmethod
     def normalize_size(size: str) -> float:
-        coef = 1
-        if 'MB' in size.upper():
-            coef = 0.001
-
-        result = re.search(r'\d+.\d{0,2}', size)
-        if result is None:
-            return 0
-        new_size = result.group()
-
-        return float(new_size) * coef
+        return page_parser.normalize_size(size)
 
     def get_torrent_data(self, url):
         if not self._is_loggining_in:
@@ -146,6 +154,151 @@ class TorrentTracker(AbcTorrentTracker):
             'id': torr_id
         }
 
+    def create_torrents(self, tor_dicts: list) -> list:
+        """
+        Дополняет найденные раздачи данными со страниц тем.
+        Страницы тем загружаются параллельно, не более max_connections одновременно.
+
+        :param tor_dicts: данные строк результата поиска
+        :return: список Torrent
+        """
+        workers = min(self.config.max_connections, len(tor_dicts))
+        if workers <= 1:
+            torrents = [self.fill_theam_data(tor_dict) for tor_dict in tor_dicts]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.site_name) as pool:
+                torrents = list(pool.map(self.fill_theam_data, tor_dicts))
+        if self.theam_cache is not None:
+            self.theam_cache.save()
+        return [torrent for torrent in torrents if torrent is not None]
+
+    def create_torrent(self, search_line) -> Torrent or None:
+        tor_dict = self.parse_search_line(search_line)
+        if tor_dict is None:
+            return None
+        return self.fill_theam_data(tor_dict)
+
+    @property
+    def use_soup(self) -> bool:
+        return self.config.html_parser == 'bs4'
+
+    def parse_search_line(self, search_line) -> dict or None:
+        """
+        Разбирает строку результата поиска
+
+        :param search_line:
+        :return: данные раздачи или None, если строка не подходит
+        """
+        return None
+
+    def fill_theam_data(self, tor_dict: dict) -> Torrent or None:
+        """
+        Дополняет данные раздачи данными страницы темы и создает по ним Torrent
+
+        :param tor_dict: данные, полученные из строки результата поиска
+        :return:
+        """
+        theam_data = self.get_theam_data(tor_dict)
+        if theam_data.get('resolution') is None:
+            return None
+        tor_dict.update(theam_data)
+        tor_dict['tracker'] = self.site_type
+        return Torrent(**tor_dict)
+
+    def get_theam_data(self, tor_dict: dict) -> dict:
+        """
+        Получает разобранные данные страницы темы, по возможности из кэша
+
+        :param tor_dict:
+        :return:
+        """
+        url = tor_dict['theam_url']
+        cache = self.theam_cache
+        entry = cache.get(url) if cache is not None else None
+        if entry is not None and cache.is_fresh(entry):
+            return entry['data']
+
+        # Ошибка загрузки не кэшируется, тема будет запрошена при следующем поиске,
+        # до этого используются устаревшие данные кэша, если они есть
+        try:
+            resp = self.connection.get(url, headers=conditional_headers(entry))
+        except requests.RequestException as ex:
+            logger.warning(f'Не удалось загрузить страницу темы {url}: {ex}')
+            return entry['data'] if entry is not None else {}
+        if entry is not None and resp.status_code == 304:
+            cache.touch(url)
+            return entry['data']
+        if not resp.status_code == 200:
+            logger.warning(f'Страница темы {url} вернула статус {resp.status_code}')
+            return entry['data'] if entry is not None else {}
+
+        theam_data = self.parse_theam_page(resp.text, tor_dict)
+        if cache is not None:
+            cache.put(url, theam_data, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+        return theam_data
+
+    def topic_changed(self, theam_url: str, file_amount: int) -> bool:
+        """
+        Проверяет, изменилась ли раздача темы с последнего скачивания torrent файла.
+        Страница темы запрашивается условным запросом, при ее изменении
+        сравнивается info hash раздачи из magnet ссылки.
+
+        :param theam_url:
+        :param file_amount: количество файлов по последнему скачиванию
+        :return: True, если раздача изменилась или ее не удалось проверить
+        """
+        markers = self.topic_markers
+        entry = markers.get(theam_url)
+        if entry is None or not entry['data']['file_amount'] == file_amount:
+            return True
+
+        try:
+            resp = self.connection.get(theam_url, headers=conditional_headers(entry))
+        except requests.RequestException as ex:
+            logger.warning(f'Не удалось проверить тему {theam_url}: {ex}')
+            return True
+        if resp.status_code == 304:
+            markers.touch(theam_url)
+            markers.save()
+            return False
+        if not resp.ok:
+            logger.warning(f'Не удалось проверить тему {theam_url}: ответ {resp.status_code}')
+            return True
+
+        info_hash = parse_info_hash(resp.text)
+        if info_hash is None or not info_hash == entry['data']['info_hash']:
+            return True
+        markers.put(theam_url, entry['data'], resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+        markers.save()
+        return False
+
+    def save_topic_marker(self, theam_url: str, torrent_details: dict):
+        """
+        Запоминает раздачу темы после скачивания torrent файла
+
+        :param theam_url:
+        :param torrent_details: результат get_torrent_details
+        :return:
+        """
+        info_hash = torrent_details.get('info_hash')
+        if info_hash is None:
+            return
+        self.topic_markers.put(theam_url, {
+            'info_hash': info_hash,
+            'file_amount': torrent_details['file_amount'],
+        })
+        self.topic_markers.save()
+
+    def parse_theam_page(self, page_text: str, tor_dict: dict) -> dict:
+        """
+        Разбирает страницу темы
+
+        :param page_text:
+        :param tor_dict: данные, полученные из строки результата поиска
+        :return: данные раздачи со страницы темы
+        """
+        return {}
+
     def get_resolution(self, page_soup, title):
         resolutions = ['720', '1080']
         for res in resolutions:
@@ -173,6 +326,33 @@ class TorrentTracker(AbcTorrentTracker):
             self._is_loggining_in = self.test_login_status()
         return self._is_loggining_in
 
+    @property
+    def theam_cache(self) -> TheamCache or None:
+        if self.config.theam_cache_ttl <= 0:
+            return None
+        if self._theam_cache is None:
+            with self._lock:
+                if self._theam_cache is None:
+                    self._theam_cache = TheamCache(
+                        "{0}/{1}.theams.json".format(self.config.tmp_path, self.site_name),
+                        self.config.theam_cache_ttl,
+                        self.config.theam_cache_size,
+                    )
+        return self._theam_cache
+
+    @property
+    def topic_markers(self) -> TheamCache:
+        if self._topic_markers is None:
+            with self._lock:
+                if self._topic_markers is None:
+                    # Срок жизни не используется, запись заменяется при скачивании нового torrent файла
+                    self._topic_markers = TheamCache(
+                        "{0}/{1}.topics.json".format(self.config.tmp_path, self.site_name),
+                        0,
+                        self.config.theam_cache_size,
+                    )
+        return self._topic_markers
+
     @property
     def film_forums(self):
         if self._film_forums is None:
@@ -187,9 +367,10 @@ class TorrentTracker(AbcTorrentTracker):
 
     @property
     def connection(self):
-        sleep(0.5)
         if self._connection is None:
-            self._connection = self.get_connection()
+            with self._lock:
+                if self._connection is None:
+                    self._connection = self.get_connection()
         return self._connection
 
     @property
@@ -214,6 +395,10 @@ class TorrentTracker(AbcTorrentTracker):
 class Rutracker(TorrentTracker):
 
     def login(self):
+        with self._lock:
+            return self._login()
+
+    def _login(self):
         user = self.config.credentials[self.site_name].user_name
         password = self.config.credentials[self.site_name].password
         if self.is_logining_in:
@@ -242,11 +427,32 @@ class Rutracker(TorrentTracker):
         if not self.is_logining_in:
             logger.error('Не удалось залогиниться в трекере. {}'.format(self.site_name))
             return False
+        return True
 
     def test_login_status(self):
         main_url = '{}/index.php'.format(self.site_domain)
         req = self.connection.get(main_url)
-        return self.config.credentials[self.site_name].user_name in req.text
+        return self.is_user_page(req.text)
+
+    def is_user_page(self, text):
+        return self.config.credentials[self.site_name].user_name in text
+
+    def get_search_page(self, search_url, params):
+        """
+        Загружает страницу поиска, при устаревшей сессии повторно авторизуется
+
+        :param search_url:
+        :param params:
+        :return:
+        """
+        req = self.connection.get(search_url, params=params)
+        if self.is_user_page(req.text):
+            return req
+        logger.info('Сессия трекера {} устарела, повторная авторизация.'.format(self.site_name))
+        self._is_loggining_in = False
+        if not self.login():
+            return None
+        return self.connection.get(search_url, params=params)
 
     def search(self, text):
         if not self.login():
@@ -262,23 +468,26 @@ class Rutracker(TorrentTracker):
             'f': forums
         }
 
-        req = self.connection.get(
-            search_url,
-            params=params
-        )
-        soup = BeautifulSoup(req.content.decode(req.encoding), features='lxml')
+        req = self.get_search_page(search_url, params)
+        if req is None:
+            return []
+        page_text = req.content.decode(req.encoding)
+        if not self.use_soup:
+            return self.create_torrents(page_parser.parse_rutracker_search(page_text, self.site_domain))
+
+        soup = BeautifulSoup(page_text, features='lxml')
         reg = re.compile('tCenter hl-tr')
         tr_linse = soup.find_all('tr', {'class': reg})
-        torrents = []
+        tor_dicts = []
         for tr_line in tr_linse:
             if not tr_line.parent.parent['class'] == ['forumline', 'tablesorter']:
                 continue
-            torrent = self.create_torrent(tr_line)
-            if torrent is not None:
-                torrents.append(torrent)
-        return torrents
+            tor_dict = self.parse_search_line(tr_line)
+            if tor_dict is not None:
+                tor_dicts.append(tor_dict)
+        return self.create_torrents(tor_dicts)
 
-    def create_torrent(self, search_line) -> Torrent or None:
+    def parse_search_line(self, search_line) -> dict or None:
         tor_dict = dict(
             label='', url='', size=0, data='', file_name='',
             pier=0, resolution=None, theam_url='', file_amount=0, kinopoisk_id='', tracker='',
@@ -302,18 +511,23 @@ class Rutracker(TorrentTracker):
                 return None
             except NameError:
                 return None
-        resp = self.connection.get(tor_dict['theam_url'])
-        theam_soup = BeautifulSoup(resp.text, features='lxml')
+        return tor_dict
 
-        tor_dict['resolution'] = self.get_resolution(theam_soup, tor_dict['label'])
-        if tor_dict['resolution'] is None:
-            return None
-        tor_dict['sound'] = self.get_sound(theam_soup)
-        tor_dict['kinopoisk_id'] = self.get_kinopoisk_id(theam_soup)
+    def parse_theam_page(self, page_text: str, tor_dict: dict) -> dict:
+        if not self.use_soup:
+            return page_parser.parse_rutracker_theam(page_text, tor_dict['label'])
 
-        tor_dict['tracker'] = self.site_type
+        theam_soup = BeautifulSoup(page_text, features='lxml')
 
-        return Torrent(**tor_dict)
+        resolution = self.get_resolution(theam_soup, tor_dict['label'])
+        if resolution is None:
+            return {'resolution': None}
+
+        return {
+            'resolution': resolution,
+            'sound': self.get_sound(theam_soup),
+            'kinopoisk_id': self.get_kinopoisk_id(theam_soup),
+        }
 
     def get_kinopoisk_id(self, soup):
         data = soup.find_all('a', {'class', 'postLink'})
@@ -432,17 +646,20 @@ class Rutor(TorrentTracker):
         req = self.connection.get(
             search_url
         )
+        if not self.use_soup:
+            return self.create_torrents(page_parser.parse_rutor_search(req.text, self.site_domain))
+
         soup = BeautifulSoup(req.text, features='lxml')
         regex = re.compile(r'gai|tum')
         tr_linse = soup.find_all('tr', {'class', regex})
-        torrents = []
+        tor_dicts = []
         for tr_line in tr_linse:
-            torrent = self.create_torrent(tr_line)
-            if torrent is not None:
-                torrents.append(torrent)
-        return torrents
+            tor_dict = self.parse_search_line(tr_line)
+            if tor_dict is not None:
+                tor_dicts.append(tor_dict)
+        return self.create_torrents(tor_dicts)
 
-    def create_torrent(self, search_line) -> Torrent or None:
+    def parse_search_line(self, search_line) -> dict or None:
         tor_dict = dict(
             label='', url='', size=0, data='', file_name='',
             pier=0, resolution=None, theam_url='', file_amount=0, kinopoisk_id='', tracker='',
@@ -485,16 +702,25 @@ class Rutor(TorrentTracker):
             return None
         except NameError:
             return None
+        return tor_dict
 
-        resp = self.connection.get(tor_dict['theam_url'])
-        theam_soup = BeautifulSoup(resp.text, features='lxml')
+    def parse_theam_page(self, page_text: str, tor_dict: dict) -> dict:
+        if not self.use_soup:
+            return page_parser.parse_rutor_theam(page_text, tor_dict['label'])
 
-        tor_dict['resolution'] = self.get_resolution(theam_soup, tor_dict['label'])
-        if tor_dict['resolution'] is None:
-            return None
+        theam_soup = BeautifulSoup(page_text, features='lxml')
 
-        tor_dict['kinopoisk_id'] = self.get_kinopoisk_id(theam_soup)
-        tor_dict['tracker'] = self.site_type
+        resolution = self.get_resolution(theam_soup, tor_dict['label'])
+        if resolution is None:
+            return {'resolution': None}
+
+        theam_data = {
+            'resolution': resolution,
+            'kinopoisk_id': self.get_kinopoisk_id(theam_soup),
+            'sound': [],
+            'sub': [],
+            'with_advertising': False,
+        }
 
         details = theam_soup.select('#details')
         if len(details) > 0:
@@ -502,14 +728,14 @@ class Rutor(TorrentTracker):
 
             sounds_re = re.findall(r'^(Language|Язык)\s*:\s*(\w*).*$', details, re.MULTILINE)
             for s_re in sounds_re:
-                tor_dict['sound'].append(s_re[1].upper())
+                theam_data['sound'].append(s_re[1].upper())
 
             sub = re.findall(r'^Субтитры\s*: (\w*).*$', details, re.MULTILINE)
             for s_re in sub:
-                tor_dict['sub'].append(s_re.upper())
-            tor_dict['with_advertising'] = 'реклама'.upper() in details.upper()
+                theam_data['sub'].append(s_re.upper())
+            theam_data['with_advertising'] = 'реклама'.upper() in details.upper()
 
-        return Torrent(**tor_dict)
+        return theam_data
 
     def get_kinopoisk_id(self, soup):
         data = soup.find_all('a')
@@ -560,118 +786,221 @@ def search(conf: TorrentTrackersConfig, text):
     """
     logger.debug(f'Начало поиска по запросу {text}')
 
-    trackers = get_trackers(conf)
+    trackers = get_search_trackers(conf)
     result = []
-    for tracker in trackers:
+    with ThreadPoolExecutor(max_workers=len(trackers), thread_name_prefix='search') as pool:
+        futures = [(tracker, pool.submit(tracker.search, text)) for tracker in trackers]
+    for tracker, future in futures:
         try:
-            result += tracker.search(text)
+            result += future.result()
         except Exception as ex:
             logger.error(f'При поиске по трекеру {tracker.site_name} произошла ошибка: {ex}')
+    logger.debug(f'Запросы к трекерам: {rate_limit_metrics()}')
     return result
 
 
-def download(conf: TorrentTrackersConfig, _url):
+def search_many(conf: TorrentTrackersConfig, texts):
+    """
+    Производит поиск по трекерам сразу по нескольким запросам.
+    Каждый трекер обрабатывает свою очередь уникальных запросов,
+    трекеры опрашиваются параллельно.
+
+    :param conf:
+    :param texts: тексты запросов
+    :return: генератор пар текст запроса - список Torrent в порядке трекеров,
+             пара отдается, как только запрос выполнен всеми трекерами
+    """
+    queries = list(dict.fromkeys(texts))
+    logger.debug(f'Начало поиска по {len(queries)} запросам')
+
+    trackers = get_search_trackers(conf)
+    done = Queue()
+
+    def search_tracker(index, tracker):
+        for text in queries:
+            try:
+                found = tracker.search(text)
+            except Exception as ex:
+                logger.error(f'При поиске по трекеру {tracker.site_name} запроса {text} произошла ошибка: {ex}')
+                found = []
+            done.put((text, index, found))
+
+    partial = {text: {} for text in queries}
+    with ThreadPoolExecutor(max_workers=len(trackers), thread_name_prefix='search') as pool:
+        for index, tracker in enumerate(trackers):
+            pool.submit(search_tracker, index, tracker)
+        for _ in range(len(queries) * len(trackers)):
+            text, index, found = done.get()
+            partial[text][index] = found
+            if len(partial[text]) == len(trackers):
+                tracker_results = partial.pop(text)
+                yield text, [torrent for i in range(len(trackers)) for torrent in tracker_results[i]]
+    logger.debug(f'Запросы к трекерам: {rate_limit_metrics()}')
+
+
+def download(conf: TorrentTrackersConfig, _url, theam_url=None):
     """
     Скачивает с трекера torrent файл
 
     :param conf:
     :param url:
-    :return:
+    :param theam_url: тема раздачи, для которой нужно запомнить скачанный torrent файл
+    :return: данные torrent файла или None, если его не удалось скачать
     """
     url = fix_shema(_url)
     trackers = get_trackers(conf)
     for tracker in trackers:
         if tracker.site_domain in url or tracker.site_download in url:
-            data = get_torrent_details(tracker.get_torrent_data(url))
+            torrent_data = tracker.get_torrent_data(url)
+            if torrent_data is None:
+                return None
+            data = get_torrent_details(torrent_data)
+            if theam_url:
+                tracker.save_topic_marker(fix_shema(theam_url), data)
             return data
 
 
+def topic_changed(conf: TorrentTrackersConfig, _theam_url, file_amount) -> bool:
+    """
+    Проверяет, нужно ли заново скачивать torrent файл темы
+
+    :param conf:
+    :param _theam_url:
+    :param file_amount: количество файлов по последнему скачиванию
+    :return:
+    """
+    theam_url = fix_shema(_theam_url)
+    for tracker in get_trackers(conf):
+        if tracker.site_domain in theam_url:
+            return tracker.topic_changed(theam_url, file_amount)
+    return True
+
+
+def conditional_headers(entry: dict or None) -> dict:
+    """
+    Заголовки условного запроса по сохраненным ETag/Last-Modified
+
+    :param entry: запись TheamCache
+    :return:
+    """
+    headers = {}
+    if entry is not None and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry is not None and entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def parse_info_hash(page_text: str) -> str or None:
+    result = re.search(r'btih:([0-9a-fA-F]{40})', page_text)
+    if result is None:
+        return None
+    return result.group(1).lower()
+
+
 def fix_shema(url):
     if url.startswith('//'):
         return f'https:{url}'
-    if not 'https://' in url:
+    if '://' not in url:
         return f'https://{url}'
     return url
 
 
+class TrackerRegistry:
+    """
+    Хранит экземпляры трекеров процесса краулера.
+
+    Воркеры получают одни и те же трекеры, поэтому http сессии, cookies
+    и авторизация переиспользуются между задачами.
+
+    """
+
+    def __init__(self):
+        self._trackers = {}
+        self._lock = threading.Lock()
+        self._pid = getpid()
+
+    def get_trackers(self, conf: TorrentTrackersConfig) -> list:
+        key = conf.model_dump_json()
+        with self._lock:
+            if self._pid != getpid():
+                # Сессии нельзя разделять между процессами
+                self._trackers = {}
+                self._pid = getpid()
+            trackers = self._trackers.get(key)
+            if trackers is None:
+                trackers = create_trackers(conf)
+                self._trackers[key] = trackers
+        return trackers
+
+    def close(self):
+        with self._lock:
+            for trackers in self._trackers.values():
+                for tracker in trackers:
+                    tracker.close()
+            self._trackers = {}
+
+
+tracker_registry = TrackerRegistry()
+
+
 def get_trackers(conf: TorrentTrackersConfig) -> list:
     """
-    Получает список классов трекеров для обработки
+    Получает список трекеров для обработки из реестра процесса
     :param conf:
     :return:
     """
-    return [
-        # Jacker(conf)
+    return tracker_registry.get_trackers(conf)
+
+
+def create_trackers(conf: TorrentTrackersConfig) -> list:
+    """
+    Создает список классов трекеров для обработки
+    :param conf:
+    :return:
+    """
+    trackers = [
         Rutor(conf),
         Rutracker(conf),
     ]
+    if conf.jackett_cfg is None:
+        return trackers
+
+    from .jasket_tracker import Jacker
+    return [Jacker(conf)] + trackers
+
+
+def get_search_trackers(conf: TorrentTrackersConfig) -> list:
+    """
+    Получает список трекеров для поиска.
+    Трекеры, замененные Jackett, исключаются только из поиска: по ним
+    по-прежнему скачиваются torrent файлы и проверяются темы уже найденных раздач.
+
+    :param conf:
+    :return:
+    """
+    trackers = get_trackers(conf)
+    if conf.jackett_cfg is None or not conf.jackett_cfg.replace_trackers:
+        return trackers
+    # Jackett сам опрашивает трекеры, страницы поиска и тем не загружаются
+    return [tracker for tracker in trackers if tracker.site_type == TorrentType.JACKETT]
 
 
 def get_torrent_details(data_dict):
+    """
+    Дополняет данные скачанного torrent файла количеством медиа файлов и info hash
 
+    :param data_dict: результат get_torrent_data
+    :return:
+    """
     try:
-        torrent_ditails = bencodepy.decode(data_dict['data'])
-    except bencodepy.exceptions.DecodingError:
-        torrent_ditails = None
+        torrent_ditails = read_torrent_meta(data_dict['data'])
+    except TorrentMetaError:
+        torrent_ditails = {'file_amount': 0}
     except TypeError:
-        torrent_ditails = None
-
-    file_amount = 0
+        torrent_ditails = {'file_amount': 0}
 
-    if torrent_ditails is None:
-        file_amount = 0
-        torrent_ditails = {}
-
-    elif b'files' in torrent_ditails[b'info'].keys():
-        file_amount = len([i for i in torrent_ditails.get(b"info", {}).get(b"files", {}) if get_ext(i.get(b'path')[-1]) in media_ext()])
-    elif b'name' in torrent_ditails[b'info'].keys():
-        file_amount = 1
-    torrent_ditails.update({'file_amount': file_amount})
     torrent_ditails.update(data_dict)
 
     return torrent_ditails
 
-
-def get_ext(path):
-    p = path
-    if isinstance(path, bytes):
-        p = path.decode('utf-8')
-    path_part = p.split('.')
-    return path_part[-1]
-
-
-def media_ext():
-    return [
-        '3g2',
-        '3gp',
-        '3gp2',
-        '3gpp',
-        'avi',
-        'dat',
-        'drv',
-        'f4v',
-        'flv',
-        'gtp',
-        'h264',
-        'm4v',
-        'mkv',
-        'mod',
-        'moov',
-        'mov',
-        'mp4',
-        'mpeg',
-        'mpg',
-        'mts',
-        'rmvb',
-        'spl',
-        'stl',
-        'ts',
-        'vcd',
-        'vid',
-        'vid',
-        'vid',
-        'vob',
-        'webm',
-        'wmv',
-        'yuv',
-    ]
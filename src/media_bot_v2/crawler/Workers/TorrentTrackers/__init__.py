@@ -1,2 +1,2 @@
-from .Trackers import Torrent, search, download
+from .Trackers import Torrent, search, search_many, download, topic_changed
 from .jasket_tracker import Jacker
\ No newline at end of file
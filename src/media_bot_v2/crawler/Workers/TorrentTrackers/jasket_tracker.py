@@ -1,19 +1,142 @@
+import hashlib
+import logging
+import re
+import threading
+
 import requests
 
+from media_bot_v2.app_enums import TorrentType
 from media_bot_v2.config import TorrentTrackersConfig
 
-from media_bot_v2.crawler.Workers.jasket_api import Config, Client
+from media_bot_v2.crawler.Workers.jasket_api import Config, Client, SearchResult
+
+from .Trackers import AbcTorrentTracker, Torrent
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = ['720', '1080', '2160']
+
+# Признаки русской озвучки в названии раздачи
+RUSSIAN_SOUND = re.compile(
+    r'дубл|многоголос|двухголос|одноголос|любительск|профессиональн|\b(?:MVO|DVO|AVO|Dub|Rus)\b',
+    re.IGNORECASE
+)
 
 
-class Jacker:
+class Jacker(AbcTorrentTracker):
+    """
+    Поиск через Jackett
+
+    Jackett сам опрашивает настроенные индексаторы и возвращает результат
+    одним Torznab ответом: сиды, размер, количество файлов и IMDb id уже
+    есть в атрибутах, страницы тем загружать не нужно.
+
+    """
 
     def __init__(self, config: TorrentTrackersConfig):
         self.config = config
-        self.api = Client(Config())
+        self.jackett_cfg = config.jackett_cfg
+        self._api = None
+        self._lock = threading.Lock()
+
+    def login(self):
+        # Авторизация выполняется ключом api в каждом запросе
+        return True
+
+    def search(self, text: str) -> [Torrent]:
+        categories = self.jackett_cfg.film_categories
+        if re.search(r'сезон', text) is not None:
+            categories = self.jackett_cfg.serial_categories
 
-    def search(self, text: str):
-        return []
+        results = self.api.search(text, categories, timeout=self.jackett_cfg.timeout)
+        torrents = []
+        for result in results:
+            torrent = self.create_torrent(result)
+            if torrent is not None:
+                torrents.append(torrent)
+        logger.debug('Jackett по запросу {0}: найдено {1}, подходит {2}'.format(text, len(results), len(torrents)))
+        return torrents
+
+    def create_torrent(self, result: SearchResult) -> Torrent or None:
+        resolution = self.get_resolution(result.title)
+        if resolution is None or not result.link:
+            return None
+        if result.link.startswith('magnet:'):
+            # torrent файл раздачи, доступной только по magnet ссылке, скачать нельзя
+            return None
+        imdb = re.search(r'\d{3,}', result.imdb)
+        return Torrent(
+            label=result.title,
+            url=result.link,
+            size=round(result.size / 1024 ** 3, 2),
+            data='',
+            file_name='{}.torrent'.format(result.info_hash or hashlib.sha1(result.link.encode()).hexdigest()),
+            pier=result.seeders,
+            resolution=resolution,
+            theam_url=result.comments or result.guid,
+            file_amount=result.files,
+            kinopoisk_id=imdb.group() if imdb is not None else '',
+            tracker=self.site_type,
+            sound=['RUSSIAN'] if RUSSIAN_SOUND.search(result.title) else [],
+            sub=[],
+        )
 
     def get_torrent_data(self, url: str):
+        req = self.api.download(url, timeout=self.jackett_cfg.timeout, allow_redirects=False)
+        if req.is_redirect and req.headers.get('Location', '').startswith('magnet:'):
+            logger.error('Раздача {} доступна только по magnet ссылке'.format(url))
+            return None
+        req.raise_for_status()
+        torr_id = re.search(r'[?&]file=([^&]+)', url)
+        return {
+            'data': req.content,
+            'id': torr_id.group(1) if torr_id is not None else ''
+        }
+
+    def topic_changed(self, theam_url: str, file_amount: int) -> bool:
+        return True
+
+    def save_topic_marker(self, theam_url: str, torrent_details: dict):
+        pass
+
+    @staticmethod
+    def get_resolution(title: str):
+        for res in RESOLUTIONS:
+            if res in title:
+                return res
         return None
 
+    def close(self):
+        if self._api is None:
+            return
+        self._api.close()
+        self._api = None
+
+    @property
+    def api(self) -> Client:
+        if self._api is None:
+            with self._lock:
+                if self._api is None:
+                    self._api = Client(Config(
+                        host=self.jackett_cfg.host,
+                        port=self.jackett_cfg.port,
+                        token=self.jackett_cfg.api_key,
+                        indexer_name=self.jackett_cfg.indexer,
+                    ), requests.Session())
+        return self._api
+
+    @property
+    def site_type(self):
+        return TorrentType.JACKETT
+
+    @property
+    def site_name(self):
+        return 'jackett'
+
+    @property
+    def site_domain(self):
+        return '{0}:{1}'.format(self.jackett_cfg.host, self.jackett_cfg.port)
+
+    @property
+    def site_download(self):
+        return self.site_domain
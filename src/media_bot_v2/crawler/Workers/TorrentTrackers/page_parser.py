@@ -0,0 +1,258 @@
+"""
+Разбор страниц трекеров скомпилированными выражениями XPath
+
+Страница разбирается lxml без построения дерева BeautifulSoup, выражения
+XPath компилируются один раз при импорте. Результат совпадает с разбором
+BeautifulSoup в Rutor и Rutracker (TorrentTrackersConfig.html_parser = 'bs4').
+
+Разрешение раздачи определяется только по названию, поэтому страница темы
+без разрешения в названии не разбирается.
+
+"""
+import re
+
+from lxml import etree, html
+
+RESOLUTIONS = ('720', '1080')
+
+# Страница разбирается в кодировке переданного текста, а не из meta страницы
+_parser = html.HTMLParser(encoding='utf-8')
+
+
+def _has_class(name: str) -> str:
+    return "contains(concat(' ', normalize-space(@class), ' '), ' {} ')".format(name)
+
+
+_td = etree.XPath('.//td')
+_a = etree.XPath('.//a')
+_b = etree.XPath('.//b')
+
+_rutor_rows = etree.XPath("//tr[contains(@class, 'gai') or contains(@class, 'tum')]")
+_rutor_seeders = etree.XPath('.//span[{}]'.format(_has_class('green')))
+_rutor_links = etree.XPath('//a[@href]')
+_rutor_details = etree.XPath("//*[@id='details']")
+
+_rutracker_rows = etree.XPath(
+    "//tr[contains(@class, 'tCenter hl-tr')][normalize-space(../../@class) = 'forumline tablesorter']"
+)
+_rutracker_post_links = etree.XPath('//a[@href][{}]'.format(_has_class('postLink')))
+_media_info = etree.XPath("//text()[contains(., 'Format/Info')]")
+
+_size_re = re.compile(r'\d+.\d{0,2}')
+_digits_re = re.compile(r'\d+')
+_sound_re = re.compile(r'^(Language|Язык)\s*:\s*(\w*).*$', re.MULTILINE)
+_sub_re = re.compile(r'^Субтитры\s*: (\w*).*$', re.MULTILINE)
+_media_info_id_re = re.compile(r'^ID.*$', re.MULTILINE)
+
+
+def parse_page(page_text: str):
+    return html.document_fromstring(page_text.encode('utf-8'), parser=_parser)
+
+
+def normalize_size(size: str) -> float:
+    coef = 1
+    if 'MB' in size.upper():
+        coef = 0.001
+
+    result = _size_re.search(size)
+    if result is None:
+        return 0
+    return float(result.group()) * coef
+
+
+def get_resolution(title: str) -> str or None:
+    for res in RESOLUTIONS:
+        if res in title:
+            return res
+    return None
+
+
+def empty_torrent() -> dict:
+    return dict(
+        label='', url='', size=0, data='', file_name='',
+        pier=0, resolution=None, theam_url='', file_amount=0, kinopoisk_id='', tracker='',
+        sound=[], sub=[]
+    )
+
+
+def parse_rutor_search(page_text: str, site_domain: str) -> list:
+    """
+    Разбирает страницу поиска Rutor
+
+    :param page_text:
+    :param site_domain: адрес трекера для ссылок на темы
+    :return: данные строк результата поиска
+    """
+    tor_dicts = []
+    for row in _rutor_rows(parse_page(page_text)):
+        tor_dict = parse_rutor_row(row, site_domain)
+        if tor_dict is not None:
+            tor_dicts.append(tor_dict)
+    return tor_dicts
+
+
+def parse_rutor_row(row, site_domain: str) -> dict or None:
+    cells = _td(row)
+    if len(cells) == 4:
+        title_num, size_num, pier_num = 1, 2, 3
+    elif len(cells) == 5:
+        title_num, size_num, pier_num = 1, 3, 4
+    else:
+        return None
+
+    links = _a(cells[title_num])
+    if len(links) < 3 or links[0].get('href') is None or links[2].get('href') is None:
+        return None
+    tor_dict = empty_torrent()
+    tor_dict['with_advertising'] = False
+    tor_dict['url'] = links[0].get('href')
+    file_name = _digits_re.search(tor_dict['url'])
+    if file_name is not None:
+        tor_dict['file_name'] = 't_{}.torrent'.format(file_name.group())
+    tor_dict['label'] = links[2].text_content()
+    tor_dict['theam_url'] = '{1}/{0}'.format(links[2].get('href'), site_domain)
+    tor_dict['size'] = normalize_size(cells[size_num].text_content())
+    try:
+        for seeders in _rutor_seeders(cells[pier_num]):
+            tor_dict['pier'] = int(seeders.text_content())
+    except ValueError:
+        return None
+    return tor_dict
+
+
+def parse_rutor_theam(page_text: str, label: str) -> dict:
+    """
+    Разбирает страницу темы Rutor
+
+    :param page_text:
+    :param label: название раздачи
+    :return: данные раздачи со страницы темы
+    """
+    resolution = get_resolution(label)
+    if resolution is None:
+        return {'resolution': None}
+
+    page = parse_page(page_text)
+    theam_data = {
+        'resolution': resolution,
+        'kinopoisk_id': get_imdb_id(_rutor_links(page), r'\d{3,}'),
+        'sound': [],
+        'sub': [],
+        'with_advertising': False,
+    }
+
+    details = _rutor_details(page)
+    if details:
+        details = details[0].text_content()
+        theam_data['sound'] = [s_re[1].upper() for s_re in _sound_re.findall(details)]
+        theam_data['sub'] = [s_re.upper() for s_re in _sub_re.findall(details)]
+        theam_data['with_advertising'] = 'реклама'.upper() in details.upper()
+    return theam_data
+
+
+def parse_rutracker_search(page_text: str, site_domain: str) -> list:
+    """
+    Разбирает страницу поиска Rutracker
+
+    :param page_text:
+    :param site_domain: адрес трекера для ссылок на темы и torrent файлы
+    :return: данные строк результата поиска
+    """
+    tor_dicts = []
+    for row in _rutracker_rows(parse_page(page_text)):
+        tor_dict = parse_rutracker_row(row, site_domain)
+        if tor_dict is not None:
+            tor_dicts.append(tor_dict)
+    return tor_dicts
+
+
+def parse_rutracker_row(row, site_domain: str) -> dict or None:
+    tor_dict = empty_torrent()
+    for cell in _td(row):
+        classes = (cell.get('class') or '').split()
+        if 't-title-col' in classes:
+            link = first(_a(cell))
+            if link is None:
+                return None
+            tor_dict['label'] = link.text_content()
+            tor_dict['theam_url'] = '{1}/{0}'.format(link.get('href'), site_domain)
+        elif 'tor-size' in classes:
+            link = first(_a(cell))
+            if link is None or link.get('href') is None:
+                return None
+            tor_dict['size'] = normalize_size(link.text_content())
+            tor_dict['url'] = '{1}/{0}'.format(link.get('href'), site_domain)
+            file_name = _digits_re.search(link.get('href'))
+            if file_name is not None:
+                tor_dict['file_name'] = 't_{}.torrent'.format(file_name.group())
+        elif classes == ['row4', 'nowrap']:
+            seeders = first(_b(cell))
+            if seeders is None:
+                return None
+            try:
+                tor_dict['pier'] = int(seeders.text_content())
+            except ValueError:
+                return None
+    return tor_dict
+
+
+def parse_rutracker_theam(page_text: str, label: str) -> dict:
+    """
+    Разбирает страницу темы Rutracker
+
+    :param page_text:
+    :param label: название раздачи
+    :return: данные раздачи со страницы темы
+    """
+    resolution = get_resolution(label)
+    if resolution is None:
+        return {'resolution': None}
+
+    page = parse_page(page_text)
+    return {
+        'resolution': resolution,
+        'sound': get_media_info_sound(page),
+        'kinopoisk_id': get_imdb_id(_rutracker_post_links(page), r'\d+'),
+    }
+
+
+def get_imdb_id(links, pattern: str) -> str:
+    for link in links:
+        href = link.get('href')
+        if 'www.imdb.com' in href:
+            result = re.search(pattern, href)
+            return result.group() if result is not None else ''
+    return ''
+
+
+def get_media_info_sound(page) -> list:
+    texts = _media_info(page)
+    if not texts:
+        return []
+    text = texts[0]
+    # Текст после закрывающего тега относится к родителю этого тега
+    parent = text.getparent().getparent() if text.is_tail else text.getparent()
+    media_info = parse_media_info(parent.text_content())
+    return [
+        info.get('Language', 'none').upper()
+        for info in media_info if 'AUDIO' in info.get('Format/Info', '').upper()
+    ]
+
+
+def parse_media_info(media_info_text: str) -> list:
+    media_info = []
+    for block in _media_info_id_re.split(media_info_text):
+        if not block.startswith('\n'):
+            continue
+        info = {}
+        for line in block.split('\n'):
+            if not line:
+                continue
+            k, v = line.split(" : ")
+            info[k.strip()] = v.strip()
+        media_info.append(info)
+    return media_info
+
+
+def first(elements):
+    return elements[0] if elements else None
@@ -0,0 +1,175 @@
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from media_bot_v2.config import TorrentTrackersConfig
+
+logger = logging.getLogger(__name__)
+
+# Ответы, при которых трекер просит снизить нагрузку
+THROTTLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class DomainRateLimiter:
+    """
+    Ограничивает частоту запросов к одному домену.
+
+    Запросы выдаются по алгоритму token bucket: rate запросов в секунду,
+    не более burst подряд. При ответах 429/5xx, ошибках соединения и таймаутах
+    запросы к домену приостанавливаются, пауза удваивается при повторах
+    и сокращается после успешных ответов.
+
+    """
+
+    def __init__(self, domain: str, rate: float, burst: int, max_backoff: float):
+        self.domain = domain
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_backoff = max_backoff
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._backoff = 0.0
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.wait_time = 0.0
+
+    def acquire(self):
+        """
+        Ожидает возможности выполнить запрос
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.requests += 1
+                    self.wait_time += waited
+                    return
+                delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def success(self):
+        with self._lock:
+            self._backoff = self._backoff / 2 if self._backoff >= 2 else 0.0
+
+    def throttle(self, retry_after: float = None):
+        """
+        Приостанавливает запросы к домену после отказа трекера
+
+        :param retry_after: пауза, запрошенная трекером в заголовке Retry-After
+        """
+        with self._lock:
+            self.throttled += 1
+            self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff)
+            pause = self._backoff if retry_after is None else min(retry_after, self.max_backoff)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+        logger.warning('Трекер {0} ограничивает запросы, пауза {1:.1f} с.'.format(self.domain, pause))
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+            self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + self._backoff)
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    @property
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'errors': self.errors,
+                'wait_time': round(self.wait_time, 3),
+                'backoff': self._backoff,
+            }
+
+
+class RateLimitedSession(requests.Session):
+    """
+    Сессия, выполняющая запросы через ограничитель частоты домена.
+    Запросы без явного timeout ограничены request_timeout настроек.
+
+    """
+
+    def __init__(self, config: TorrentTrackersConfig):
+        super(RateLimitedSession, self).__init__()
+        self.config = config
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', self.config.request_timeout)
+        limiter = get_rate_limiter(url, self.config)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            try:
+                resp = super(RateLimitedSession, self).request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                limiter.error()
+                raise
+            if resp.status_code not in THROTTLE_STATUSES:
+                limiter.success()
+                return resp
+            limiter.throttle(get_retry_after(resp))
+            if attempt >= self.config.max_retries:
+                resp.raise_for_status()
+                return resp
+            attempt += 1
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(url: str, config: TorrentTrackersConfig) -> DomainRateLimiter:
+    """
+    Возвращает общий для процесса ограничитель частоты запросов к домену url
+
+    :param url:
+    :param config:
+    :return:
+    """
+    domain = urlparse(url).netloc
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(domain)
+        if limiter is None:
+            limiter = DomainRateLimiter(
+                domain,
+                config.requests_per_second,
+                config.requests_burst,
+                config.max_backoff,
+            )
+            _rate_limiters[domain] = limiter
+    return limiter
+
+
+def rate_limit_metrics() -> dict:
+    """
+    Метрики запросов по доменам трекеров
+    """
+    with _rate_limiters_lock:
+        limiters = list(_rate_limiters.values())
+    return {limiter.domain: limiter.metrics for limiter in limiters}
+
+
+def get_retry_after(resp) -> float or None:
+    value = resp.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
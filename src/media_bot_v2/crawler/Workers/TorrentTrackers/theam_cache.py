@@ -0,0 +1,100 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TheamCache:
+    """
+    Кэш разобранных данных страниц тем трекера.
+
+    Данные хранятся в памяти и в файле, ключ - url темы.
+    Запись считается актуальной ttl секунд, после чего проверяется
+    условным запросом по ETag/Last-Modified. При превышении max_size
+    удаляются давно не использованные записи.
+
+    """
+
+    def __init__(self, file_name: str, ttl: int, max_size: int):
+        self.file_name = file_name
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> dict or None:
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            self.entries.move_to_end(url)
+            return copy.deepcopy(entry)
+
+    def put(self, url: str, data: dict, etag: str = None, last_modified: str = None):
+        with self._lock:
+            self.entries[url] = {
+                'time': time.time(),
+                'etag': etag,
+                'last_modified': last_modified,
+                'data': copy.deepcopy(data),
+            }
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            self._dirty = True
+
+    def touch(self, url: str):
+        """
+        Продлевает срок жизни записи, если страница темы не изменилась
+        """
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return
+            entry['time'] = time.time()
+            self._dirty = True
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry['time'] < self.ttl
+
+    def load(self) -> OrderedDict:
+        if not os.path.exists(self.file_name):
+            return OrderedDict()
+        try:
+            with open(self.file_name, 'r', encoding='utf-8') as file:
+                entries = json.load(file, object_pairs_hook=OrderedDict)
+        except (OSError, ValueError) as ex:
+            logger.error('Не удалось загрузить кэш тем {0}: {1}'.format(self.file_name, ex))
+            return OrderedDict()
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+        return entries
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_name = '{}.tmp'.format(self.file_name)
+            try:
+                with open(tmp_name, 'w', encoding='utf-8') as file:
+                    json.dump(self.entries, file, ensure_ascii=False)
+                os.replace(tmp_name, self.file_name)
+                self._dirty = False
+            except OSError as ex:
+                logger.error('Не удалось сохранить кэш тем {0}: {1}'.format(self.file_name, ex))
+
+    @property
+    def entries(self) -> OrderedDict:
+        if self._entries is None:
+            self._entries = self.load()
+        return self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self.entries)
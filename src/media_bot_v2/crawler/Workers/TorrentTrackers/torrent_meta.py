@@ -0,0 +1,159 @@
+"""
+Потоковое чтение метаданных torrent файла
+
+Из файла извлекаются только имя раздачи, пути файлов и info hash.
+Остальные значения, в том числе большой блок pieces, пропускаются без разбора.
+
+"""
+import hashlib
+
+MEDIA_EXTENSIONS = frozenset([
+    b'3g2',
+    b'3gp',
+    b'3gp2',
+    b'3gpp',
+    b'avi',
+    b'dat',
+    b'drv',
+    b'f4v',
+    b'flv',
+    b'gtp',
+    b'h264',
+    b'm4v',
+    b'mkv',
+    b'mod',
+    b'moov',
+    b'mov',
+    b'mp4',
+    b'mpeg',
+    b'mpg',
+    b'mts',
+    b'rmvb',
+    b'spl',
+    b'stl',
+    b'ts',
+    b'vcd',
+    b'vid',
+    b'vob',
+    b'webm',
+    b'wmv',
+    b'yuv',
+])
+
+_INT = ord('i')
+_LIST = ord('l')
+_DICT = ord('d')
+_END = ord('e')
+
+
+class TorrentMetaError(ValueError):
+    pass
+
+
+def read_torrent_meta(data: bytes) -> dict:
+    """
+    Читает метаданные torrent файла
+
+    :param data: содержимое torrent файла
+    :return: {'name', 'file_amount', 'info_hash'}
+    """
+    try:
+        return _read_torrent_meta(data)
+    except (IndexError, ValueError) as ex:
+        raise TorrentMetaError('Не корректный torrent файл: {}'.format(ex)) from None
+
+
+def _read_torrent_meta(data: bytes) -> dict:
+    if data[0] != _DICT:
+        raise TorrentMetaError('ожидается словарь')
+    pos = 1
+    info_start = info_end = None
+    while data[pos] != _END:
+        key, pos = _read_string(data, pos)
+        end = _skip(data, pos)
+        if key == b'info':
+            info_start, info_end = pos, end
+        pos = end
+    if info_start is None or data[info_start] != _DICT:
+        raise TorrentMetaError('нет словаря info')
+
+    name = None
+    file_amount = None
+    pos = info_start + 1
+    while data[pos] != _END:
+        key, pos = _read_string(data, pos)
+        if key == b'name':
+            name, pos = _read_string(data, pos)
+        elif key == b'files':
+            file_amount, pos = _count_media_files(data, pos)
+        else:
+            pos = _skip(data, pos)
+
+    if file_amount is None:
+        # Раздача из одного файла
+        file_amount = 0 if name is None else 1
+
+    return {
+        'name': name,
+        'file_amount': file_amount,
+        'info_hash': hashlib.sha1(data[info_start:info_end]).hexdigest(),
+    }
+
+
+def _count_media_files(data: bytes, pos: int) -> (int, int):
+    if data[pos] != _LIST:
+        raise TorrentMetaError('files должен быть списком')
+    pos += 1
+    count = 0
+    while data[pos] != _END:
+        if data[pos] != _DICT:
+            raise TorrentMetaError('описание файла должно быть словарем')
+        pos += 1
+        file_name = None
+        while data[pos] != _END:
+            if data.startswith(b'4:path', pos):
+                file_name, pos = _read_last_string(data, pos + 6)
+            else:
+                pos = _skip(data, _skip(data, pos))
+        pos += 1
+        if file_name is not None and file_name.rpartition(b'.')[2] in MEDIA_EXTENSIONS:
+            count += 1
+    return count, pos + 1
+
+
+def _read_last_string(data: bytes, pos: int) -> (bytes, int):
+    if data[pos] != _LIST:
+        raise TorrentMetaError('path должен быть списком')
+    pos += 1
+    value = None
+    while data[pos] != _END:
+        value, pos = _read_string(data, pos)
+    return value, pos + 1
+
+
+def _read_string(data: bytes, pos: int) -> (bytes, int):
+    colon = data.index(b':', pos)
+    start = colon + 1
+    end = start + int(data[pos:colon])
+    if end > len(data):
+        raise TorrentMetaError('строка выходит за пределы файла')
+    return data[start:end], end
+
+
+def _skip(data: bytes, pos: int) -> int:
+    """
+    Возвращает позицию за значением, начинающимся с pos
+    """
+    token = data[pos]
+    if token == _INT:
+        return data.index(b'e', pos) + 1
+    if token == _LIST or token == _DICT:
+        pos += 1
+        while data[pos] != _END:
+            pos = _skip(data, pos)
+        return pos + 1
+    colon = data.index(b':', pos)
+    end = colon + 1 + int(data[pos:colon])
+    if end > len(data):
+        raise TorrentMetaError('строка выходит за пределы файла')
+    return end
@@ -1,15 +1,15 @@
 import logging
 from typing import List
 from queue import Empty
-import time
 
 from media_bot_v2.mediator import send_message, command_message, crawler_message
 from media_bot_v2.app_enums import ComponentType, ClientCommands, LockingStatus, MediaType, ActionType
 from media_bot_v2.crawler.Workers.WorkerABC import Worker
-from media_bot_v2.crawler.Workers.TorrentTrackers import search, Torrent
-from media_bot_v2.config import TorrentTrackersConfig
+from media_bot_v2.crawler.Workers.TorrentTrackers import search, search_many, Torrent
+from media_bot_v2.config import MatchConfig, TorrentTrackersConfig
 
-from .utils import add_media_keys, construct_upd_data
+from .torrent_match import TorrentMatcher
+from .utils import MediaTaskGroup, add_media_keys, construct_upd_data
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +23,7 @@ class TorrentSearchWorker(Worker):
     def __init__(self, job, config: TorrentTrackersConfig):
         super(TorrentSearchWorker, self).__init__(job, config)
         self.serial_torrents = 8
+        self.delivered = False
 
     def get_target(self):
         return self.work
@@ -34,78 +35,104 @@ class TorrentSearchWorker(Worker):
         logger.debug('Torrent worker ended.')
 
     def get_best_match(self, data: List[Torrent]):
+        return get_best_match(data, self.job, self.serial_torrents, self.config.match_cfg)
 
-        if len(data) == 0:
-            return None
-
-        f_list = [lambda x: not x.kinopoisk_id == '']
-        f_data = filter(lambda x: not x.kinopoisk_id == '', data)
-
-        if len(list(f_data)) > 5 or len(list(f_data)) >= len(data) / 2:
-            if not self.job.media_id == -1:
-                f_list.append(lambda x: x.kinopoisk_id == self.job.media_id)
+    @property
+    def result(self):
+        try:
+            data = self.returned_data.get(block=False)
+        except Empty:
+            data = None
+        if data is None and (self.delivered or not self.ended):
+            return []
+        self.delivered = True
+        return search_result_messages(data, self.job)
 
-        if self.job.season == '':
-            f_list.append(lambda x: x.file_amount < 4)
-            f_list.append(lambda x: x.size <= float(15))
-            f_list.append(lambda x: x.size >= float(3.5))
 
-        sound_f = lambda x: 'RUSSIAN' in x.sound
-        if len(list(filter(sound_f, data))) != 0 or len(data) == 1:
-            f_list.append(sound_f)
+class BulkSearchWorker(Worker):
+    """
+    Класс реализует поиск торрентов по группе задач
 
-        f_list.append(lambda x: not x.with_advertising)
+    Уникальные запросы группы выполняются на трекерах один раз,
+    лучший результат выбирается для каждой задачи отдельно.
 
-        result = data
-        for filter_func in f_list:
-            new_data = list(filter(filter_func, result))
-            result = new_data
+    """
 
-        if len(list(result)) == 0:
-            current_year = int(time.asctime().split(' ')[-1])
-            # Если это старый фильм\сериал возможно, что нет стандартного качества, будем предлагать выбор
-            if self.job.year < current_year - 15:
-                result = data
-            else:
-                return None
+    def __init__(self, job: MediaTaskGroup, config: TorrentTrackersConfig):
+        super(BulkSearchWorker, self).__init__(job, config)
+        self.serial_torrents = 8
 
-        s_data = sorted(list(result), key=lambda x: x.pier, reverse=True)
-        res = list(s_data)
+    def get_target(self):
+        return self.work
 
-        return res[0:self.serial_torrents]
+    def work(self):
+        logger.debug('Start bulk torrent worker {}.'.format(self.job))
+        # Результаты отдаются по мере выполнения запросов, чтобы долгий обход
+        # не терял уже найденное при снятии воркера по таймауту
+        for text, found in search_many(self.config, self.job.text_queries):
+            for task in self.job.tasks:
+                if task.text_query != text:
+                    continue
+                try:
+                    data = get_best_match(found, task, self.serial_torrents, self.config.match_cfg)
+                except Exception as ex:
+                    logger.error('При выборе раздачи по задаче {0} произошла ошибка {1}'.format(task, ex))
+                    continue
+                self.returned_data.put((task, data))
+        logger.debug('Bulk torrent worker ended.')
 
     @property
     def result(self):
-        try:
-            data = self.returned_data.get(block=False)
-        except Empty:
-            data = None
-        if data is None:
-            if self.ended:
-                logger.debug('Поиск по задаче {0} не дал результата'.format(self.job))
-                if not self.job.action_type.value == ActionType.FORCE_CHECK.value:
-                    return []
-                message_text = '{0} по запросу {1} не найден, ' \
-                               'но я буду искать его непрестанно.'\
-                    .format('Фильм' if self.job.season == '' else 'Сериал',
-                            self.job.text_query)
-                return [send_message(
-                    ComponentType.CRAWLER,
-                    {
-                        'user_id': self.job.client_id,
-                        'message_text': message_text,
-                        'choices': []
-                    }
-                )]
-            else:
-                return []
-
         messages = []
-        cmd_message = success_message(data, self.job)
-        messages.append(cmd_message)
+        while True:
+            try:
+                task, data = self.returned_data.get(block=False)
+            except Empty:
+                break
+            messages += search_result_messages(data, task)
         return messages
 
 
+def get_best_match(data: List[Torrent], job, serial_torrents=8, config: MatchConfig = None):
+    """
+    Выбирает лучшие раздачи из результатов поиска
+
+    :param data: результаты поиска
+    :param job: задача поиска
+    :param serial_torrents: максимальное количество раздач
+    :param config: правила выбора, по умолчанию MatchConfig()
+    :return: список раздач или None, если подходящих нет
+    """
+    return TorrentMatcher(config).best_match(data, job, serial_torrents)
+
+
+def search_result_messages(data, job) -> list:
+    """
+    Формирует сообщения по результату поиска для задачи
+
+    :param data: выбранные раздачи или None
+    :param job:
+    :return:
+    """
+    if data is None:
+        logger.debug('Поиск по задаче {0} не дал результата'.format(job))
+        if not job.action_type.value == ActionType.FORCE_CHECK.value:
+            return []
+        message_text = '{0} по запросу {1} не найден, ' \
+                       'но я буду искать его непрестанно.'\
+            .format('Фильм' if job.season == '' else 'Сериал',
+                    job.text_query)
+        return [send_message(
+            ComponentType.CRAWLER,
+            {
+                'user_id': job.client_id,
+                'message_text': message_text,
+                'choices': []
+            }
+        )]
+    return [success_message(data, job)]
+
+
 def success_message(data, job):
     if len(data) == 1:
         return film_success_message(data.pop(), job)
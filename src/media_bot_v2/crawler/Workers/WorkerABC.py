@@ -1,29 +1,36 @@
 from abc import ABCMeta, abstractmethod
-from multiprocessing import Process, Queue
-from threading import Thread
+from concurrent.futures import Executor
+import logging
+import queue
+import time
 
 
 from media_bot_v2.config import Config
 from .utils import MediaTask
 
+logger = logging.getLogger(__name__)
+
 
 class AbstractCrawlerWorker(metaclass=ABCMeta):
     """
-    Абстрактный класс описывает worker, который выполняется в отдельном процессе
+    Абстрактный класс описывает worker, который выполняется в пуле потоков краулера
     и выполняет необходимые действия
 
     """
 
     def __init__(self, job: MediaTask, config: Config):
         self.process = None
-        self.returned_data = Queue()
+        self.returned_data = None
         self.job = job
         self.config = config
 
     @abstractmethod
-    def start(self):
+    def start(self, executor: Executor, on_event=None):
         """
         Запускает исполнение операции
+
+        :param executor: пул, в котором выполняется операция
+        :param on_event: вызывается с воркером при появлении результата и по завершении
         :return:
         """
         pass
@@ -61,18 +68,81 @@ class AbstractCrawlerWorker(metaclass=ABCMeta):
         return 'Worker <{0} {1}>'.format(self.__class__.__name__, self.job)
 
 
+class ResultQueue(queue.Queue):
+    """
+    Очередь результатов воркера, сообщающая о каждом новом результате
+    """
+
+    def __init__(self):
+        super(ResultQueue, self).__init__()
+        self.on_put = None
+
+    def put(self, item, block=True, timeout=None):
+        super(ResultQueue, self).put(item, block, timeout)
+        if self.on_put is not None:
+            self.on_put()
+
+
 class Worker(AbstractCrawlerWorker):
-    def start(self):
+    def __init__(self, job: MediaTask, config: Config):
+        super(Worker, self).__init__(job, config)
+        # Воркер выполняется в потоке, результат доступен сразу после добавления
+        self.returned_data = ResultQueue()
+        self.completed = False
+        self.started_at = None
+        self.on_event = None
+
+    def start(self, executor: Executor, on_event=None):
         """
         Точка запуска процесса исполнения
+
+        :param executor: пул потоков краулера
+        :param on_event: вызывается с воркером при появлении результата и по завершении
         :return:
         """
-        self.process = Thread(target=self.get_target())
-        self.process.start()
+        self.on_event = on_event
+        if on_event is not None:
+            self.returned_data.on_put = self.notify
+        self.process = executor.submit(self.run, self.get_target())
+
+    def run(self, target):
+        self.started_at = time.monotonic()
+        try:
+            target()
+        except Exception:
+            logger.exception('Ошибка выполнения воркера {}'.format(self))
+        finally:
+            self.completed = True
+            self.notify()
+
+    def expired(self, timeout: float) -> bool:
+        """
+        Проверяет, выполняется ли воркер дольше timeout секунд
+        """
+        return self.started_at is not None and time.monotonic() - self.started_at > timeout
+
+    @property
+    def alive(self) -> bool:
+        """
+        Проверяет, занимает ли воркер поток пула, в том числе после остановки
+        """
+        return self.process is not None and not self.process.done()
+
+    def notify(self):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(self)
+        except Exception as ex:
+            logger.error('Ошибка обработчика событий воркера {0}: {1}'.format(self, ex))
 
     def kill(self):
-        if not self.ended:
-            self.process.join()
+        """
+        Отменяет ожидающий запуска воркер. Выполняющийся поток остановить нельзя,
+        его результат больше не забирается.
+        """
+        if self.process is not None and not self.process.cancel() and not self.ended:
+            logger.warning('Воркер {} продолжает выполняться после остановки'.format(self))
 
     def get_target(self):
         """
@@ -94,7 +164,8 @@ class Worker(AbstractCrawlerWorker):
     @property
     def ended(self):
         """
-        Проверяет закончено ли выполнение процесса
+        Проверяет закончено ли выполнение процесса.
+        Все результаты к этому моменту уже находятся в returned_data.
         :return:
         """
-        return not self.process.is_alive()
+        return self.completed
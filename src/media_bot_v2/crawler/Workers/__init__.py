@@ -1,3 +1,3 @@
-from .TorrentWorker import TorrentSearchWorker
+from .TorrentWorker import TorrentSearchWorker, BulkSearchWorker
 from .TorrentClientWorker import get_torrent_worker
 from .DownloadWorker import DownloadWorker
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""
+Общие подключения к торрент клиенту
+
+Подключение и авторизация выполняются один раз, затем клиент переиспользуется
+воркерами добавления раздач и наблюдением за загрузками. Повторная
+авторизация выполняется только при истечении сессии.
+
+"""
+import logging
+import os
+import threading
+
+from media_bot_v2.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ClientUnavailableError(ConnectionError):
+    """
+    Не удалось подключиться к торрент клиенту
+    """
+    pass
+
+
+class ClientPool:
+    """
+    Хранит не более size подключений к торрент клиенту
+
+    client_class - класс воркера торрент клиента, создающий подключение (connect),
+    определяющий истечение сессии (is_session_expired) и выполняющий
+    повторную авторизацию (authenticate). Подключение, на котором произошла
+    другая ошибка, закрывается, следующий вызов создаст новое.
+
+    """
+
+    def __init__(self, client_class, config: Config, size: int):
+        self.client_class = client_class
+        self.config = config
+        self.size = max(size, 1)
+
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+        self.calls = 0
+        self.connects = 0
+        self.reauths = 0
+        self.discarded = 0
+
+    def call(self, func):
+        """
+        Выполняет func(client) на свободном подключении
+
+        :param func:
+        :return: результат func
+        :raises ClientUnavailableError: не удалось подключиться к клиенту
+        """
+        client = self._acquire()
+        try:
+            try:
+                result = func(client)
+            except Exception as ex:
+                if not self.client_class.is_session_expired(ex):
+                    raise
+                logger.info('Сессия торрент клиента истекла, повторная авторизация')
+                client = self.client_class.authenticate(client, self.config)
+                with self._cond:
+                    self.reauths += 1
+                result = func(client)
+        except BaseException:
+            self._release(client, discard=True)
+            raise
+        self._release(client)
+        return result
+
+    def _acquire(self):
+        with self._cond:
+            self.calls += 1
+            while not self._idle and self._created >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        try:
+            client = self.client_class.connect(self.config)
+        except Exception:
+            logger.exception('Ошибка подключения к торрент клиенту')
+            client = None
+        if client is None:
+            self._release(None, discard=True)
+            raise ClientUnavailableError('Не удалось подключиться к торрент клиенту')
+
+        with self._cond:
+            self.connects += 1
+        return client
+
+    def _release(self, client, discard=False):
+        with self._cond:
+            if discard:
+                self._created -= 1
+                if client is not None:
+                    self.discarded += 1
+            else:
+                self._idle.append(client)
+            self._cond.notify()
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                'calls': self.calls,
+                'connects': self.connects,
+                'reauths': self.reauths,
+                'discarded': self.discarded,
+                'idle': len(self._idle),
+            }
+
+
+_client_pools = {}
+_client_pools_lock = threading.Lock()
+
+
+def get_client_pool(client_class, config: Config) -> ClientPool:
+    """
+    Возвращает общий для процесса пул подключений к торрент клиенту из настроек config
+
+    :param client_class:
+    :param config:
+    :return:
+    """
+    # Подключения не наследуются дочерними процессами
+    key = (os.getpid(), client_class, config.torrent_client.model_dump_json())
+    with _client_pools_lock:
+        pool = _client_pools.get(key)
+        if pool is None:
+            pool = ClientPool(client_class, config, config.torrent_client.pool_size)
+            _client_pools[key] = pool
+    return pool
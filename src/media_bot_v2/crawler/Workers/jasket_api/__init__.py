@@ -1 +1 @@
-from .client import Client, Config
\ No newline at end of file
+from .client import Client, Config, JackettError, SearchResult, parse_torznab
@@ -1,6 +1,10 @@
 import dataclasses
+import xml.etree.ElementTree as ET
+
 import requests
 
+TORZNAB_NS = "{http://torznab.com/schemas/2015/feed}"
+
 
 @dataclasses.dataclass
 class Config:
@@ -10,6 +14,36 @@ class Config:
     indexer_name: str
 
 
+@dataclasses.dataclass
+class SearchResult:
+    """
+    Раздача из ответа Torznab, size в байтах
+    """
+    title: str
+    link: str
+    guid: str = ""
+    comments: str = ""
+    indexer: str = ""
+    size: int = 0
+    files: int = 0
+    seeders: int = 0
+    peers: int = 0
+    imdb: str = ""
+    info_hash: str = ""
+    categories: list = dataclasses.field(default_factory=list)
+
+
+class JackettError(Exception):
+    """
+    Ошибка, возвращенная Torznab API
+    """
+
+    def __init__(self, code, description):
+        super(JackettError, self).__init__(f"{code}: {description}")
+        self.code = code
+        self.description = description
+
+
 class Client:
 
     def __init__(self, config: Config, s: requests.Session = None):
@@ -28,22 +62,39 @@ class Client:
         data["apikey"] = self.config.token
         return data
 
-    def search(self, query, **kwargs) -> list:
-        rsp = self._get(self._search_endpoint(), params={
-            "Query": query,
-        }, **kwargs)
-        data = rsp.json()
-        return []
+    def search(self, query, categories: list = None, **kwargs) -> list:
+        """
+        Поиск по индексаторам Jackett
+
+        :param query: текст запроса
+        :param categories: категории Torznab (2000 - фильмы, 5000 - сериалы)
+        :return: список SearchResult
+        """
+        params = {
+            "t": "search",
+            "q": query,
+        }
+        if categories:
+            params["cat"] = ",".join(str(category) for category in categories)
+        rsp = self._get(self._search_endpoint(), params=params, **kwargs)
+        results = parse_torznab(rsp.content)
+        rsp.raise_for_status()
+        return results
+
+    def download(self, url: str, **kwargs) -> requests.Response:
+        return self.s.get(url, **kwargs)
+
+    def close(self):
+        self.s.close()
 
     def _api_endpoint(self):
         return "/api/v2.0/indexers"
 
     def _search_endpoint(self) -> str:
-        return f"{self._api_endpoint()}/{self.config.indexer_name}/results"
-
+        return f"{self._api_endpoint()}/{self.config.indexer_name}/results/torznab/api"
 
     def _url(self, endpoint):
-        return f"{self.config.host}:{self.config.port}/{endpoint}"
+        return f"{self.config.host}:{self.config.port}{endpoint}"
 
     def _get(self, endpoint: str, **kwargs):
         return self._do_req("GET", endpoint, **kwargs)
@@ -53,4 +104,55 @@ class Client:
 
     def _do_req(self, method: str, endpoint: str, **kwargs) -> requests.Response:
         p = self._with_auth(kwargs.pop('params', {}))
-        return self.s.request(method, self._url(endpoint), params=p, **kwargs)
\ No newline at end of file
+        return self.s.request(method, self._url(endpoint), params=p, **kwargs)
+
+
+def parse_torznab(content: bytes) -> list:
+    """
+    Разбирает ответ Torznab API
+
+    :param content: xml ответа
+    :return: список SearchResult
+    :raises JackettError: ответ содержит ошибку
+    """
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError:
+        raise JackettError(None, "Ответ не является Torznab xml")
+    if root.tag == "error":
+        raise JackettError(root.get("code"), root.get("description"))
+
+    results = []
+    for item in root.iter("item"):
+        attrs = {}
+        categories = []
+        for attr in item.iter(f"{TORZNAB_NS}attr"):
+            name, value = attr.get("name"), attr.get("value", "")
+            if name == "category":
+                categories.append(to_int(value))
+            else:
+                attrs[name] = value
+
+        indexer = item.find("jackettindexer")
+        results.append(SearchResult(
+            title=item.findtext("title", ""),
+            link=item.findtext("link", ""),
+            guid=item.findtext("guid", ""),
+            comments=item.findtext("comments", ""),
+            indexer=indexer.get("id", indexer.text or "") if indexer is not None else "",
+            size=to_int(item.findtext("size") or attrs.get("size")),
+            files=to_int(item.findtext("files") or attrs.get("files")),
+            seeders=to_int(attrs.get("seeders")),
+            peers=to_int(attrs.get("peers")),
+            imdb=attrs.get("imdbid") or attrs.get("imdb") or "",
+            info_hash=attrs.get("infohash", "").lower(),
+            categories=categories,
+        ))
+    return results
+
+
+def to_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
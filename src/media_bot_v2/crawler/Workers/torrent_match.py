@@ -0,0 +1,215 @@
+"""
+Выбор лучших раздач из результатов поиска
+
+Каждая раздача проверяется один раз: вычисляются оценка для ранжирования
+и маска нарушенных правил. Подходящие раздачи упорядочиваются по оценке,
+веса которой задаются в MatchConfig.
+
+Правила отклонения:
+    - kinopoisk_id раздачи не совпадает с искомым, если kinopoisk_id известен
+      у большинства раздач или у более чем пяти;
+    - для фильма: слишком много файлов, размер вне допустимых границ;
+    - нет русской озвучки, если она есть хотя бы у одной раздачи;
+    - раздача с рекламой.
+
+"""
+import datetime
+import heapq
+import logging
+import math
+from operator import itemgetter
+from typing import List
+
+from media_bot_v2.config import MatchConfig
+
+from .TorrentTrackers import Torrent
+
+logger = logging.getLogger(__name__)
+
+# Найдено больше раздач с kinopoisk_id, чем это количество, - раздачи должны совпадать с искомым
+KINOPOISK_MIN_COUNT = 5
+
+# Нарушенные правила
+KINOPOISK = 1
+FILES = 2
+SIZE = 4
+ADVERTISING = 8
+SOUND = 16
+
+_score = itemgetter(0)
+
+
+class MatchCandidate:
+    """
+    Раздача с оценкой и причинами отклонения
+    """
+    __slots__ = ('torrent', 'score', 'rejected')
+
+    def __init__(self, torrent: Torrent, score: float, rejected: list):
+        self.torrent = torrent
+        self.score = score
+        self.rejected = rejected
+
+    @property
+    def accepted(self) -> bool:
+        return not self.rejected
+
+    def __repr__(self):
+        return '<candidate {0} score:{1:.2f} rejected:{2}>'.format(self.torrent, self.score, self.rejected)
+
+
+class TorrentMatcher:
+
+    def __init__(self, config: MatchConfig = None):
+        self.config = config if config is not None else MatchConfig()
+
+    def best_match(self, data: List[Torrent], job, limit: int = 8) -> List[Torrent] or None:
+        """
+        Лучшие подходящие раздачи
+
+        :param data: результаты поиска
+        :param job: задача поиска
+        :param limit: максимальное количество раздач
+        :return: список раздач или None, если подходящих нет
+        """
+        if len(data) == 0:
+            return None
+        if self.config.explain:
+            logger.info(self.explain(data, job))
+
+        entries, rules = self.evaluate(data, job)
+        result = [entry for entry in entries if not entry[1] & rules]
+        if not result:
+            # Если это старый фильм\сериал возможно, что нет стандартного качества, будем предлагать выбор
+            if job.year < datetime.date.today().year - self.config.old_media_years:
+                result = entries
+            else:
+                return None
+        return [entry[2] for entry in heapq.nlargest(limit, result, key=_score)]
+
+    def rank(self, data: List[Torrent], job) -> List[MatchCandidate]:
+        """
+        Оценивает раздачи и упорядочивает их по убыванию оценки
+
+        :param data: результаты поиска
+        :param job: задача поиска
+        :return: все раздачи, отклоненные содержат причины в rejected
+        """
+        entries, rules = self.evaluate(data, job)
+        media_kinopoisk_id = get_kinopoisk_id(job)
+        return [
+            MatchCandidate(torrent, score, self.get_reasons(torrent, mask & rules, media_kinopoisk_id))
+            for score, mask, torrent in sorted(entries, key=_score, reverse=True)
+        ]
+
+    def explain(self, data: List[Torrent], job) -> str:
+        """
+        Описание оценки и причин отклонения каждой раздачи
+
+        :param data: результаты поиска
+        :param job: задача поиска
+        :return:
+        """
+        candidates = self.rank(data, job)
+        lines = ['Выбор раздачи по запросу {0}, найдено {1}:'.format(job.text_query, len(candidates))]
+        for candidate in candidates:
+            lines.append('{0:>8.2f} {1} {2}'.format(
+                candidate.score,
+                'отклонена: ' + '; '.join(candidate.rejected) if candidate.rejected else 'подходит',
+                candidate.torrent.theam_url or candidate.torrent.label,
+            ))
+        return '\n'.join(lines)
+
+    def evaluate(self, data: List[Torrent], job):
+        """
+        Вычисляет оценку и маску нарушенных правил каждой раздачи за один проход
+
+        :param data: результаты поиска
+        :param job: задача поиска
+        :return: ([(оценка, маска, раздача)], маска действующих правил)
+        """
+        config = self.config
+        is_film = job.season == ''
+        media_kinopoisk_id = get_kinopoisk_id(job)
+        max_files, min_size, max_size = config.film_max_files, config.film_min_size, config.film_max_size
+        seeders_weight = config.seeders_weight
+        resolution_weight = config.resolution_weight / 1000
+        sound_weight = config.sound_weight
+        kinopoisk_weight = config.kinopoisk_weight
+        advertising_weight = config.advertising_weight
+        log1p = math.log1p
+
+        entries = []
+        add_entry = entries.append
+        kinopoisk_count = 0
+        russian_count = 0
+        for torrent in data:
+            mask = 0
+            score = seeders_weight * log1p(torrent.pier) if seeders_weight else 0.0
+            if is_film:
+                if torrent.file_amount > max_files:
+                    mask |= FILES
+                if not min_size <= torrent.size <= max_size:
+                    mask |= SIZE
+            if torrent.with_advertising:
+                mask |= ADVERTISING
+                score += advertising_weight
+            if 'RUSSIAN' in torrent.sound:
+                russian_count += 1
+                score += sound_weight
+            else:
+                mask |= SOUND
+            kinopoisk_id = torrent.kinopoisk_id
+            if kinopoisk_id:
+                kinopoisk_count += 1
+            if kinopoisk_id == media_kinopoisk_id:
+                score += kinopoisk_weight
+            else:
+                mask |= KINOPOISK
+            if resolution_weight:
+                score += resolution_weight * get_resolution(torrent)
+            add_entry((score, mask, torrent))
+
+        # Правила, зависящие от всех найденных раздач
+        rules = FILES | SIZE | ADVERTISING
+        if media_kinopoisk_id is not None and (
+                kinopoisk_count > KINOPOISK_MIN_COUNT or kinopoisk_count >= len(data) / 2):
+            rules |= KINOPOISK
+        if russian_count or len(data) == 1:
+            rules |= SOUND
+        return entries, rules
+
+    def get_reasons(self, torrent: Torrent, mask: int, media_kinopoisk_id) -> list:
+        config = self.config
+        reasons = []
+        if mask & KINOPOISK:
+            reasons.append('kinopoisk_id {0} не совпадает с {1}'.format(torrent.kinopoisk_id, media_kinopoisk_id))
+        if mask & FILES:
+            reasons.append('файлов {0}, допустимо не более {1}'.format(torrent.file_amount, config.film_max_files))
+        if mask & SIZE:
+            reasons.append('размер {0} ГБ вне {1}-{2} ГБ'.format(
+                torrent.size, config.film_min_size, config.film_max_size
+            ))
+        if mask & ADVERTISING:
+            reasons.append('раздача с рекламой')
+        if mask & SOUND:
+            reasons.append('нет русской озвучки')
+        return reasons
+
+
+def get_kinopoisk_id(job) -> int or None:
+    """
+    kinopoisk_id искомого фильма/сериала, media_id задачи может быть строкой
+    """
+    try:
+        kinopoisk_id = int(job.media_id)
+    except (TypeError, ValueError):
+        return None
+    return None if kinopoisk_id == -1 else kinopoisk_id
+
+
+def get_resolution(torrent: Torrent) -> int:
+    try:
+        return int(torrent.resolution)
+    except (TypeError, ValueError):
+        return 0
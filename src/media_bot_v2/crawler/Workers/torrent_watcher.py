@@ -0,0 +1,183 @@
+"""
+Наблюдение за загрузками в торрент клиенте
+
+Один поток краулера раз в watch_interval секунд запрашивает состояние всех
+наблюдаемых раздач одним обращением к клиенту и формирует сообщения
+о прогрессе и завершении загрузки.
+
+"""
+import logging
+import queue
+import threading
+import time
+from queue import Empty
+
+from media_bot_v2.config import Config
+
+from .client_pool import ClientUnavailableError, get_client_pool
+from .TorrentClientWorker import get_torrent_worker_class, watcher_messages
+from .utils import MediaTask
+
+logger = logging.getLogger(__name__)
+
+
+class TorrentWatcher:
+    """
+    Наблюдает за раздачами, добавленными задачами ADD_TORRENT_WATCHER
+
+    Первое состояние раздачи отправляется сразу после добавления, затем
+    сообщение отправляется по завершении загрузки. Задача с force получает
+    одно сообщение о текущем состоянии при ближайшем опросе и не заменяет
+    наблюдение за той же раздачей. Наблюдение прекращается через
+    watch_timeout секунд.
+
+    """
+
+    def __init__(self, config: Config, on_event=None, client_class=None):
+        self.config = config
+        self.on_event = on_event
+        self.client_class = client_class
+        self.returned_data = queue.Queue()
+
+        self._watched = {}
+        # Разовые запросы состояния по задачам с force: [(torrent_id, задача)]
+        self._reports = []
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+    def add(self, job: MediaTask):
+        """
+        Добавляет раздачу задачи в наблюдение, повторная задача заменяет прежнюю.
+        Задача с force только запрашивает текущее состояние раздачи.
+
+        :param job:
+        :return:
+        """
+        torrent_id = str(job.torrent_id)
+        with self._lock:
+            if job.crawler_data.force:
+                self._reports.append((torrent_id, job))
+            else:
+                self._watched[torrent_id] = {'job': job, 'started': time.monotonic(), 'reported': False}
+        logger.debug('Раздача {0} добавлена в наблюдение по задаче {1}'.format(torrent_id, job))
+        self._wake_event.set()
+
+    def start(self):
+        """
+        Запускает поток наблюдения, если он еще не запущен
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='torrent_watcher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        logger.debug('Запуск наблюдения за загрузками')
+        while True:
+            self._wake_event.wait(self.config.crawler_cfg.watch_interval)
+            self._wake_event.clear()
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Ошибка при запросе состояния загрузок')
+
+    def poll(self):
+        """
+        Запрашивает состояние всех наблюдаемых раздач и формирует сообщения
+        """
+        with self._lock:
+            watched = dict(self._watched)
+            reports, self._reports = self._reports, []
+        if not watched and not reports:
+            return
+
+        torrent_ids = list(dict.fromkeys(list(watched) + [torrent_id for torrent_id, _ in reports]))
+        client_class = self.get_client_class()
+        try:
+            information = get_client_pool(client_class, self.config).call(
+                lambda client: client_class.get_torrents_information(client, torrent_ids)
+            )
+        except ClientUnavailableError:
+            self.remove_expired(watched, time.monotonic())
+            return
+        except Exception as ex:
+            logger.error('Не удалось получить состояние загрузок: {}'.format(ex))
+            self.remove_expired(watched, time.monotonic())
+            return
+
+        messages = []
+        for torrent_id, job in reports:
+            torrent_information = information.get(torrent_id)
+            if torrent_information is None:
+                logger.warning('Раздача {} не найдена в торрент клиенте'.format(torrent_id))
+            elif not (torrent_id in watched and torrent_information['progress'] == 100):
+                # О завершении наблюдаемой раздачи сообщит ее наблюдение
+                messages += watcher_messages(job, {'torrent_information': torrent_information})
+
+        now = time.monotonic()
+        for torrent_id, entry in watched.items():
+            torrent_information = information.get(torrent_id)
+            if torrent_information is None:
+                logger.warning('Раздача {} не найдена в торрент клиенте'.format(torrent_id))
+                done = now - entry['started'] >= self.config.crawler_cfg.watch_timeout
+            else:
+                entry_messages, done = self.check(entry, torrent_information, now)
+                messages += entry_messages
+            if done:
+                self.remove(torrent_id, entry)
+
+        if messages:
+            self.returned_data.put(messages)
+            if self.on_event is not None:
+                self.on_event(self)
+
+    def check(self, entry: dict, torrent_information: dict, now: float):
+        """
+        :return: (сообщения, закончено ли наблюдение)
+        """
+        job = entry['job']
+        data = {'torrent_information': torrent_information}
+        if torrent_information['progress'] == 100:
+            return watcher_messages(job, data), True
+        messages = []
+        if not entry['reported']:
+            entry['reported'] = True
+            messages = watcher_messages(job, data)
+        if now - entry['started'] >= self.config.crawler_cfg.watch_timeout:
+            logger.info('Наблюдение за раздачей {} прекращено по времени'.format(job.torrent_id))
+            return messages, True
+        return messages, False
+
+    def remove_expired(self, watched: dict, now: float):
+        """
+        Прекращает наблюдение по времени, когда состояние раздач получить не удалось
+        """
+        for torrent_id, entry in watched.items():
+            if now - entry['started'] >= self.config.crawler_cfg.watch_timeout:
+                logger.info('Наблюдение за раздачей {} прекращено по времени'.format(torrent_id))
+                self.remove(torrent_id, entry)
+
+    def remove(self, torrent_id: str, entry: dict):
+        with self._lock:
+            # Раздача могла быть добавлена заново во время запроса
+            if self._watched.get(torrent_id) is entry:
+                del self._watched[torrent_id]
+
+    def get_client_class(self):
+        if self.client_class is None:
+            self.client_class = get_torrent_worker_class(self.config)
+        return self.client_class
+
+    @property
+    def result(self) -> list:
+        messages = []
+        while True:
+            try:
+                messages += self.returned_data.get(block=False)
+            except Empty:
+                break
+        return messages
+
+    def __len__(self):
+        return len(self._watched)
@@ -34,6 +34,30 @@ class MediaTask:
         return 'Media_task <client_id:{0} media_id:{1}>'.format(self.client_id, self.media_id)
 
 
+class MediaTaskGroup:
+    """
+    Группа задач поиска, выполняемых одним воркером
+
+    Используется при плановой проверке всех данных, одинаковые запросы
+    выполняются на трекерах один раз, а результат раздается всем задачам группы.
+
+    """
+    def __init__(self, action_type, client_id, tasks: list):
+        self.action_type = action_type
+        self.client_id = client_id
+        self.tasks = tasks
+
+    @property
+    def text_queries(self) -> list:
+        return list(dict.fromkeys(task.text_query for task in self.tasks))
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __str__(self):
+        return 'Media_task_group <client_id:{0} tasks:{1}>'.format(self.client_id, len(self.tasks))
+
+
 def construct_upd_data(media: MediaTask, upd_data):
     res = {'upd_data': upd_data}
     add_media_keys(media, res)
@@ -1,15 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
 import logging
-import time
+import threading
 from multiprocessing import Queue
 import traceback
 
 from media_bot_v2.config import Config
-from media_bot_v2.crawler.Workers.utils import MediaTask
+from media_bot_v2.crawler.Workers.utils import MediaTask, MediaTaskGroup
 from media_bot_v2.app_enums import ComponentType, ActionType
 from media_bot_v2.database import DbManager
 from media_bot_v2.mediator import AppMediatorClient, MediatorActionMessage
 
-from .Workers import TorrentSearchWorker, DownloadWorker, get_torrent_worker
+from .Workers import TorrentSearchWorker, BulkSearchWorker, DownloadWorker, get_torrent_worker
+from .Workers.torrent_watcher import TorrentWatcher
+from .job_queue import JobQueue
 
 
 logger = logging.getLogger(__name__)
@@ -27,26 +30,45 @@ class Crawler(AppMediatorClient):
         ActionType.DOWNLOAD_TORRENT
     ]
 
-    def __init__(self, in_queue: Queue, out_queue: Queue, config: Config, threads: int):
+    # Задачи, выполняемые общим наблюдателем за загрузками, а не отдельным воркером
+    WATCHER_ACTIONS = (ActionType.ADD_TORRENT_WATCHER.value,)
+
+    def __init__(self, in_queue: Queue, out_queue: Queue, config: Config, threads: int = None):
 
         super(Crawler, self).__init__(in_queue, out_queue, config)
 
-        self.__threads = threads
+        self.__threads = config.crawler_cfg.workers if threads is None else threads
+        self.__executor = None
+        self.watcher = TorrentWatcher(config, self.wake)
+        # Пробуждает основной поток при новых задачах и событиях воркеров
+        self.wake_event = threading.Event()
         self.active_workers = []
-        self.jobs = []
-        db_manager = DbManager(config.db_cfg)
+        # Остановленные по таймауту воркеры, поток которых еще выполняется и занимает место в пуле
+        self.stalled_workers = []
+        self.jobs = JobQueue()
+        db_manager = DbManager(config.db_cfg, read_only=True)
         self.db_handler = CrawlerMessageHandler(db_manager)
         self.messages = []
 
     def main_actions(self):
         logger.info('Запуск основного потока работы {}'.format(self))
         while True:
-            time.sleep(10)
+            self.wake_event.wait(self.config.crawler_cfg.poll_interval)
+            self.wake_event.clear()
             try:
                 self.update_jobs()
             except Exception as ex:
                 logging.error('При обновлении обработчиков произошла ощибка {}'.format(traceback.print_exc()))
 
+    def wake(self, worker=None):
+        """
+        Запускает внеочередной проход основного потока
+
+        :param worker: воркер, сообщивший о результате или завершении
+        :return:
+        """
+        self.wake_event.set()
+
     def handle_message(self, message: MediatorActionMessage):
         logger.info(
             'Полученно новое сообщение. для Crawler от {0} с данными {1}'.format(
@@ -61,7 +83,13 @@ class Crawler(AppMediatorClient):
         logger.debug('Добавление задач, для выполнения на основании сообщения {}'.format(message))
         jobs = self.db_handler.get_job_list(message)
         for job in jobs:
-            self.jobs.append(job)
+            if job.action_type.value in self.WATCHER_ACTIONS:
+                self.watcher.start()
+                self.watcher.add(job)
+            else:
+                self.jobs.put(job, message.from_component)
+        if jobs:
+            self.wake()
 
     def update_jobs(self):
         """
@@ -82,12 +110,29 @@ class Crawler(AppMediatorClient):
         :return:
         """
 
+        self.messages += self.watcher.result
+        self.stalled_workers = [worker for worker in self.stalled_workers if worker.alive]
+        active_workers = []
         for worker in self.active_workers:
+            # Завершение проверяется до чтения результата, чтобы не потерять последний результат
+            ended = worker.ended
+            # Результат забирается и у просроченного воркера: после остановки он больше не читается
             try:
                 self.messages += worker.result
             except Exception as ex:
                 logger.error('При обработке результата воркера {0} произошла ошибка {1}'.format(worker, ex))
-        self.active_workers = list((i for i in self.active_workers if not i.ended))
+            if ended:
+                continue
+            if self.is_expired(worker):
+                logger.error('Воркер {0} не завершился за {1} с. и остановлен'.format(
+                    worker, self.config.crawler_cfg.job_timeout
+                ))
+                worker.kill()
+                if worker.alive:
+                    self.stalled_workers.append(worker)
+                continue
+            active_workers.append(worker)
+        self.active_workers = active_workers
 
     def handle_worker_results(self):
         ex = None
@@ -104,18 +149,39 @@ class Crawler(AppMediatorClient):
 
     def add_workers(self):
 
-        while len(self.active_workers) <= self.__threads:
-            if len(self.jobs) == 0:
+        started = False
+        # Задачи не запускаются сверх свободных потоков пула, иначе они ждут в очереди пула без таймаута
+        while len(self.active_workers) + len(self.stalled_workers) < self.__threads:
+            job = self.jobs.get()
+            if job is None:
                 break
-            self.add_thread(self.jobs.pop(0))
+            self.add_thread(job)
+            started = True
+        if started:
+            logger.debug('Очередь задач {}'.format(self.jobs.metrics()))
 
     def add_thread(self, job):
         worker = self.get_worker(job)
         logger.debug('Запуск worker {}'.format(worker))
-        worker.start()
+        worker.start(self.executor, self.wake)
         self.active_workers.append(worker)
 
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Пул создается в процессе краулера при первом запуске воркера
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(max_workers=self.__threads, thread_name_prefix='crawler_worker')
+        return self.__executor
+
+    def is_expired(self, worker) -> bool:
+        timeout = self.config.crawler_cfg.job_timeout
+        if timeout <= 0 or worker.ended:
+            return False
+        return worker.expired(timeout)
+
     def get_worker(self, job: MediaTask):
+        if isinstance(job, MediaTaskGroup):
+            return BulkSearchWorker(job, self.config.tracker_cfg)
         if job.action_type.value in [
             ActionType.FORCE_CHECK.value,
             ActionType.CHECK_FILMS.value,
@@ -124,7 +190,6 @@ class Crawler(AppMediatorClient):
         ]:
             return TorrentSearchWorker(job, self.config.tracker_cfg)
         elif job.action_type.value in [
-            ActionType.ADD_TORRENT_WATCHER.value,
             ActionType.ADD_TORRENT_TO_TORRENT_CLIENT.value
         ]:
             return get_torrent_worker(job, self.config)
@@ -139,6 +204,12 @@ class CrawlerMessageHandler:
     Класс обрабатывает сообщения от компонентов и возвращает список данных для обработки
     """
 
+    SEARCH_ACTIONS = (
+        ActionType.CHECK_FILMS.value,
+        ActionType.CHECK_SERIALS.value,
+        ActionType.CHECK.value,
+    )
+
     def __init__(self, db_manager: DbManager):
         self.db_manager = db_manager
 
@@ -148,42 +219,63 @@ class CrawlerMessageHandler:
         data = message.data
 
         session = db.get_session()
-        if not data.media_id == 0:
-            media = db.find_media(data.media_id, data.media_type, data.season, session)
-            if media is None:
-                media = []
-            else:
+        try:
+            if not data.media_id == 0:
+                media = db.find_media(data.media_id, data.media_type, data.season, session)
+                if media is None:
+                    logger.error('Не удалось найти данные в базе по запросу {}'.format(message.data))
+                    return []
                 media = [media]
-        else:
-            media = db.find_all_media(data.media_type, session)
-        if len(media) == 0 and not data.media_id == 0:
-            logger.error('Не удалось найти данные в базе по запросу {}'.format(message.data))
-            return []
-        session.close()
-        for element in media:
-
-            element.torrent_id = element.torrent_id if data.torrent_id is None else data.torrent_id
-
-            if element.download_url is None \
-                or element.download_url == '' \
-                or message.action.value in (
-                    ActionType.ADD_TORRENT_WATCHER.value,
-                    ActionType.ADD_TORRENT_TO_TORRENT_CLIENT.value):
-                action = message.action
             else:
-                action = ActionType.DOWNLOAD_TORRENT
-
-            result.append(
-                MediaTask(
-                    **{
-                        'action_type': action,
-                        'client_id': data.client_id,
-                        'media': element,
-                        'crawler_data': data,
-                    }
-                )
-            )
+                media = db.iter_all_media(data.media_type, session)
+            for element in media:
+                result.append(self.get_job(message, element))
+        finally:
+            session.close()
+
+        if data.media_id == 0 and message.action.value in self.SEARCH_ACTIONS:
+            result = self.group_search_tasks(result)
+
+        return result
+
+    @staticmethod
+    def get_job(message: MediatorActionMessage, element) -> MediaTask:
+        data = message.data
+
+        element.torrent_id = element.torrent_id if data.torrent_id is None else data.torrent_id
 
+        if element.download_url is None \
+            or element.download_url == '' \
+            or message.action.value in (
+                ActionType.ADD_TORRENT_WATCHER.value,
+                ActionType.ADD_TORRENT_TO_TORRENT_CLIENT.value):
+            action = message.action
+        else:
+            action = ActionType.DOWNLOAD_TORRENT
+
+        return MediaTask(
+            **{
+                'action_type': action,
+                'client_id': data.client_id,
+                'media': element,
+                'crawler_data': data,
+            }
+        )
+
+    @staticmethod
+    def group_search_tasks(tasks: list) -> list:
+        """
+        Объединяет задачи поиска при проверке всех данных в одну группу,
+        остальные задачи возвращаются как есть
+
+        :param tasks:
+        :return:
+        """
+        search_tasks = [task for task in tasks if task.action_type.value in CrawlerMessageHandler.SEARCH_ACTIONS]
+        if len(search_tasks) < 2:
+            return tasks
+        result = [task for task in tasks if task.action_type.value not in CrawlerMessageHandler.SEARCH_ACTIONS]
+        result.append(MediaTaskGroup(search_tasks[0].action_type, search_tasks[0].client_id, search_tasks))
         return result
 
 
@@ -0,0 +1,141 @@
+"""
+Очередь задач краулера
+
+Задачи, запрошенные пользователем, выполняются раньше плановой проверки.
+Повторная постановка задачи с теми же media_id, season, действием и
+пользователем, пока первая еще ждет выполнения, не создает новую задачу.
+Задачи разных пользователей не объединяются, чтобы ответ получил каждый.
+Задачи добавления torrent файла объединяются только для одного и того же torrent_id.
+
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from media_bot_v2.app_enums import ActionType, ComponentType
+from media_bot_v2.mediator import release_blob
+
+from .Workers.utils import MediaTaskGroup
+
+# Порядок выполнения задач одного источника, меньшее значение выполняется раньше
+ACTION_PRIORITY = {
+    ActionType.DOWNLOAD_TORRENT.value: 0,
+    ActionType.ADD_TORRENT_TO_TORRENT_CLIENT.value: 0,
+    ActionType.FORCE_CHECK.value: 1,
+    ActionType.ADD_TORRENT_WATCHER.value: 2,
+    ActionType.CHECK.value: 3,
+    ActionType.CHECK_FILMS.value: 3,
+    ActionType.CHECK_SERIALS.value: 3,
+}
+
+# Компоненты, отправляющие плановые задачи
+SCHEDULED_ORIGINS = (ComponentType.MAIN_APP.value,)
+
+# Задачи, передающие torrent файл
+TORRENT_ACTIONS = (ActionType.ADD_TORRENT_TO_TORRENT_CLIENT.value,)
+
+
+def get_priority(job, origin: ComponentType = None) -> int:
+    scheduled = origin is not None and origin.value in SCHEDULED_ORIGINS
+    return len(ACTION_PRIORITY) * scheduled + ACTION_PRIORITY.get(job.action_type.value, len(ACTION_PRIORITY))
+
+
+def get_job_key(job) -> tuple:
+    if isinstance(job, MediaTaskGroup):
+        return 'group', job.action_type.value
+    key = job.media_id, job.season, job.action_type.value, job.client_id
+    if job.action_type.value in TORRENT_ACTIONS:
+        return key + (job.crawler_data.torrent_id,)
+    return key
+
+
+def release_job(job, replacement):
+    """
+    Освобождает разделяемую память torrent файла задачи, замененной повторной
+    """
+    if isinstance(job, MediaTaskGroup) or job.action_type.value not in TORRENT_ACTIONS:
+        return
+    if job.crawler_data.torrent_data is replacement.crawler_data.torrent_data:
+        return
+    release_blob(job.crawler_data.torrent_data)
+
+
+class JobQueue:
+    """
+    Очередь задач с приоритетом и объединением повторов
+
+    Повторная задача заменяет ожидающую: выполняется более свежая задача
+    с лучшим из двух приоритетов, время ожидания считается от первой постановки.
+
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+        self.added = 0
+        self.collapsed = 0
+        self.taken = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def put(self, job, origin: ComponentType = None):
+        """
+        Добавляет задачу в очередь
+
+        :param job: MediaTask или MediaTaskGroup
+        :param origin: компонент, от которого пришло сообщение
+        :return:
+        """
+        priority = get_priority(job, origin)
+        key = get_job_key(job)
+        replaced = None
+        with self._lock:
+            self.added += 1
+            entry = self._entries.get(key)
+            enqueued = time.monotonic()
+            if entry is not None:
+                self.collapsed += 1
+                entry[-1] = False
+                priority = min(priority, entry[0])
+                enqueued = entry[3]
+                replaced = entry[2]
+            entry = [priority, next(self._counter), job, enqueued, key, True]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+        if replaced is not None:
+            release_job(replaced, job)
+
+    def get(self):
+        """
+        Возвращает задачу с наивысшим приоритетом или None, если очередь пуста
+        """
+        with self._lock:
+            while self._heap:
+                priority, _, job, enqueued, key, valid = heapq.heappop(self._heap)
+                if not valid:
+                    continue
+                del self._entries[key]
+                wait = time.monotonic() - enqueued
+                self.taken += 1
+                self.wait_time += wait
+                self.max_wait = max(self.max_wait, wait)
+                return job
+        return None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'queued': len(self._entries),
+                'added': self.added,
+                'collapsed': self.collapsed,
+                'taken': self.taken,
+                'avg_wait': self.wait_time / self.taken if self.taken else 0.0,
+                'max_wait': self.max_wait,
+            }
@@ -7,4 +7,4 @@
 
 """
 
-from .db_functions import DbManager, MediaData
\ No newline at end of file
+from .db_functions import DbManager, MediaData, dispose_engines, prepare_db
\ No newline at end of file
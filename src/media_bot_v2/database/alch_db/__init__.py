@@ -1 +1 @@
-from .model import init_db, get_session, get_scorp_session, Film, User, Serial, OperationalError, create_db, StaticPool
\ No newline at end of file
+from .model import init_db, init_schema, get_session, get_scorp_session, Film, User, Serial, OperationalError, create_db, StaticPool
\ No newline at end of file
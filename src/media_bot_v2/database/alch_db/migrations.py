@@ -0,0 +1,118 @@
+"""
+Обновление схемы существующей базы данных
+
+create_all создает только отсутствующие таблицы, поэтому новые колонки
+и индексы существующих таблиц добавляются здесь. Все шаги проверяют
+текущее состояние схемы и могут выполняться при каждом запуске.
+Если несколько процессов обновляют схему одновременно, изменение,
+уже внесенное другим процессом, не считается ошибкой.
+
+"""
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(enj, metadata):
+    """
+    Приводит схему базы к описанию моделей
+
+    :param enj:
+    :param metadata:
+    :return:
+    """
+    with enj.begin() as connection:
+        add_missing_columns(connection, metadata)
+        fill_serial_kinopoisk_id(connection)
+        create_missing_indexes(connection, metadata)
+
+
+def add_missing_columns(connection, metadata):
+    insp = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {column['name'] for column in insp.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            logger.info('Добавление колонки {0}.{1}'.format(table.name, column.name))
+            execute_ddl(
+                connection,
+                text('ALTER TABLE {0} ADD COLUMN {1} {2}'.format(
+                    preparer.format_table(table),
+                    preparer.format_column(column),
+                    column.type.compile(dialect=connection.dialect),
+                )),
+                lambda: column.name in {c['name'] for c in inspect(connection).get_columns(table.name)}
+            )
+
+
+def fill_serial_kinopoisk_id(connection):
+    """
+    Заполняет копию kinopoisk_id сериалов, созданных до ее появления
+    """
+    # Проверка без записи, чтобы процессы не ждали блокировку базы при каждом запуске
+    if connection.execute(text('SELECT 1 FROM serial WHERE kinopoisk_id IS NULL LIMIT 1')).first() is None:
+        return
+    connection.execute(text(
+        'UPDATE serial SET kinopoisk_id = '
+        '(SELECT media.kinopoisk_id FROM media WHERE media.id = serial.id) '
+        'WHERE serial.kinopoisk_id IS NULL'
+    ))
+
+
+def create_missing_indexes(connection, metadata):
+    insp = inspect(connection)
+    for table in metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {index['name'] for index in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique and has_duplicates(connection, index):
+                logger.error(
+                    'Индекс {0} не создан, в таблице {1} есть повторяющиеся записи'.format(index.name, table.name)
+                )
+                continue
+            logger.info('Создание индекса {}'.format(index.name))
+            execute_ddl(
+                connection,
+                CreateIndex(index),
+                lambda: index.name in {ix['name'] for ix in inspect(connection).get_indexes(table.name)}
+            )
+
+
+def execute_ddl(connection, statement, applied):
+    """
+    Выполняет изменение схемы, проверенное заранее
+
+    Между проверкой и изменением схему может обновить другой процесс,
+    в этом случае ошибка базы пропускается.
+
+    :param connection:
+    :param statement: выражение DDL
+    :param applied: проверяет, что изменение уже есть в базе
+    :return:
+    """
+    try:
+        connection.execute(statement)
+    except DBAPIError:
+        if not applied():
+            raise
+        logger.info('Изменение схемы уже выполнено другим процессом')
+
+
+def has_duplicates(connection, index) -> bool:
+    preparer = connection.dialect.identifier_preparer
+    columns = ', '.join(preparer.format_column(column) for column in index.columns)
+    query = 'SELECT {0} FROM {1} GROUP BY {0} HAVING COUNT(*) > 1'.format(
+        columns, preparer.format_table(index.table)
+    )
+    return connection.execute(text(query)).first() is not None
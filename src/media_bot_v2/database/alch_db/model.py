@@ -1,19 +1,21 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, SmallInteger, Unicode, Boolean, ForeignKey, Table
+from sqlalchemy import Column, Integer, SmallInteger, Unicode, Boolean, ForeignKey, Table, Index
 from sqlalchemy import Enum
 from sqlalchemy.pool import StaticPool
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy.orm import relationship, backref, column_property
 from sqlalchemy.exc import OperationalError
 
 from media_bot_v2.app_enums import UserOptions, MediaType, LockingStatus, TorrentType
 
+from .migrations import migrate
+
 Base = declarative_base()
 
 table_media_user_add = Table(
     'media_user_add',
     Base.metadata,
     Column('user_id', Integer, ForeignKey(u'users.id')),
-    Column('media_id', Integer, ForeignKey(u'media.id'))
+    Column('media_id', Integer, ForeignKey(u'media.id'), index=True)
 )
 
 
@@ -26,7 +28,7 @@ class User(Base):
     last_name = Column(Unicode(200))
     nick_name = Column(Unicode(200))
 
-    client_id = Column(Integer, nullable=False)
+    client_id = Column(Integer, nullable=False, index=True)
 
     media = relationship(
         'MediaData',
@@ -47,6 +49,9 @@ class User(Base):
 
 class UserOptionsT(Base):
     __tablename__ = 'user_options'
+    __table_args__ = (
+        Index('ix_user_options_option_value', 'option', 'value'),
+    )
 
     id = Column(Integer, primary_key=True)
 
@@ -79,7 +84,7 @@ class MediaData(Base):
     label = Column(Unicode(400), nullable=False)
     year = Column(Integer, nullable=False)
 
-    status = Column('status', Enum(LockingStatus), default=LockingStatus.IN_PROGRESS)
+    status = Column('status', Enum(LockingStatus), default=LockingStatus.IN_PROGRESS, index=True)
 
     type = Column(Enum(MediaType))
 
@@ -89,7 +94,7 @@ class MediaData(Base):
     torrent_tracker = Enum(TorrentType)
     exsists_in_plex = Column(Boolean)
 
-    kinopoisk_id = Column(Unicode(20))
+    kinopoisk_id = Column(Unicode(20), index=True)
     kinopoisk_url = Column(Unicode(400))
 
     torrent_id = Column(Unicode(100))
@@ -136,10 +141,17 @@ class Serial(MediaData):
     """
 
     __tablename__ = u'serial'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Сезон сериала добавляется один раз
+        Index('uq_serial_kinopoisk_id_season', 'kinopoisk_id', 'season', unique=True),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, ForeignKey('media.id'), primary_key=True)
 
+    # Копия media.kinopoisk_id, нужна для уникального индекса вместе с сезоном
+    kinopoisk_id = column_property(Column('kinopoisk_id', Unicode(20)), MediaData.kinopoisk_id)
+
     season = Column(SmallInteger, nullable=False, default=1)
     series = Column(SmallInteger, default=0)
     current_series = Column(SmallInteger, default=0)
@@ -249,10 +261,15 @@ def init_db(connection_str, **kwargs):
         connection_str,
         **kwargs
     )
-    Base.metadata.create_all(enj)
+    init_schema(enj)
     return enj
 
 
+def init_schema(enj):
+    Base.metadata.create_all(enj)
+    migrate(enj, Base.metadata)
+
+
 def get_session(enj):
     from sqlalchemy.orm import sessionmaker
     Session = sessionmaker(bind=enj)
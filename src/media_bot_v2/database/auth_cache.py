@@ -0,0 +1,67 @@
+"""
+Кэш результатов проверки прав пользователей
+
+Каждая команда перед выполнением проверяет, есть ли пользователь в базе.
+Разрешение хранится ttl секунд, записи сбрасываются явно при добавлении
+пользователя и запросе авторизации. Отказы не кэшируются, чтобы пользователь,
+добавленный другим процессом, сразу получал доступ.
+
+"""
+import threading
+import time
+
+
+class AuthCache:
+    """
+    Ключ записи - client_id, приведенный к int: в командах он приходит
+    как числом, так и строкой.
+
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, client_id: int):
+        """
+        Возвращает сохраненный результат проверки или None, если его нет или он устарел
+
+        :param client_id:
+        :return:
+        """
+        client_id = int(client_id)
+        with self._lock:
+            entry = self._data.get(client_id)
+            if entry is None or entry[1] <= time.monotonic():
+                self._data.pop(client_id, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def set(self, client_id: int, allowed: bool):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[int(client_id)] = (allowed, time.monotonic() + self.ttl)
+
+    def invalidate(self, client_id: int = None):
+        """
+        Сбрасывает запись пользователя, без client_id - весь кэш
+
+        :param client_id:
+        :return:
+        """
+        with self._lock:
+            if client_id is None:
+                self._data.clear()
+            else:
+                self._data.pop(int(client_id), None)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
@@ -1,16 +1,142 @@
-from typing import List, Optional, Union
+import logging
+import os
+import threading
+from typing import Iterator, List, Optional, Union
+
+from sqlalchemy import create_engine as sa_create_engine
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import sessionmaker
 
 from media_bot_v2.app_enums import LockingStatus, MediaType, UserOptions, UserRule
 from media_bot_v2.config import DbConfig
 
 from .alch_db import (
     OperationalError,
-    StaticPool,
     User,
     create_db,
-    get_session,
     init_db,
+    init_schema,
 )
+from .alch_db.model import table_media_user_add
+from .auth_cache import AuthCache
+from .sqlite_profile import apply_sqlite_profile, begin_transaction, is_memory_sqlite, is_sqlite
+from .sqlite_profile import set_read_only as set_sqlite_read_only
+
+logger = logging.getLogger(__name__)
+
+READ_ONLY_STATEMENTS = {
+    'mysql': 'SET SESSION TRANSACTION READ ONLY',
+    'mariadb': 'SET SESSION TRANSACTION READ ONLY',
+    'postgresql': 'SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY',
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(config: DbConfig, read_only: bool = False):
+    """
+    Возвращает общий для процесса engine базы данных.
+    Engine и схема создаются один раз при первом обращении,
+    в дочернем процессе создается собственный engine со своим пулом соединений.
+
+    :param config:
+    :param read_only: engine для процессов, которые только читают данные
+    :return: (engine, фабрика сессий)
+    """
+    key = (os.getpid(), config.dns, read_only)
+    with _engines_lock:
+        result = _engines.get(key)
+        if result is None:
+            enj = create_engine(config, read_only)
+            result = (enj, sessionmaker(bind=enj))
+            _engines[key] = result
+    return result
+
+
+def create_engine(config: DbConfig, read_only: bool = False):
+    args = get_pool_args(config)
+    if read_only:
+        # Схему создает главный процесс до запуска остальных (prepare_db),
+        # процессы только для чтения ее не изменяют
+        enj = sa_create_engine(config.dns, **args)
+        apply_sqlite_profile(enj, config)
+        set_read_only(enj, config)
+        return enj
+    try:
+        enj = sa_create_engine(config.dns, **args)
+        apply_sqlite_profile(enj, config)
+        enj.connect().close()
+    except OperationalError:
+        # База создается только если к ней не удалось подключиться,
+        # ошибки обновления схемы не должны приводить к CREATE DATABASE
+        create_db(config.dns, config.db_name)
+        enj = init_db(config.dns, echo=True, **args)
+    else:
+        init_schema(enj)
+    return enj
+
+
+def set_read_only(enj, config: DbConfig):
+    """
+    Запрещает изменение данных через соединения engine.
+    Для SQLite используется PRAGMA query_only, для MySQL и PostgreSQL
+    режим только для чтения задается для сессии каждого соединения.
+
+    :param enj:
+    :param config:
+    :return:
+    """
+    if is_sqlite(config.dns):
+        set_sqlite_read_only(enj, config)
+        return
+    statement = READ_ONLY_STATEMENTS.get(enj.dialect.name)
+    if statement is None:
+        logger.warning('Режим только для чтения не поддерживается для {}'.format(enj.dialect.name))
+        return
+
+    @event.listens_for(enj, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def prepare_db(config: DbConfig):
+    """
+    Создает базу и обновляет ее схему до запуска процессов приложения,
+    чтобы процессы не выполняли миграцию одновременно
+
+    :param config:
+    :return:
+    """
+    create_engine(config).dispose()
+
+
+def get_pool_args(config: DbConfig) -> dict:
+    if is_memory_sqlite(config.dns):
+        # База в памяти живет в единственном соединении, пул не настраивается
+        return {}
+    return {
+        "pool_size": config.pool_size,
+        "max_overflow": config.max_overflow,
+        "pool_recycle": config.pool_recycle,
+        "pool_pre_ping": config.pool_pre_ping,
+    }
+
+
+def dispose_engines():
+    """
+    Закрывает соединения всех engine текущего процесса
+    """
+    pid = os.getpid()
+    with _engines_lock:
+        keys = [key for key in _engines if key[0] == pid]
+        for key in keys:
+            enj, _ = _engines.pop(key)
+            enj.dispose()
 
 
 class DbManager:
@@ -22,35 +148,31 @@ class DbManager:
         UserOptionsT,
     )
 
-    def __init__(self, config: DbConfig):
+    def __init__(self, config: DbConfig, read_only: bool = False):
+        """
+        :param config:
+        :param read_only: соединения только для чтения, данные изменяет обработчик команд
+        """
         self.config = config
+        self.read_only = read_only
         self.__enj = None
         self.__session = None
-
-    def __get_connection_str(self):
-        return self.config.dns
+        self.auth_cache = AuthCache(config.auth_cache_ttl)
 
     @property
     def engine(self):
-        args = {}
-        connection_str = self.__get_connection_str()
-        if "sqlite" not in self.config.dns:
-            args["poolclass"] = StaticPool
-        try:
-            enj = init_db(connection_str, **args)
-        except OperationalError:
-            create_db(self.__get_connection_str(), self.config.db_name)
-            enj = init_db(connection_str, echo=True, **args)
+        enj, _ = get_engine(self.config, self.read_only)
         return enj
 
     @property
     def session(self):
         if self.__session is None:
-            self.__session = get_session(self.engine)
+            self.__session = self.get_session()
         return self.__session
 
     def get_session(self):
-        return get_session(self.engine)
+        _, session_factory = get_engine(self.config, self.read_only)
+        return session_factory()
 
     def close_session(self):
         if self.__session is None:
@@ -58,6 +180,12 @@ class DbManager:
         self.__session.close()
         self.__session = None
 
+    def begin_transaction(self, session):
+        """
+        Начинает транзакцию сессии, внутри которой используются точки сохранения
+        """
+        begin_transaction(session)
+
     def get_user(self, user_id: str, session=None) -> User:
         close_session = False
         if session is None:
@@ -104,6 +232,71 @@ class DbManager:
         users += [i.user for i in data]
         return users
 
+    def get_notification_client_ids(
+        self, media_id, media_type, season=0, session=None
+    ) -> List[int]:
+        """
+        Возвращает client_id получателей уведомлений по медиа одним запросом:
+        пользователей, добавивших медиа, и пользователей с включенными уведомлениями
+
+        :param media_id: kinopoisk_id
+        :param media_type:
+        :param season:
+        :param session:
+        :return:
+        """
+        if session is None:
+            session = self.session
+        media = self.MediaData.__table__
+        link = table_media_user_add
+        media_users = (
+            select(link.c.user_id)
+            .join(media, media.c.id == link.c.media_id)
+            .where(media.c.kinopoisk_id == str(media_id))
+        )
+        if media_type.value == MediaType.SERIALS.value:
+            serial = self.Serial.__table__
+            media_users = media_users.join(serial, serial.c.id == media.c.id).where(
+                serial.c.season == season
+            )
+        else:
+            media_users = media_users.where(media.c.type == MediaType.FILMS)
+        notified_users = select(self.UserOptionsT.user_id).where(
+            self.UserOptionsT.option == UserOptions.NOTIFICATION,
+            self.UserOptionsT.value == 1,
+        )
+        query = (
+            select(self.User.client_id)
+            .where(or_(self.User.id.in_(media_users), self.User.id.in_(notified_users)))
+            .distinct()
+            .order_by(self.User.client_id)
+        )
+        return list(session.scalars(query))
+
+    def find_client_ids(self, client_ids, session=None) -> List[int]:
+        """
+        Возвращает client_id существующих пользователей из списка одним запросом
+
+        :param client_ids:
+        :param session:
+        :return:
+        """
+        if session is None:
+            session = self.session
+        query = (
+            select(self.User.client_id)
+            .where(self.User.client_id.in_(set(client_ids)))
+            .distinct()
+            .order_by(self.User.client_id)
+        )
+        return list(session.scalars(query))
+
+    def get_all_client_ids(self, session=None) -> List[int]:
+        if session is None:
+            session = self.session
+        query = select(self.User.client_id).distinct().order_by(self.User.client_id)
+        return list(session.scalars(query))
+
     @staticmethod
     def construct_media_by_orm_object(elem: Union[Film, Serial]) -> Optional[MediaData]:
         if elem is None:
@@ -141,11 +334,56 @@ class DbManager:
         return MediaData(**data_dict)
 
     def find_all_media(self, media_type, session=None) -> List[MediaData]:
-        result = []
-        data = self._find_all_media(media_type, session)
-        for elem in data:
-            result.append(self.construct_media_by_orm_object(elem))
-        return result
+        return list(self.iter_all_media(media_type, session))
+
+    def iter_all_media(self, media_type, session=None, chunk_size=500) -> Iterator[MediaData]:
+        """
+        Построчно читает все данные для поиска по типу, без создания ORM объектов
+
+        :param media_type:
+        :param session:
+        :param chunk_size: количество строк, получаемых из базы за раз
+        :return:
+        """
+        if session is None:
+            session = self.session
+        query = (
+            self.select_media(media_type)
+            .where(self.MediaData.status != LockingStatus.ENDED)
+            .execution_options(yield_per=chunk_size)
+        )
+        for row in session.execute(query):
+            yield MediaData.from_row(row)
+
+    def select_media(self, media_type):
+        """
+        Запрос колонок, нужных для MediaData, по типу медиа
+
+        :param media_type:
+        :return:
+        """
+        media = self.MediaData.__table__
+        serial = self.Serial.__table__
+        query = select(
+            media.c.kinopoisk_id,
+            media.c.label,
+            media.c.year,
+            media.c.download_url,
+            media.c.theam_id,
+            media.c.kinopoisk_url,
+            media.c.torrent_id,
+            media.c.type,
+            media.c.status,
+            media.c.img_link,
+            serial.c.season,
+            serial.c.series,
+            serial.c.current_series,
+        ).select_from(media.outerjoin(serial, media.c.id == serial.c.id))
+        if media_type == MediaType.SERIALS:
+            query = query.where(media.c.type == MediaType.SERIALS)
+        elif media_type == MediaType.FILMS:
+            query = query.where(media.c.type == MediaType.FILMS)
+        return query
 
     def _find_all_media(self, media_type, session=None):
         """
@@ -171,8 +409,15 @@ class DbManager:
     def find_media(
         self, kinopoisk_id, media_type, season=None, session=None
     ) -> MediaData:
-        data = self._find_media(kinopoisk_id, media_type, season, session)
-        return self.construct_media_by_orm_object(data)
+        if session is None:
+            session = self.session
+        query = self.select_media(media_type).where(
+            self.MediaData.kinopoisk_id == str(kinopoisk_id)
+        )
+        if media_type == MediaType.SERIALS:
+            query = query.where(self.Serial.__table__.c.season == season)
+        row = session.execute(query.limit(1)).first()
+        return None if row is None else MediaData.from_row(row)
 
     def _find_media(self, kinopoisk_id, media_type, season=None, session=None):
         """
@@ -196,8 +441,16 @@ class DbManager:
     def find_media_by_label(
         self, label, year, media_type, season=None, session=None
     ) -> MediaData:
-        data = self._find_media_by_label(label, year, media_type, season, session)
-        return self.construct_media_by_orm_object(data)
+        if session is None:
+            session = self.session
+        query = self.select_media(media_type).where(
+            self.MediaData.label == label, self.MediaData.year == year
+        )
+        if media_type == MediaType.SERIALS:
+            query = query.where(self.Serial.__table__.c.season == season)
+        row = session.execute(query.limit(1)).first()
+        self.close_session()
+        return None if row is None else MediaData.from_row(row)
 
     def _find_media_by_label(self, label, year, media_type, season=None, session=None):
         """
@@ -255,9 +508,15 @@ class DbManager:
         media_type,
         season: int = 0,
         session=None,
+        commit: bool = True,
         *args,
         **kwargs,
     ):
+        """
+        Обновляет поля медиа
+
+        :param commit: False - изменения остаются в транзакции переданной сессии
+        """
         close = False
         if session is None:
             close = True
@@ -284,7 +543,8 @@ class DbManager:
             setattr(media, key, upd_data[key])
 
         session.add(media)
-        session.commit()
+        if commit:
+            session.commit()
         if close:
             session.close()
 
@@ -351,6 +611,7 @@ class DbManager:
         )
         session.add(user)
         session.commit()
+        self.auth_cache.invalidate(client_id)
         return user
 
     def add_media_to_user_list(
@@ -423,6 +684,23 @@ class MediaData:
 
     """
 
+    __slots__ = (
+        "media_id",
+        "title",
+        "download_url",
+        "torrent_tracker",
+        "theam_id",
+        "season",
+        "year",
+        "kinopoisk_url",
+        "series",
+        "current_series",
+        "torrent_id",
+        "media_type",
+        "status",
+        "img_link",
+    )
+
     def __init__(
         self,
         media_id,
@@ -460,6 +738,51 @@ class MediaData:
     def kinopoisk_id(self):
         return self.media_id
 
+    def __reduce__(self):
+        # Значения передаются в порядке аргументов конструктора, без имен атрибутов
+        return self.__class__, (
+            self.media_id,
+            self.title,
+            self.year,
+            self.download_url,
+            self.torrent_tracker,
+            self.theam_id,
+            self.kinopoisk_url,
+            self.torrent_id,
+            self.media_type,
+            self.status,
+            self.season,
+            self.series,
+            self.current_series,
+            self.img_link,
+        )
+
+    @classmethod
+    def from_row(cls, row) -> "MediaData":
+        """
+        Создает данные по строке запроса DbManager.select_media
+
+        :param row:
+        :return:
+        """
+        is_serial = row.type == MediaType.SERIALS
+        return cls(
+            media_id=row.kinopoisk_id,
+            title=row.label,
+            year=row.year,
+            download_url=row.download_url,
+            torrent_tracker=None,
+            theam_id=row.theam_id,
+            kinopoisk_url=row.kinopoisk_url,
+            torrent_id=row.torrent_id,
+            media_type=MediaType.SERIALS if is_serial else MediaType.FILMS,
+            status=row.status,
+            season=row.season if is_serial else "",
+            series=row.series if row.series is not None else 0,
+            current_series=row.current_series if is_serial else 0,
+            img_link=row.img_link,
+        )
+
 
 if __name__ == "__main__":
     pass
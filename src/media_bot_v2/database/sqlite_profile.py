@@ -0,0 +1,102 @@
+"""
+Настройка соединений SQLite для работы нескольких процессов с одной базой
+
+Parser, Crawler и CommandMessageHandler работают в отдельных процессах.
+В режиме WAL чтение не блокируется записью, а busy_timeout заставляет
+писателя дождаться освобождения базы вместо ошибки "database is locked".
+Записью занимается только обработчик команд, остальные процессы
+открывают соединения только для чтения.
+
+"""
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from media_bot_v2.config import DbConfig
+
+logger = logging.getLogger(__name__)
+
+
+def is_sqlite(dns: str) -> bool:
+    return make_url(dns).get_backend_name() == "sqlite"
+
+
+def is_memory_sqlite(dns: str) -> bool:
+    url = make_url(dns)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def get_pragmas(config: DbConfig) -> list:
+    """
+    Команды PRAGMA, выполняемые при открытии соединения
+
+    :param config:
+    :return: список пар (имя, значение)
+    """
+    pragmas = [("busy_timeout", config.sqlite_busy_timeout)]
+    if config.sqlite_wal:
+        pragmas += [("journal_mode", "WAL"), ("synchronous", config.sqlite_synchronous)]
+    if config.sqlite_mmap_size:
+        pragmas.append(("mmap_size", config.sqlite_mmap_size))
+    return pragmas
+
+
+def apply_sqlite_profile(enj, config: DbConfig):
+    """
+    Выполняет PRAGMA профиля на каждом новом соединении engine.
+    Для базы в памяти профиль не применяется.
+
+    :param enj:
+    :param config:
+    :return:
+    """
+    if not is_sqlite(config.dns) or is_memory_sqlite(config.dns):
+        return
+    pragmas = get_pragmas(config)
+    set_pragmas(enj, pragmas)
+    logger.debug("Профиль SQLite {0}: {1}".format(config.dns, pragmas))
+
+
+def set_read_only(enj, config: DbConfig):
+    """
+    Запрещает изменение данных через новые соединения engine SQLite,
+    уже открытые соединения закрываются.
+
+    :param enj:
+    :param config:
+    :return:
+    """
+    if not is_sqlite(config.dns) or is_memory_sqlite(config.dns):
+        return
+    enj.dispose()
+    set_pragmas(enj, [("query_only", "ON")])
+
+
+def set_pragmas(enj, pragmas: list):
+    @event.listens_for(enj, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute("PRAGMA {0}={1}".format(name, value))
+        finally:
+            cursor.close()
+
+
+def begin_transaction(session):
+    """
+    Явно начинает транзакцию сессии SQLite.
+
+    pysqlite начинает транзакцию только перед изменением данных, поэтому
+    первый SAVEPOINT из Session.begin_nested() оказывается внешним и его
+    RELEASE сразу фиксирует изменения.
+
+    :param session:
+    :return:
+    """
+    connection = session.connection()
+    if not connection.dialect.name == "sqlite":
+        return
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN")
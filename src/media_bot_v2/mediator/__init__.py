@@ -11,8 +11,10 @@
 from .mediator_types.mediator_message import (
     MediatorActionMessage, CommandData,
     ClientData, CrawlerData, ParserData,
-    MediatorMessage)
+    MediatorMessage, MediatorMessageBatch)
 from .mediator_class import AppMediator
+from .message_batcher import MessageBatcher, pack_messages, unpack_messages
+from .shared_blob import SharedBlob, share_blob, load_blob, release_blob
 from .mediator_client import AppMediatorClient, command_message, send_message, parser_message, crawler_message
 
 
@@ -8,7 +8,10 @@ from multiprocessing import Queue
 from queue import Empty
 import logging
 
+from media_bot_v2.app_enums import ComponentType, ActionType
+
 from .abc_mediator_classes import MediatorMessage, Mediator, MediatorClient
+from .message_batcher import pack_messages, unpack_messages
 
 logger = logging.getLogger(__name__)
 
@@ -30,11 +33,13 @@ class AppMediator(Mediator):
         super(AppMediator, self).__init__()
         self.__in_queue = in_queue
         self.__clients = []
+        self.__routes = {}
         for client in clients:
             self.__clients.append({
                 'client_type': client.CLIENT_TYPE,
                 'client': client
             })
+        self.__build_routes()
         logger.debug('Создание объекта посредника для сообщений')
 
     def run(self):
@@ -43,7 +48,7 @@ class AppMediator(Mediator):
             try:
                 message = self.__in_queue.get()
                 logger.debug('Полученно новое сообщение в медиаторе {}'.format(message))
-                self.send_message(message)
+                self.send_messages(unpack_messages(message))
             except Empty:
                 pass
 
@@ -54,15 +59,44 @@ class AppMediator(Mediator):
 
 
         """
-        for d_client in self.__clients:
-            client = d_client['client']
-            # проверка адресации сообщений
-            if not (client.CLIENT_TYPE.value == message.component.value
-                    and message.action.value in [a.value for a in client.CLIENT_ACTIONS]):
-                continue
+        for client in self.__routes.get(route_key(message.component, message.action), ()):
             logger.debug('Сообщение с сервера отправлено для {}'.format(client))
             client.queue.put(message)
 
+    def send_messages(self, messages: List[MediatorMessage]) -> None:
+        """
+
+        посылает список сообщений, сообщения для одного клиента передаются одним пакетом
+
+
+        """
+        batches = {}
+        for message in messages:
+            for client in self.__routes.get(route_key(message.component, message.action), ()):
+                batches.setdefault(client, []).append(message)
+        for client, client_messages in batches.items():
+            logger.debug('{0} сообщений с сервера отправлено для {1}'.format(len(client_messages), client))
+            client.queue.put(pack_messages(client_messages))
+
+    def __build_routes(self):
+        """
+        Перестраивает таблицу маршрутизации (тип компонента, действие) -> клиенты
+
+        Вызывается при каждом изменении списка клиентов, чтобы send_message
+        не перебирал всех клиентов на каждое сообщение.
+        На один ключ может быть подписано несколько клиентов.
+
+        :return:
+        """
+        routes = {}
+        for d_client in self.__clients:
+            client = d_client['client']
+            for action in client.CLIENT_ACTIONS:
+                subscribers = routes.setdefault(route_key(client.CLIENT_TYPE, action), [])
+                if client not in subscribers:
+                    subscribers.append(client)
+        self.__routes = {key: tuple(value) for key, value in routes.items()}
+
     def _get_new_client(self, client: MediatorClient):
         """
         Возвращает новый экземпляр клиента, для перезапуска процесса
@@ -91,17 +125,21 @@ class AppMediator(Mediator):
                 'client_type': new_client.CLIENT_TYPE,
                 'client': new_client
             })
+            self.__build_routes()
 
-    def __set_client(self, new_client: MediatorClient):
+    def __set_client(self, new_client: MediatorClient, old_client: MediatorClient = None):
         """
         Устанавливает нового клиента в список клиентов
 
         :param new_client:
+        :param old_client: заменяемый клиент, если не указан - заменяется первый клиент того же типа
         :return: Bool
         """
         for client in self.__clients:
-            if client['client_type'] == new_client.CLIENT_TYPE:
+            if old_client is None and client['client_type'] == new_client.CLIENT_TYPE \
+                    or old_client is not None and client['client'] is old_client:
                 client['client'] = new_client
+                self.__build_routes()
                 return True
         return False
 
@@ -113,6 +151,10 @@ class AppMediator(Mediator):
     def clients(self):
         return (i['client'] for i in self.__clients)
 
+    @property
+    def routes(self):
+        return self.__routes
+
     def check_clients(self):
         """
 
@@ -126,8 +168,20 @@ class AppMediator(Mediator):
 
                 logger.error('Клиент {} умер, реанимирую...'.format(client.CLIENT_TYPE))
                 try:
-                    client = self._get_new_client(client)
-                    client.start()
-                    self.__set_client(client)
+                    new_client = self._get_new_client(client)
+                    new_client.start()
+                    self.__set_client(new_client, client)
                 except:
                     logger.error('Реанимация клиента {} не удалась...'.format(client.CLIENT_TYPE))
+
+
+def route_key(component: ComponentType, action: ActionType) -> tuple:
+    """
+    Ключ таблицы маршрутизации медиатора.
+    Используются значения перечислений, как и при прежней проверке адресации.
+
+    :param component:
+    :param action:
+    :return:
+    """
+    return component.value, action.value
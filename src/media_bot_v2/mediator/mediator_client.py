@@ -7,6 +7,7 @@ from media_bot_v2.config import Config
 
 from .abc_mediator_classes import MediatorClient, MediatorMessage
 from .mediator_types import mediator_message
+from .message_batcher import MessageBatcher, unpack_messages
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,7 @@ class AppMediatorClient(MediatorClient):
         self.__out_queue = out_queue
         self.__config = config
         self.__listening_thread = None
+        self.__batcher = None
         logger.debug("Создание клиента {}".format(self.CLIENT_TYPE))
 
     def run(self):
@@ -35,17 +37,38 @@ class AppMediatorClient(MediatorClient):
         logger.debug("Клиент {} готов к приему сообщений.".format(self.CLIENT_TYPE))
         while True:
             try:
-                self.handle_message(self.queue.get())
+                messages = unpack_messages(self.queue.get())
             except Empty:
-                pass
-            except Exception as ex:
-                logger.error(
-                    "Error while listning for new message! %s", ex, exc_info=True
-                )
+                continue
+            for message in messages:
+                try:
+                    self.handle_message(message)
+                except Exception as ex:
+                    logger.error(
+                        "Error while listning for new message! %s", ex, exc_info=True
+                    )
 
     def send_message(self, message: MediatorMessage):
         logger.debug("Отправка сообщения. {}".format(str(message)))
-        self.__out_queue.put(message)
+        batcher = self.batcher
+        if batcher is None:
+            self.__out_queue.put(message)
+        else:
+            batcher.put(message)
+
+    @property
+    def batcher(self) -> MessageBatcher | None:
+        """
+        Пакетная отправка сообщений в медиатор, включается настройкой mediator_cfg.batch_window
+        """
+        mediator_cfg = getattr(self.config, "mediator_cfg", None)
+        if mediator_cfg is None or mediator_cfg.batch_window <= 0:
+            return None
+        if self.__batcher is None:
+            self.__batcher = MessageBatcher(
+                self.__out_queue, mediator_cfg.batch_window, mediator_cfg.batch_size
+            )
+        return self.__batcher
 
     def handle_message(self, message: MediatorMessage):
         logger.debug("Полученно новое сообщение. {}".format(message))
@@ -6,4 +6,4 @@
 
 """
 
-from .mediator_message import MediatorActionMessage
+from .mediator_message import MediatorActionMessage, MediatorMessageBatch
@@ -74,6 +74,26 @@ class MediatorActionMessage(MediatorMessage):
         self.__data = value
 
 
+class MediatorMessageBatch:
+    """
+
+    Пакет сообщений, передаваемый через очередь одним объектом
+
+    """
+
+    def __init__(self, messages: list) -> None:
+        self.messages = messages
+
+    def __repr__(self):
+        return "Пакет из {0} сообщений".format(len(self.messages))
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+
 class ClientData(MessageData):
     def __init__(self, user_id, message_text, choices):
         self.user_id = user_id
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Пакетная передача сообщений между клиентами и медиатором
+
+Каждый Queue.put сериализует и передает объект отдельно, поэтому при
+массовой рассылке сообщения выгоднее накапливать и отправлять одним пакетом.
+
+"""
+import logging
+import os
+import threading
+import time
+from multiprocessing import Queue, util
+
+from .abc_mediator_classes import MediatorMessage
+from .mediator_types.mediator_message import MediatorMessageBatch
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBatcher:
+    """
+    Накапливает исходящие сообщения и отправляет их в очередь пакетами
+
+    Пакет отправляется через window секунд после первого сообщения
+    или сразу, как только в нем набралось size сообщений.
+    Сообщения, не отправленные к завершению процесса, отправляются при выходе.
+
+    """
+
+    def __init__(self, out_queue: Queue, window: float, size: int) -> None:
+        self.out_queue = out_queue
+        self.window = window
+        self.size = max(size, 1)
+        self._init_state()
+
+    def _init_state(self):
+        self._messages = []
+        self._sending = False
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def __getstate__(self):
+        # Поток и блокировка не передаются в дочерний процесс
+        return {'out_queue': self.out_queue, 'window': self.window, 'size': self.size}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def put(self, message: MediatorMessage) -> None:
+        """
+        Добавляет сообщение в текущий пакет
+
+        :param message:
+        :return:
+        """
+        with self._condition:
+            self._check_thread()
+            self._messages.append(message)
+            if len(self._messages) == 1 or len(self._messages) >= self.size:
+                self._condition.notify_all()
+
+    def flush(self) -> None:
+        """
+        Немедленно отправляет все накопленные сообщения.
+        Пакет, уже переданный потоку отправки, отправляется первым.
+
+        :return:
+        """
+        with self._condition:
+            while self._sending:
+                self._condition.wait()
+            messages, self._messages = self._messages, []
+        for i in range(0, len(messages), self.size):
+            self.out_queue.put(pack_messages(messages[i:i + self.size]))
+
+    def _check_thread(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        if self._pid is not None:
+            # После fork накопленные сообщения принадлежат родительскому процессу
+            self._messages = []
+        self._pid = pid
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        # Поток отправки фоновый, поэтому остаток сообщений отправляется при выходе из процесса,
+        # до закрытия очередей multiprocessing
+        util.Finalize(self, self.flush, exitpriority=10)
+
+    def _run(self):
+        logger.debug('Запуск потока пакетной отправки сообщений')
+        while True:
+            with self._condition:
+                while not self._messages:
+                    self._condition.wait()
+                deadline = time.monotonic() + self.window
+                while len(self._messages) < self.size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                messages = self._messages[:self.size]
+                self._messages = self._messages[self.size:]
+                self._sending = True
+            try:
+                self.out_queue.put(pack_messages(messages))
+            except Exception as ex:
+                logger.error('Ошибка при отправке пакета сообщений %s', ex, exc_info=True)
+            finally:
+                with self._condition:
+                    self._sending = False
+                    self._condition.notify_all()
+
+
+def pack_messages(messages: list):
+    """
+    Упаковывает список сообщений для передачи через очередь.
+    Единственное сообщение передается как есть.
+
+    :param messages:
+    :return:
+    """
+    if len(messages) == 1:
+        return messages[0]
+    return MediatorMessageBatch(messages)
+
+
+def unpack_messages(message) -> list:
+    """
+    Возвращает список сообщений, полученных из очереди
+
+    :param message: сообщение или пакет сообщений
+    :return:
+    """
+    if isinstance(message, MediatorMessageBatch):
+        return message.messages
+    return [message]
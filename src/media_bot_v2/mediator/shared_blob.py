@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Передача больших двоичных данных в обход очереди медиатора
+
+Данные размещаются в разделяемой памяти, а в сообщении передается только ссылка на них,
+поэтому медиатор не сериализует содержимое torrent файлов при пересылке.
+
+"""
+import logging
+from multiprocessing.shared_memory import SharedMemory
+
+logger = logging.getLogger(__name__)
+
+# Данные меньшего размера дешевле передать в самом сообщении
+SHARED_BLOB_MIN_SIZE = 16 * 1024
+
+
+class SharedBlob:
+    """
+    Ссылка на данные в разделяемой памяти
+
+    """
+
+    def __init__(self, name: str, size: int) -> None:
+        self.name = name
+        self.size = size
+
+    def __repr__(self):
+        return '<SharedBlob name:{0}, size:{1}>'.format(self.name, self.size)
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def create(cls, data: bytes) -> 'SharedBlob':
+        shm = SharedMemory(create=True, size=len(data))
+        try:
+            shm.buf[:len(data)] = data
+            return cls(shm.name, len(data))
+        finally:
+            shm.close()
+
+    def read(self) -> bytes:
+        shm = SharedMemory(name=self.name)
+        try:
+            return bytes(shm.buf[:self.size])
+        finally:
+            shm.close()
+
+    def release(self) -> None:
+        try:
+            shm = SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
+def share_blob(data):
+    """
+    Размещает данные в разделяемой памяти и возвращает ссылку для передачи в сообщении.
+    Небольшие данные и данные, которые не удалось разместить, возвращаются как есть.
+
+    :param data:
+    :return: SharedBlob или исходные данные
+    """
+    if not isinstance(data, (bytes, bytearray)) or len(data) < SHARED_BLOB_MIN_SIZE:
+        return data
+    try:
+        return SharedBlob.create(data)
+    except OSError as ex:
+        logger.error('Не удалось разместить данные в разделяемой памяти {}'.format(ex))
+        return data
+
+
+def load_blob(value):
+    """
+    Возвращает данные по ссылке, либо сами данные, если они переданы в сообщении
+
+    :param value:
+    :return:
+    """
+    if isinstance(value, SharedBlob):
+        return value.read()
+    return value
+
+
+def release_blob(value) -> None:
+    """
+    Освобождает разделяемую память, после того как данные больше не нужны
+
+    :param value:
+    :return:
+    """
+    if isinstance(value, SharedBlob):
+        value.release()
@@ -580,7 +580,7 @@ class DataBaseParser(BaseParser):
 
         result = True
 
-        db = DbManager(self.config.db_cfg)
+        db = DbManager(self.config.db_cfg, read_only=True)
         media_type = MediaType.FILMS if not data['serial'] else MediaType.SERIALS
         session = db.get_session()
         if 'kinopoisk_id' in data.keys():
@@ -643,7 +643,7 @@ class DataBaseParser(BaseParser):
             return False, self.next_data
         error = False
 
-        db = DbManager(self.config.db_cfg)
+        db = DbManager(self.config.db_cfg, read_only=True)
         media_type = data['media_type']
         session = db.get_session()
 
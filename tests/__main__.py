@@ -6,7 +6,7 @@ from unittest.suite import TestSuite
 from tests.testmediator import TestMediator
 from tests.testdb import TestDB
 from tests.testparser import TestParser
-from tests.testcrawler import TestCrawler, TestCrawlerWeb
+from tests.testcrawler import TestCrawler, TestTrackers, TestCrawlerWeb
 from tests.testclient import TestClientCache, TestCommandParser
 from tests.testcommandhandler import TestCommandHandler
 
@@ -29,6 +29,7 @@ def suite():
                 TestDB(),
                 TestParser(),
                 TestCrawler(),
+                TestTrackers(),
                 TestCommandHandler(),
                 # TestCrawlerWeb(),
                 TestClientCache(),
@@ -0,0 +1,61 @@
+-- Схема базы до появления индексов и serial.kinopoisk_id
+CREATE TABLE users (
+	id INTEGER NOT NULL, 
+	name VARCHAR(200), 
+	last_name VARCHAR(200), 
+	nick_name VARCHAR(200), 
+	client_id INTEGER NOT NULL, 
+	PRIMARY KEY (id)
+);
+CREATE TABLE media (
+	id INTEGER NOT NULL, 
+	label VARCHAR(400) NOT NULL, 
+	year INTEGER NOT NULL, 
+	status VARCHAR(12), 
+	type VARCHAR(10), 
+	download_url VARCHAR(500), 
+	theam_id VARCHAR(500), 
+	exsists_in_plex BOOLEAN, 
+	kinopoisk_id VARCHAR(20), 
+	kinopoisk_url VARCHAR(400), 
+	torrent_id VARCHAR(100), 
+	img_link VARCHAR(500), 
+	PRIMARY KEY (id)
+);
+CREATE TABLE media_user_add (
+	user_id INTEGER, 
+	media_id INTEGER, 
+	FOREIGN KEY(user_id) REFERENCES users (id), 
+	FOREIGN KEY(media_id) REFERENCES media (id)
+);
+CREATE TABLE user_options (
+	id INTEGER NOT NULL, 
+	option VARCHAR(12) NOT NULL, 
+	value INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE TABLE film (
+	id INTEGER NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(id) REFERENCES media (id)
+);
+CREATE TABLE serial (
+	id INTEGER NOT NULL, 
+	season SMALLINT NOT NULL, 
+	series SMALLINT, 
+	current_series SMALLINT, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(id) REFERENCES media (id)
+);
+INSERT INTO users (id, client_id) VALUES (1, 1);
+INSERT INTO media (id, label, year, status, type, kinopoisk_id) VALUES (1, 'Игра', 1997, 'IN_PROGRESS', 'FILMS', '12198');
+INSERT INTO film (id) VALUES (1);
+INSERT INTO media (id, label, year, status, type, kinopoisk_id) VALUES (2, 'Игра престолов', 2011, 'IN_PROGRESS', 'SERIALS', '464963');
+INSERT INTO serial (id, season, series, current_series) VALUES (2, 1, 10, 0);
+INSERT INTO media (id, label, year, status, type, kinopoisk_id) VALUES (3, 'Игра престолов', 2011, 'ENDED', 'SERIALS', '464963');
+INSERT INTO serial (id, season, series, current_series) VALUES (3, 2, 10, 10);
+INSERT INTO media_user_add (user_id, media_id) VALUES (1, 1);
+INSERT INTO media_user_add (user_id, media_id) VALUES (1, 2);
+INSERT INTO media_user_add (user_id, media_id) VALUES (1, 3);
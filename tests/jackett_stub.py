@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Локальная заглушка Jackett, отдающая сохраненный ответ Torznab API из fixtures.
+
+"""
+
+import pathlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from media_bot_v2.config import JackettConfig
+
+FIXTURES = pathlib.Path(__file__).parent / 'fixtures'
+SEARCH_PATH = '/api/v2.0/indexers/all/results/torznab/api'
+TORRENT_DATA = b'd4:infod4:name4:testee'
+
+
+class JackettStub(ThreadingHTTPServer):
+    """
+    HTTP сервер Torznab API с проверкой ключа api и искусственной задержкой ответа
+
+    """
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.05, api_key: str = 'key'):
+        super(JackettStub, self).__init__(('127.0.0.1', 0), JackettHandler)
+        self.delay = delay
+        self.api_key = api_key
+        self.requests = 0
+        self.queries = []
+        self.search_page = (FIXTURES / 'jackett_search.xml').read_text('utf-8')
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class JackettHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.server.requests += 1
+        time.sleep(self.server.delay)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.startswith('/dl/magnet/'):
+            # Индексатор отдает раздачу только magnet ссылкой
+            self.send_response(302)
+            self.send_header('Location', 'magnet:?xt=urn:btih:0123456789abcdef0123456789abcdef01234567')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif url.path.startswith('/dl/'):
+            self.send_body(200, TORRENT_DATA, 'application/x-bittorrent')
+        elif not url.path == SEARCH_PATH:
+            self.send_error(404)
+        elif query.get('apikey') != [self.server.api_key]:
+            self.send_body(401, b'<error code="100" description="Invalid API Key" />', 'application/xml')
+        else:
+            self.server.queries.append(query)
+            page = self.server.search_page.format(url=self.server.url, api_key=self.server.api_key)
+            self.send_body(200, page.encode('utf-8'), 'application/rss+xml; charset=utf-8')
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def get_stub_jackett_config(stub: JackettStub, **kwargs) -> JackettConfig:
+    host, port = stub.server_address
+    return JackettConfig(host='http://{}'.format(host), port=port, api_key=stub.api_key, **kwargs)
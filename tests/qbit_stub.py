@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Локальная заглушка Web API qBittorrent (API до версии 4.1, как у python-qbittorrent).
+
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from media_bot_v2.config import HttpApiConfig
+
+
+class QBitStub(ThreadingHTTPServer):
+    """
+    HTTP сервер с авторизацией по cookie SID и искусственной задержкой ответа
+
+    """
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.005, user='admin', password='admin'):
+        super(QBitStub, self).__init__(('127.0.0.1', 0), QBitHandler)
+        self.delay = delay
+        self.user = user
+        self.password = password
+        self.sessions = set()
+        self.requests = 0
+        self.logins = 0
+        self.torrents = {}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def expire_sessions(self):
+        with self.lock:
+            self.sessions.clear()
+
+    def add_torrent(self, torrent_hash, progress=0.0, size=1000):
+        self.torrents[torrent_hash] = {'hash': torrent_hash, 'progress': progress, 'size': size}
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class QBitHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not self.start_request():
+            return
+        if url.path == '/query/preferences':
+            self.send_json({})
+        elif url.path == '/query/torrents':
+            hashes = parse_qs(url.query).get('hashes', [''])[0].split('|')
+            self.send_json([t for h, t in self.server.torrents.items() if h in hashes])
+        else:
+            self.send_body(404, b'')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/login':
+            self.login(parse_qs(body.decode('utf-8')))
+            return
+        if not self.start_request():
+            return
+        if self.path == '/command/upload':
+            self.send_body(200, b'')
+        else:
+            self.send_body(404, b'')
+
+    def start_request(self) -> bool:
+        with self.server.lock:
+            self.server.requests += 1
+            authorized = self.get_sid() in self.server.sessions
+        time.sleep(self.server.delay)
+        if not authorized:
+            self.send_body(403, b'Forbidden')
+        return authorized
+
+    def login(self, form):
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.logins += 1
+        time.sleep(self.server.delay)
+        if form.get('username') != [self.server.user] or form.get('password') != [self.server.password]:
+            self.send_body(200, b'Fails.')
+            return
+        sid = uuid.uuid4().hex
+        with self.server.lock:
+            self.server.sessions.add(sid)
+        self.send_body(200, b'Ok.', {'Set-Cookie': 'SID={}; path=/'.format(sid)})
+
+    def get_sid(self):
+        for part in self.headers.get('Cookie', '').split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == 'SID':
+                return value
+        return None
+
+    def send_json(self, data):
+        self.send_body(200, json.dumps(data).encode('utf-8'), {'Content-Type': 'application/json'})
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def get_stub_client_config(conf, stub: QBitStub):
+    """
+    Копия настроек приложения с qBittorrent, указывающим на заглушку
+    """
+    host, port = stub.server_address
+    torrent_client = conf.torrent_client.model_copy(update={
+        'type': 2,
+        'qbit_torrent': HttpApiConfig(user=stub.user, password=stub.password, host=host, port=port),
+    })
+    return conf.model_copy(update={'torrent_client': torrent_client})
@@ -1,9 +1,12 @@
 from unittest import TestCase, TextTestRunner, defaultTestLoader
 
+from sqlalchemy import event
+
 from tests.utils import TestEnvCreator
 
 from media_bot_v2 import app_enums
-from media_bot_v2.mediator import command_message
+from media_bot_v2.command_handler.commandhandler_class import AbstractHandler, AddDataHandler
+from media_bot_v2.mediator import command_message, send_message
 
 
 class TestCommandHandler(TestCase):
@@ -206,6 +209,129 @@ class TestCommandHandler(TestCase):
 
         self.assertIn(str(film.kinopoisk_id), [a.kinopoisk_id for a in user.media.all()], 'Фильм не добавлен пользователю')
 
+    def test_update_media_batch(self):
+        media_ids = ['12345678', '87654321']
+        for media_id in media_ids:
+            self.test_context.add_test_film(
+                self.db.session,
+                **{
+                    'client_id': self.test_context.admin_id,
+                    'kinopoisk_id': media_id,
+                    'label': 'Тест {}'.format(media_id),
+                    'year': 1999,
+                    'url': 'http://test1'
+                }
+            )
+
+        messages = [
+            command_message(
+                app_enums.ComponentType.CRAWLER,
+                app_enums.ClientCommands.UPDATE_MEDIA,
+                {
+                    'media_id': media_id,
+                    'media_type': app_enums.MediaType.FILMS,
+                    'upd_data': {'label': 'Новое {}'.format(media_id)},
+                    'next_messages': [send_message(
+                        app_enums.ComponentType.CRAWLER, {'user_id': 1, 'message_text': media_id, 'choices': []}
+                    )],
+                },
+                self.test_context.admin_id
+            )
+            for media_id in media_ids + ['404']
+        ]
+
+        commits = []
+
+        def on_commit(connection):
+            commits.append(connection)
+
+        db_manager = self.test_handler.db_manager
+        event.listen(db_manager.engine, 'commit', on_commit)
+        result = AddDataHandler.update_media_batch([i.data for i in messages], db_manager, self.test_context.conf)
+        event.remove(db_manager.engine, 'commit', on_commit)
+
+        self.assertEqual(len(commits), 1, 'Обновления выполнены не одной транзакцией')
+        self.assertEqual(len(result), 2, 'Ответы сформированы не для каждой выполненной команды')
+        for media_id in media_ids:
+            media = self.db.find_media(media_id, app_enums.MediaType.FILMS)
+            self.assertEqual(media.title, 'Новое {}'.format(media_id), 'Наименование не изменилось.')
+
+    def test_update_media_batch_error(self):
+        media_ids = ['12345678', '55555555', '87654321']
+        for media_id in media_ids:
+            self.test_context.add_test_film(
+                self.db.session,
+                **{
+                    'client_id': self.test_context.admin_id,
+                    'kinopoisk_id': media_id,
+                    'label': 'Тест {}'.format(media_id),
+                    'year': 1999,
+                    'url': 'http://test1'
+                }
+            )
+
+        # Вторая команда нарушает NOT NULL уже после изменения объекта
+        upd_data = [{'label': 'Новое 12345678'}, {'year': 2001, 'label': None}, {'label': 'Новое 87654321'}]
+        messages = [
+            command_message(
+                app_enums.ComponentType.CRAWLER,
+                app_enums.ClientCommands.UPDATE_MEDIA,
+                {
+                    'media_id': media_id,
+                    'media_type': app_enums.MediaType.FILMS,
+                    'upd_data': data,
+                    'next_messages': [send_message(
+                        app_enums.ComponentType.CRAWLER, {'user_id': 1, 'message_text': media_id, 'choices': []}
+                    )],
+                },
+                self.test_context.admin_id
+            )
+            for media_id, data in zip(media_ids, upd_data)
+        ]
+
+        def fail_commit(connection):
+            raise OSError('Диск заполнен')
+
+        db_manager = self.test_handler.db_manager
+        event.listen(db_manager.engine, 'commit', fail_commit)
+        with self.assertRaises(OSError):
+            AddDataHandler.update_media_batch([i.data for i in messages], db_manager, self.test_context.conf)
+        event.remove(db_manager.engine, 'commit', fail_commit)
+        self.assertEqual(
+            self.db.find_media('12345678', app_enums.MediaType.FILMS).title, 'Тест 12345678',
+            'Точки сохранения не должны фиксировать изменения до конца пакета.'
+        )
+
+        result = AddDataHandler.update_media_batch([i.data for i in messages], db_manager, self.test_context.conf)
+
+        self.assertEqual([m.data.message_text for m in result], ['12345678', '87654321'])
+        self.assertEqual(self.db.find_media('12345678', app_enums.MediaType.FILMS).title, 'Новое 12345678')
+        self.assertEqual(self.db.find_media('87654321', app_enums.MediaType.FILMS).title, 'Новое 87654321')
+        failed = self.db.find_media('55555555', app_enums.MediaType.FILMS)
+        self.assertEqual(
+            (failed.title, failed.year), ('Тест 55555555', 1999), 'Изменения ошибочной команды должны откатываться.'
+        )
+
+    def test_check_rule_cache(self):
+        db_manager = self.test_handler.db_manager
+        cache = db_manager.auth_cache
+        new_user_id = 54321
+
+        self.assertFalse(AbstractHandler.check_rule(new_user_id, db_manager))
+        self.assertFalse(AbstractHandler.check_rule(new_user_id, db_manager))
+        self.assertEqual(cache.metrics()['hits'], 0, 'Отказ не должен кэшироваться')
+
+        # Пользователь добавлен через другой DbManager, кэш обработчика не сброшен
+        self.db.add_user(new_user_id, 'Al', 'Al', 'Al')
+        self.assertTrue(AbstractHandler.check_rule(new_user_id, db_manager), 'Добавленный пользователь не получил доступ')
+        self.assertTrue(AbstractHandler.check_rule(new_user_id, db_manager))
+        self.assertEqual(cache.metrics()['hits'], 1, 'Повторная проверка не взята из кэша')
+
+        cache.ttl = 0
+        cache.invalidate()
+        AbstractHandler.check_rule(new_user_id, db_manager)
+        self.assertIsNone(cache.get(new_user_id), 'Запись сохранена при выключенном кэше')
+
     def tearDown(self):
         self.test_context.clear_test_db()
 
@@ -1,11 +1,33 @@
-from unittest import TestCase, TextTestRunner, defaultTestLoader
+from unittest import TestCase, TextTestRunner, defaultTestLoader, mock
+import hashlib
+import re
+import tempfile
+import threading
 import time
+from types import SimpleNamespace
 
-from tests.utils import TestEnvCreator
+import bencodepy
+import requests
 
-from media_bot_v2.mediator import CrawlerData, crawler_message
-from media_bot_v2.app_enums import ActionType, ComponentType, MediaType, ClientCommands
-from media_bot_v2.crawler.Workers.utils import MediaTask
+from tests.utils import TestEnvCreator
+from tests.tracker_stub import StubRutor, StubRutracker, TrackerStub, get_stub_config, get_stub_trackers
+from tests.qbit_stub import QBitStub, get_stub_client_config
+from tests.jackett_stub import JackettStub, TORRENT_DATA, get_stub_jackett_config
+
+from media_bot_v2.database import MediaData
+from media_bot_v2.mediator import CrawlerData, SharedBlob, crawler_message, release_blob
+from media_bot_v2.app_enums import ActionType, ComponentType, MediaType, ClientCommands, TorrentType
+from media_bot_v2.crawler.job_queue import JobQueue
+from media_bot_v2.crawler.Workers import BulkSearchWorker, DownloadWorker
+from media_bot_v2.crawler.Workers.WorkerABC import ResultQueue, Worker
+from media_bot_v2.crawler.Workers.TorrentClientWorker import QBitTorrent, TorrentWorker
+from media_bot_v2.crawler.Workers.client_pool import ClientPool, ClientUnavailableError
+from media_bot_v2.crawler.Workers.torrent_match import TorrentMatcher
+from media_bot_v2.crawler.Workers.torrent_watcher import TorrentWatcher
+from media_bot_v2.crawler.Workers.utils import MediaTask, MediaTaskGroup
+from media_bot_v2.crawler.Workers.TorrentTrackers import Jacker, Torrent, Trackers, rate_limiter
+from media_bot_v2.crawler.Workers.jasket_api import JackettError
+from media_bot_v2.config import MatchConfig
 
 
 class TestCrawler(TestCase):
@@ -48,15 +70,623 @@ class TestCrawler(TestCase):
             CrawlerData(self.client_id, film.kinopoisk_url, film.media_type)
         )
 
-        self.crawler.jobs.append(job_CHECK)
+        self.crawler.jobs.put(job_CHECK)
         self.crawler.add_workers()
 
         self.assertTrue(len(self.crawler.active_workers) == 1, 'Не добавился процесс воркер.')
 
+    def test_check_all_job_group(self):
+        message = crawler_message(ComponentType.MAIN_APP, self.client_id, {}, ActionType.CHECK)
+        jobs = self.crawler.db_handler.get_job_list(message)
+
+        self.assertEqual(len(jobs), 1, 'Задачи поиска должны объединяться в группу.')
+        self.assertIsInstance(jobs[0], MediaTaskGroup)
+        self.assertEqual(len(jobs[0]), 9)
+        self.assertIsInstance(self.crawler.get_worker(jobs[0]), BulkSearchWorker)
+
+    def test_wake_on_events(self):
+        message = crawler_message(ComponentType.CLIENT, self.client_id, {}, ActionType.CHECK_FILMS)
+        self.crawler.add_jobs(message)
+        self.assertTrue(self.crawler.wake_event.is_set(), 'Новая задача не пробудила основной поток.')
+
+        self.crawler.wake_event.clear()
+        worker = Worker(self.crawler.jobs.get(), self.conf)
+        with mock.patch.object(self.crawler, 'get_worker', return_value=worker):
+            self.crawler.add_thread(worker.job)
+        worker.process.result()
+        self.assertTrue(worker.ended)
+        self.assertTrue(self.crawler.wake_event.is_set(), 'Завершение воркера не пробудило основной поток.')
+
+        self.crawler.update_worker_status()
+        self.assertEqual(self.crawler.active_workers, [])
+
+    def test_worker_timeout(self):
+        release = threading.Event()
+
+        self.addCleanup(release.set)
+
+        class BlockedWorker(Worker):
+            def get_target(self):
+                def work():
+                    self.returned_data.put('found')
+                    release.wait()
+                return work
+
+            @property
+            def result(self):
+                data = []
+                while not self.returned_data.empty():
+                    data.append(self.returned_data.get())
+                return data
+
+        self.conf.crawler_cfg.job_timeout = 0.05
+        message = crawler_message(ComponentType.CLIENT, self.client_id, {}, ActionType.CHECK_FILMS)
+        self.crawler.add_jobs(message)
+        worker = BlockedWorker(self.crawler.jobs.get(), self.conf)
+        with mock.patch.object(self.crawler, 'get_worker', return_value=worker):
+            self.crawler.add_thread(worker.job)
+        time.sleep(0.1)
+
+        self.crawler.update_worker_status()
+        self.assertEqual(self.crawler.active_workers, [], 'Зависший воркер не снят по таймауту.')
+        self.assertEqual(self.crawler.messages, ['found'], 'Результат просроченного воркера потерян.')
+        release.set()
+        worker.process.result()
+
+    def test_stalled_workers(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        class BlockedWorker(Worker):
+            def get_target(self):
+                return release.wait
+
+        def job(media_id):
+            media = MediaData(media_id, 'Игра', 1997, '', None, '', '', None, MediaType.FILMS, None)
+            return MediaTask(ActionType.CHECK, self.client_id, media, CrawlerData(self.client_id, media_id))
+
+        self.conf.crawler_cfg.job_timeout = 0.05
+        for media_id in range(self.conf.crawler_cfg.workers + 1):
+            self.crawler.jobs.put(job(media_id), ComponentType.CLIENT)
+        with mock.patch.object(self.crawler, 'get_worker', side_effect=lambda j: BlockedWorker(j, self.conf)):
+            self.crawler.add_workers()
+            workers, pending = len(self.crawler.active_workers), len(self.crawler.jobs)
+            self.assertGreater(pending, 0)
+            time.sleep(0.1)
+
+            self.crawler.update_worker_status()
+            self.crawler.add_workers()
+            self.assertEqual(self.crawler.active_workers, [])
+            self.assertEqual(len(self.crawler.stalled_workers), workers)
+            self.assertEqual(len(self.crawler.jobs), pending, 'Задача не должна ждать потока, занятого зависшим воркером.')
+
+            release.set()
+            for worker in self.crawler.stalled_workers:
+                worker.process.result()
+            self.crawler.update_worker_status()
+            self.crawler.add_workers()
+        self.assertEqual(self.crawler.stalled_workers, [])
+        self.assertEqual(
+            len(self.crawler.active_workers), min(workers, pending), 'Освободившиеся потоки должны снова использоваться.'
+        )
+        for worker in self.crawler.active_workers:
+            worker.process.result()
+            self.assertIsNotNone(worker.started_at)
+
+    def test_torrent_watcher(self):
+        calls = []
+        progress = {'a': 10, 'b': 10, 'c': 50}
+
+        class FakeClient(TorrentWorker):
+            @classmethod
+            def connect(cls, config):
+                return cls
+
+            @classmethod
+            def get_torrents_information(cls, client, torrent_ids):
+                calls.append(sorted(torrent_ids))
+                return {
+                    i: {'progress': progress[i], 'total_done': progress[i], 'total_size': 100}
+                    for i in torrent_ids
+                }
+
+        def job(torrent_id, force=False):
+            media = MediaData(1, 'Игра', 1997, '', None, '', '', torrent_id, MediaType.FILMS, None)
+            return MediaTask(
+                ActionType.ADD_TORRENT_WATCHER, self.client_id, media, CrawlerData(self.client_id, 1, force=force)
+            )
+
+        watcher = TorrentWatcher(self.conf, client_class=FakeClient)
+        watcher.add(job('a'))
+        watcher.add(job('b'))
+        watcher.add(job('c', force=True))
+
+        watcher.poll()
+        self.assertEqual(calls, [['a', 'b', 'c']], 'Состояние раздач должно запрашиваться одним обращением.')
+        self.assertEqual(len(watcher.result), 3, 'Не отправлено первое состояние раздач.')
+        self.assertEqual(len(watcher), 2, 'Раздача с force должна сниматься с наблюдения.')
+
+        progress['a'] = 100
+        watcher.poll()
+        messages = watcher.result
+        self.assertEqual(len(messages), 2, 'Не отправлены сообщения о завершении загрузки.')
+        self.assertEqual(messages[0].data.command, ClientCommands.UPDATE_PLEX_LIB)
+        self.assertEqual(len(watcher), 1)
+
+        self.conf.crawler_cfg.watch_timeout = 0
+        watcher.poll()
+        self.assertEqual(watcher.result, [])
+        self.assertEqual(len(watcher), 0, 'Наблюдение не прекращено по времени.')
+
+    def test_torrent_watcher_force(self):
+        progress = {'a': 10}
+
+        class FakeClient(TorrentWorker):
+            @classmethod
+            def connect(cls, config):
+                return cls
+
+            @classmethod
+            def get_torrents_information(cls, client, torrent_ids):
+                return {i: {'progress': progress[i], 'total_done': progress[i], 'total_size': 100} for i in torrent_ids}
+
+        def job(force=False):
+            media = MediaData(1, 'Игра', 1997, '', None, '', '', 'a', MediaType.FILMS, None)
+            return MediaTask(
+                ActionType.ADD_TORRENT_WATCHER, self.client_id, media, CrawlerData(self.client_id, 1, force=force)
+            )
+
+        watcher = TorrentWatcher(self.conf, client_class=FakeClient)
+        watcher.add(job())
+        watcher.poll()
+        self.assertEqual(len(watcher.result), 1)
+
+        # Запрос прогресса кнопкой не должен прерывать наблюдение за той же раздачей
+        watcher.add(job(force=True))
+        watcher.poll()
+        self.assertEqual(len(watcher.result), 1, 'Нет ответа на запрос прогресса.')
+        self.assertEqual(len(watcher), 1)
+
+        progress['a'] = 100
+        watcher.poll()
+        messages = watcher.result
+        self.assertEqual(len(messages), 2, 'Не отправлены сообщения о завершении загрузки.')
+        self.assertEqual(messages[0].data.command, ClientCommands.UPDATE_PLEX_LIB)
+        self.assertEqual(len(watcher), 0)
+
+    def test_torrent_watcher_unavailable(self):
+        class FakeClient(TorrentWorker):
+            @classmethod
+            def connect(cls, config):
+                raise ConnectionError('Клиент недоступен')
+
+        media = MediaData(1, 'Игра', 1997, '', None, '', '', 'a', MediaType.FILMS, None)
+        watcher = TorrentWatcher(self.conf, client_class=FakeClient)
+        watcher.add(MediaTask(ActionType.ADD_TORRENT_WATCHER, self.client_id, media, CrawlerData(self.client_id, 1)))
+
+        watcher.poll()
+        self.assertEqual(len(watcher), 1)
+
+        self.conf.crawler_cfg.watch_timeout = 0
+        watcher.poll()
+        self.assertEqual(watcher.result, [])
+        self.assertEqual(len(watcher), 0, 'Наблюдение должно прекращаться по времени и при недоступном клиенте.')
+
+    def test_torrent_client_pool(self):
+        with QBitStub(delay=0) as stub:
+            stub.add_torrent('a', progress=0.5)
+            config = get_stub_client_config(self.conf, stub)
+            pool = ClientPool(QBitTorrent, config, 2)
+
+            def get_information(client):
+                return QBitTorrent.get_torrents_information(client, ['a', 'b'])
+
+            for _ in range(5):
+                information = pool.call(get_information)
+            self.assertEqual(information, {'a': {'progress': 50, 'total_done': 500, 'total_size': 1000}})
+            self.assertEqual(stub.logins, 1, 'Авторизация должна выполняться один раз.')
+
+            stub.expire_sessions()
+            pool.call(get_information)
+            self.assertEqual(stub.logins, 2, 'После истечения сессии нужна повторная авторизация.')
+            self.assertEqual(pool.metrics()['connects'], 1, 'При истечении сессии подключение не пересоздается.')
+            self.assertEqual(pool.metrics()['reauths'], 1)
+
+            stub.password = 'changed'
+            stub.expire_sessions()
+            with self.assertRaises(ClientUnavailableError):
+                pool.call(get_information)
+            self.assertEqual(pool.metrics()['idle'], 0, 'Неавторизованное подключение осталось в пуле.')
+
+    def test_best_match(self):
+        def torrent(label, pier, size=8.0, files=1, kinopoisk_id=326, sound=('RUSSIAN',), resolution='1080', ad=False):
+            return Torrent(
+                label, '', size, '', '', pier, resolution, label, files, kinopoisk_id, '', list(sound), [], ad
+            )
+
+        media = MediaData(326, 'Побег из Шоушенка', 2015, '', None, '', '', None, MediaType.FILMS, None)
+        job = MediaTask(ActionType.CHECK, self.client_id, media, CrawlerData(self.client_id, 326))
+        data = [
+            torrent('seeders', 90, resolution='720'),
+            torrent('big', 500, size=40.0),
+            torrent('files', 400, files=12),
+            torrent('english', 300, sound=('ENGLISH',)),
+            torrent('ad', 200, ad=True),
+            torrent('other', 100, kinopoisk_id=1),
+            torrent('best', 50),
+        ]
+
+        matcher = TorrentMatcher()
+        self.assertEqual([t.label for t in matcher.best_match(data, job)], ['seeders', 'best'])
+
+        candidates = {c.torrent.label: c for c in matcher.rank(data, job)}
+        self.assertEqual(candidates['big'].rejected, ['размер 40.0 ГБ вне 3.5-15 ГБ'])
+        self.assertEqual(candidates['english'].rejected, ['нет русской озвучки'])
+        self.assertEqual(candidates['other'].rejected, ['kinopoisk_id 1 не совпадает с 326'])
+        explain = matcher.explain(data, job)
+        self.assertIn('отклонена: раздача с рекламой ad', explain)
+        self.assertIn('подходит best', explain)
+
+        matcher = TorrentMatcher(MatchConfig(resolution_weight=10))
+        self.assertEqual([t.label for t in matcher.best_match(data, job)], ['best', 'seeders'])
+
+        self.assertIsNone(matcher.best_match(data[1:3], job), 'Неподходящая раздача нового фильма.')
+        media.year = 1994
+        self.assertEqual(len(matcher.best_match(data[1:3], job)), 2, 'Для старого фильма предлагаются все раздачи.')
+
+    def test_job_queue(self):
+        def job(action, media_id, season=0, client_id=self.client_id):
+            media = MediaData(media_id, 'Игра', 1997, '', None, '', '', None, MediaType.SERIALS, None, season)
+            return MediaTask(action, client_id, media, CrawlerData(client_id, media_id))
+
+        queue = JobQueue()
+        queue.put(job(ActionType.CHECK, 1, 1), ComponentType.MAIN_APP)
+        queue.put(job(ActionType.CHECK, 2, 1), ComponentType.MAIN_APP)
+        queue.put(job(ActionType.CHECK, 1, 2), ComponentType.MAIN_APP)
+        queue.put(job(ActionType.FORCE_CHECK, 3), ComponentType.CLIENT)
+        queue.put(job(ActionType.CHECK, 2, 1), ComponentType.CLIENT)
+
+        self.assertEqual(len(queue), 4, 'Повторная задача не объединена с ожидающей.')
+        order = [(i.action_type, i.media_id, i.season) for i in iter(queue.get, None)]
+        self.assertEqual(order, [
+            (ActionType.FORCE_CHECK, '3', 0),
+            (ActionType.CHECK, '2', 1),
+            (ActionType.CHECK, '1', 1),
+            (ActionType.CHECK, '1', 2),
+        ])
+        metrics = queue.metrics()
+        self.assertEqual((metrics['added'], metrics['collapsed'], metrics['taken']), (5, 1, 4))
+        self.assertGreaterEqual(metrics['max_wait'], metrics['avg_wait'])
+
+        queue.put(job(ActionType.FORCE_CHECK, 3), ComponentType.CLIENT)
+        queue.put(job(ActionType.FORCE_CHECK, 3, client_id=2), ComponentType.CLIENT)
+        self.assertEqual(
+            [i.client_id for i in iter(queue.get, None)], [self.client_id, 2],
+            'Задачи разных пользователей не должны объединяться.'
+        )
+
+    def test_job_queue_torrent(self):
+        def job(torrent_id):
+            media = MediaData(1, 'Игра', 1997, '', None, '', '', None, MediaType.FILMS, None)
+            crawler_data = CrawlerData(
+                self.client_id, 1, torrent_id=torrent_id, torrent_data=SharedBlob.create(torrent_id.encode() * 100)
+            )
+            return MediaTask(ActionType.ADD_TORRENT_TO_TORRENT_CLIENT, self.client_id, media, crawler_data)
+
+        queue = JobQueue()
+        first, other, repeated = job('a'), job('b'), job('a')
+        for item in (first, other, repeated):
+            queue.put(item, ComponentType.CRAWLER)
+
+        self.assertEqual(len(queue), 2, 'Разные torrent файлы одного медиа не должны объединяться.')
+        with self.assertRaises(FileNotFoundError, msg='Разделяемая память замененной задачи не освобождена.'):
+            first.crawler_data.torrent_data.read()
+        self.assertEqual([i.crawler_data.torrent_data.read()[:1] for i in iter(queue.get, None)], [b'b', b'a'])
+        for item in (other, repeated):
+            release_blob(item.crawler_data.torrent_data)
+
     def tearDown(self):
         self.test_context.clear_test_db()
 
 
+class TestTrackers(TestCase):
+
+    def setUp(self):
+        self.stub = TrackerStub(delay=0)
+        self.stub.__enter__()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def search(self, **kwargs):
+        config = get_stub_config(self.tmp_dir.name, **kwargs)
+        with mock.patch.object(Trackers, 'get_trackers', lambda conf: get_stub_trackers(conf, self.stub.url)):
+            return Trackers.search(config, 'Игра престолов 2011 сезон 1')
+
+    def test_search(self):
+        torrents = self.search(max_connections=8)
+
+        self.assertEqual(len(torrents), 32, 'Не все раздачи найдены.')
+        self.assertEqual(self.stub.requests, 42, 'Страница каждой темы должна загружаться один раз.')
+        self.assertEqual(
+            [t.tracker for t in torrents],
+            [TorrentType.RUTOR] * 16 + [TorrentType.RUTRACKER] * 16,
+            'Нарушен порядок результатов поиска.'
+        )
+        self.assertTrue(all(t.sound == ['RUSSIAN', 'ENGLISH'] for t in torrents), 'Не определен звук.')
+        self.assertTrue(all(t.kinopoisk_id == 944947 for t in torrents), 'Не определен imdb id.')
+
+    def test_html_parser(self):
+        torrents = self.search(theam_cache_ttl=0)
+        soup_torrents = self.search(theam_cache_ttl=0, html_parser='bs4')
+
+        self.assertEqual(len(torrents), 32)
+        self.assertEqual(
+            [vars(t) for t in torrents], [vars(t) for t in soup_torrents],
+            'Разбор lxml должен совпадать с разбором BeautifulSoup.'
+        )
+
+    def test_theam_cache(self):
+        torrents = self.search()
+        self.assertEqual(self.stub.requests, 42)
+
+        self.assertEqual(
+            [vars(t) for t in self.search()], [vars(t) for t in torrents],
+            'Данные из кэша отличаются от данных страниц тем.'
+        )
+        self.assertEqual(self.stub.requests, 44, 'Страницы тем должны браться из кэша.')
+
+        # Новый процесс загружает кэш из файла, устаревшие записи проверяются по ETag
+        for tracker in get_stub_trackers(get_stub_config(self.tmp_dir.name), self.stub.url):
+            tracker.theam_cache.ttl = 0
+            for entry in tracker.theam_cache.entries.values():
+                self.assertIsNotNone(entry['etag'], 'Не сохранен ETag страницы темы.')
+            with mock.patch.object(Trackers, 'get_trackers', lambda conf: [tracker]):
+                Trackers.search(tracker.config, 'Игра престолов 2011 сезон 1')
+        self.assertEqual(self.stub.not_modified, 40, 'Устаревшие записи кэша должны проверяться по ETag.')
+
+    def test_theam_error(self):
+        self.stub.errors = {
+            '/rutor//torrent/660000/igra-prestolov_game-of-thrones-s01-2011': 503,
+            '/rutor//torrent/660017/igra-prestolov_game-of-thrones-s01-2011': 403,
+        }
+        self.assertEqual(len(self.search(max_retries=0)), 30, 'Ошибка темы не должна прерывать поиск.')
+        self.assertEqual(self.stub.errors, {})
+
+        self.assertEqual(len(self.search(max_retries=0)), 32, 'Страница ошибки не должна кэшироваться.')
+        self.assertEqual(self.stub.requests, 46)
+
+    def test_rate_limiter(self):
+        config = get_stub_config(self.tmp_dir.name)
+        limiter = rate_limiter.get_rate_limiter(self.stub.url, config)
+        self.assertIs(
+            rate_limiter.get_rate_limiter('{}/rutracker/tracker.php'.format(self.stub.url), config), limiter,
+            'Ограничитель должен быть общим для домена.'
+        )
+        before = limiter.metrics
+
+        self.stub.throttle = 5
+        torrents = self.search()
+        self.assertEqual(len(torrents), 32, 'После ответов 429 запросы должны повторяться.')
+
+        metrics = rate_limiter.rate_limit_metrics()[limiter.domain]
+        self.assertEqual(metrics['throttled'] - before['throttled'], 5)
+        self.assertEqual(metrics['requests'] - before['requests'], 47)
+
+        limiter = rate_limiter.DomainRateLimiter('example.com', rate=100, burst=5, max_backoff=1)
+        start = time.monotonic()
+        for _ in range(25):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19, 'Не соблюдается частота запросов.')
+
+        with self.assertRaises(ValueError):
+            get_stub_config(self.tmp_dir.name, requests_per_second=0)
+
+    def test_rate_limiter_timeout(self):
+        self.stub.delay = 0.5
+        config = get_stub_config(self.tmp_dir.name, request_timeout=0.05)
+        limiter = rate_limiter.get_rate_limiter(self.stub.url, config)
+        errors = limiter.metrics['errors']
+        with self.assertRaises(requests.Timeout):
+            rate_limiter.RateLimitedSession(config).get('{}/rutor/'.format(self.stub.url))
+        self.assertEqual(limiter.metrics['errors'] - errors, 1, 'Таймаут должен приостанавливать запросы к домену.')
+
+    def test_bulk_search(self):
+        def task(media_id, season):
+            media = SimpleNamespace(
+                media_id=media_id, title='Игра престолов', year=2011, season=season, media_type=MediaType.SERIALS
+            )
+            return MediaTask(ActionType.CHECK, 1, media, CrawlerData(1, 0))
+
+        tasks = [task(944947, 1), task(1, 1), task(944947, 2)]
+        config = get_stub_config(self.tmp_dir.name, theam_cache_ttl=0)
+        worker = BulkSearchWorker(MediaTaskGroup(ActionType.CHECK, 1, tasks), config)
+        with mock.patch.object(Trackers, 'get_trackers', lambda conf: get_stub_trackers(conf, self.stub.url)):
+            worker.work()
+
+        self.assertEqual(self.stub.requests, 84, 'Одинаковые запросы должны выполняться один раз.')
+        messages = worker.result
+        self.assertEqual(len(messages), 2, 'Результат должен раздаваться задачам группы.')
+        self.assertEqual(
+            [m.data.message_text for m in messages],
+            [
+                'Уточни какой именно торрент стоит скачать по запросу {} (звук, качество и т.д.).'.format(t.text_query)
+                for t in (tasks[0], tasks[2])
+            ]
+        )
+
+    def test_bulk_search_partial(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def task(title):
+            media = SimpleNamespace(media_id=1, title=title, year=2011, season='', media_type=MediaType.FILMS)
+            return MediaTask(ActionType.FORCE_CHECK, 1, media, CrawlerData(1, 0))
+
+        class SlowTracker:
+            site_name = 'slow'
+
+            def search(self, text):
+                if text.startswith('Второй'):
+                    release.wait()
+                return []
+
+        tasks = [task('Первый'), task('Второй')]
+        worker = BulkSearchWorker(MediaTaskGroup(ActionType.FORCE_CHECK, 1, tasks), get_stub_config(self.tmp_dir.name))
+        with mock.patch.object(Trackers, 'get_search_trackers', lambda conf: [SlowTracker()]):
+            thread = threading.Thread(target=worker.work)
+            thread.start()
+            messages = []
+            for _ in range(100):
+                messages += worker.result
+                if messages:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(len(messages), 1, 'Результат выполненного запроса не отдан до конца обхода.')
+            self.assertTrue(thread.is_alive())
+            release.set()
+            thread.join()
+        self.assertEqual(len(worker.result), 1)
+
+    def test_topic_changed(self):
+        info = {
+            b'name': b'Game.of.Thrones.S01',
+            b'piece length': 16384,
+            b'pieces': b'0' * 20,
+            b'files': [{b'length': 1, b'path': [b'e01.mkv']}, {b'length': 1, b'path': [b'e02.mkv']}],
+        }
+        info_hash = hashlib.sha1(bencodepy.encode(info)).hexdigest()
+        body, encoding = self.stub.pages['/rutor//torrent/']
+        self.stub.pages['/rutor//torrent/'] = (
+            re.sub(rb'btih:[0-9a-f]{40}', b'btih:' + info_hash.encode(), body), encoding
+        )
+        self.stub.pages['/rutor/download/'] = (bencodepy.encode({b'info': info}), encoding)
+
+        theam_url = '{}/rutor//torrent/660000'.format(self.stub.url)
+        config = get_stub_config(self.tmp_dir.name)
+        with mock.patch.object(Trackers, 'get_trackers', lambda conf: get_stub_trackers(conf, self.stub.url)):
+            self.assertTrue(Trackers.topic_changed(config, theam_url, 2), 'Тема без сохраненной раздачи.')
+            self.assertEqual(self.stub.requests, 0)
+
+            data = Trackers.download(config, '{}/rutor/download/660000'.format(self.stub.url), theam_url)
+            self.assertEqual(data['file_amount'], 2)
+
+            self.assertFalse(Trackers.topic_changed(config, theam_url, 2), 'Раздача не изменилась.')
+            self.assertFalse(Trackers.topic_changed(config, theam_url, 2), 'Раздача не изменилась.')
+            self.assertEqual(self.stub.not_modified, 1, 'Тема должна проверяться условным запросом.')
+            self.assertTrue(Trackers.topic_changed(config, theam_url, 1), 'Не учтено количество серий.')
+
+            self.stub.errors = {'/rutor//torrent/660000': 403}
+            self.assertTrue(Trackers.topic_changed(config, theam_url, 2), 'При ошибке темы torrent файл скачивается.')
+            self.assertEqual(self.stub.errors, {})
+
+            self.stub.pages['/rutor//torrent/'] = (body, encoding)
+            self.assertTrue(Trackers.topic_changed(config, theam_url, 2), 'Не обнаружена новая раздача.')
+
+    def test_torrent_meta(self):
+        info = {
+            b'name': 'Игра престолов S01'.encode(),
+            b'piece length': 16384,
+            b'pieces': b'e:' * 1000,
+            b'files': [
+                {b'length': 1, b'path': [b'Season 1', 'Серия 1.mkv'.encode()]},
+                {b'length': 2, b'path': [b'Season 1', b'e02.avi'], b'attr': b'x'},
+                {b'length': 3, b'path': [b'Subs', b'e01.srt']},
+                {b'length': 4, b'path': [b'\xff\xfe.MKV']},
+            ],
+        }
+        details = Trackers.get_torrent_details({'data': bencodepy.encode({b'info': info, b'z': [1, {}]}), 'id': '1'})
+        self.assertEqual(details['file_amount'], 2)
+        self.assertEqual(details['id'], '1')
+        self.assertEqual(details['info_hash'], hashlib.sha1(bencodepy.encode(info)).hexdigest())
+
+        single = {b'name': b'film.mkv', b'length': 1, b'piece length': 1, b'pieces': b''}
+        self.assertEqual(Trackers.get_torrent_details({'data': bencodepy.encode({b'info': single})})['file_amount'], 1)
+
+        for data in (b'', b'<html></html>', bencodepy.encode({b'info': info})[:-50], None):
+            self.assertEqual(Trackers.get_torrent_details({'data': data})['file_amount'], 0)
+
+    def test_tracker_registry(self):
+        registry = Trackers.TrackerRegistry()
+        config = get_stub_config(self.tmp_dir.name)
+
+        trackers = registry.get_trackers(config)
+        self.assertIs(registry.get_trackers(config)[0], trackers[0], 'Трекеры должны переиспользоваться.')
+        self.assertIs(
+            registry.get_trackers(get_stub_config(self.tmp_dir.name))[1], trackers[1],
+            'Трекеры должны переиспользоваться для одинаковых настроек.'
+        )
+        self.assertIsNot(
+            registry.get_trackers(get_stub_config(self.tmp_dir.name, max_connections=1))[0], trackers[0],
+            'Для других настроек нужны отдельные трекеры.'
+        )
+
+    def test_jackett_search(self):
+        with JackettStub(delay=0) as jackett:
+            config = get_stub_config(self.tmp_dir.name, jackett_cfg=get_stub_jackett_config(jackett))
+            self.assertEqual(
+                [t.site_name for t in Trackers.get_search_trackers(config)], ['jackett'],
+                'Jackett должен заменять трекеры при поиске.'
+            )
+
+            torrents = Trackers.search(config, 'Игра престолов 2011 сезон 1')
+            self.assertEqual(jackett.requests, 1, 'Поиск должен выполняться одним запросом.')
+            self.assertEqual(jackett.queries[0]['cat'], ['5000'])
+            self.assertEqual(len(torrents), 2, 'Раздачи без разрешения и только с magnet ссылкой должны отбрасываться.')
+
+            rutracker, rutor = torrents
+            self.assertEqual(
+                (rutracker.pier, rutracker.size, rutracker.file_amount, rutracker.kinopoisk_id, rutracker.resolution),
+                (120, 10.0, 10, 944947, '1080')
+            )
+            self.assertEqual(rutracker.sound, ['RUSSIAN'])
+            self.assertEqual(rutracker.theam_url, 'https://rutracker.org/forum/viewtopic.php?t=3718208')
+            self.assertEqual((rutor.pier, rutor.file_amount, rutor.kinopoisk_id), (48, 10, 944947))
+            self.assertEqual(rutor.file_name, 'a1b2c3d4e5f60718293a4b5c6d7e8f9012345678.torrent')
+            self.assertEqual(rutor.sound, [])
+
+            data = Trackers.download(config, rutracker.url, rutracker.theam_url)
+            self.assertEqual(data['data'], TORRENT_DATA)
+            self.assertEqual(data['id'], 'Game+of+Thrones+S01')
+
+            magnet_url = '{}/dl/magnet/?file=Game+of+Thrones+S01'.format(jackett.url)
+            self.assertIsNone(Trackers.download(config, magnet_url), 'По magnet ссылке нет torrent файла.')
+            media = SimpleNamespace(media_id=944947, media_type=MediaType.FILMS, download_url=magnet_url)
+            worker = DownloadWorker(
+                MediaTask(ActionType.DOWNLOAD_TORRENT, 1, media, CrawlerData(1, 944947)),
+                SimpleNamespace(tracker_cfg=config)
+            )
+            worker.returned_data = ResultQueue()
+            worker.work()
+            self.assertEqual(worker.result, [], 'Нескачанный torrent файл не должен передаваться клиенту.')
+
+            config = get_stub_config(
+                self.tmp_dir.name, jackett_cfg=get_stub_jackett_config(jackett, replace_trackers=False)
+            )
+            self.assertEqual(
+                [t.site_name for t in Trackers.get_search_trackers(config)], ['jackett', 'rutor', 'rutracker']
+            )
+
+            jackett.api_key = 'other'
+            with self.assertRaises(JackettError):
+                Jacker(config).search('Игра престолов 2011')
+
+    def test_jackett_download(self):
+        self.stub.pages['/rutracker/dl.php'] = (TORRENT_DATA, 'utf-8')
+        with JackettStub(delay=0) as jackett, \
+                mock.patch.object(Trackers, 'tracker_registry', Trackers.TrackerRegistry()), \
+                mock.patch.object(Trackers, 'Rutor', lambda conf: StubRutor(conf, self.stub.url)), \
+                mock.patch.object(Trackers, 'Rutracker', lambda conf: StubRutracker(conf, self.stub.url)):
+            config = get_stub_config(self.tmp_dir.name, jackett_cfg=get_stub_jackett_config(jackett))
+
+            # Раздачи, найденные до включения Jackett, скачиваются с трекера
+            data = Trackers.download(config, '{}/rutracker/dl.php?t=3718208'.format(self.stub.url))
+            self.assertEqual(data['data'], TORRENT_DATA)
+            self.assertEqual(jackett.requests, 0)
+
+    def tearDown(self):
+        self.stub.__exit__()
+        self.tmp_dir.cleanup()
+
+
 class TestCrawlerWeb(TestCase):
 
     def setUp(self):
@@ -75,7 +705,7 @@ class TestCrawlerWeb(TestCase):
 
     def exec_task(self, task):
 
-        self.crawler.jobs.append(task)
+        self.crawler.jobs.put(task)
         self.crawler.add_workers()
         start = time.time()
         while len(self.crawler.active_workers) > 0:
@@ -222,6 +852,7 @@ class TestCrawlerWeb(TestCase):
 def suite():
     return defaultTestLoader.loadTestsFromTestCase((
         TestCrawler,
+        TestTrackers,
         TestCrawlerWeb
     )
     )
@@ -1,10 +1,22 @@
 from unittest import TestCase, TextTestRunner, defaultTestLoader
 import os
+import pathlib
+import sqlite3
+import tempfile
+
+import sqlalchemy
+from sqlalchemy import inspect
 
 from tests.utils import TestEnvCreator
-from media_bot_v2.database import MediaData
+from media_bot_v2.config import DbConfig
+from media_bot_v2.database import DbManager, MediaData, dispose_engines
+from media_bot_v2.database.alch_db import init_db
+from media_bot_v2.database.alch_db.migrations import migrate
+from media_bot_v2.database.alch_db.model import Base
 from media_bot_v2.app_enums import MediaType, UserOptions, LockingStatus
 
+FIXTURES = pathlib.Path(__file__).parent / 'fixtures'
+
 
 class TestDB(TestCase):
     def setUp(self):
@@ -335,6 +347,179 @@ class TestDB(TestCase):
         self.assertIn(admin, users, 'Не найден пользователь, который должен быть в выборке')
         self.assertIn(test_user, users, 'Не найден пользователь, который должен быть в выборке')
 
+    def test_find_all_media(self):
+        session = self.db.get_session()
+        self.add_test_user(self.client_id, session)
+        self.add_test_film(session, client_id=self.client_id, kinopoisk_id=1, label='Игра', year=1997, url='ru/kinop')
+        self.add_test_serial(
+            session, client_id=self.client_id, kinopoisk_id=2, label='Игра', year=2011, season=1, url='ru/kinop', series=10
+        )
+        self.add_test_serial(
+            session, client_id=self.client_id, kinopoisk_id=2, label='Игра', year=2011, season=2, url='ru/kinop'
+        )
+        self.db.update_media_params(2, {'status': LockingStatus.ENDED}, MediaType.SERIALS, season=2, session=session)
+
+        def as_dict(elem):
+            return {key: getattr(elem, key) for key in MediaData.__slots__ if not key == 'torrent_tracker'}
+
+        expected = [
+            as_dict(self.db.construct_media_by_orm_object(m))
+            for m in self.db._find_all_media(MediaType.BASE_MEDIA, session)
+        ]
+        media = self.db.find_all_media(MediaType.BASE_MEDIA, session)
+        self.assertFalse(hasattr(media[0], '__dict__'), 'Данные должны храниться в слотах.')
+        self.assertEqual([as_dict(m) for m in media], expected, 'Данные отличаются от данных ORM объектов.')
+        self.assertEqual(len(media), 2, 'Завершенные данные не должны попадать в выборку.')
+
+        self.assertEqual(len(self.db.find_all_media(MediaType.SERIALS, session)), 1)
+        self.assertEqual([m.media_type for m in self.db.iter_all_media(MediaType.FILMS, session)], [MediaType.FILMS])
+        self.assertEqual(self.db.find_media(2, MediaType.SERIALS, 2, session).status, LockingStatus.ENDED)
+        self.assertIsNone(self.db.find_media(1, MediaType.SERIALS, 1, session))
+        session.close()
+
+    def test_shared_engine(self):
+        another_db = DbManager(self.conf.db_cfg)
+
+        self.assertIs(another_db.engine, self.db.engine, 'Engine должен быть общим для процесса.')
+        self.assertEqual(self.db.engine.pool.size(), self.conf.db_cfg.pool_size, 'Не применены настройки пула.')
+
+        session = another_db.get_session()
+        self.add_test_user(self.client_id, session)
+        session.close()
+        self.assertIsNotNone(self.db.find_user(self.client_id), 'Данные не видны через другой DbManager.')
+        self.db.close_session()
+
+    def test_sqlite_profile(self):
+        reader = DbManager(self.conf.db_cfg, read_only=True)
+        self.add_test_user(self.client_id, self.db.session)
+        self.db.close_session()
+
+        with reader.engine.connect() as connection:
+            self.assertEqual(connection.exec_driver_sql('PRAGMA journal_mode').scalar(), 'wal')
+            self.assertEqual(
+                connection.exec_driver_sql('PRAGMA busy_timeout').scalar(), self.conf.db_cfg.sqlite_busy_timeout
+            )
+        self.assertIsNotNone(reader.find_user(self.client_id), 'Данные не видны через соединение для чтения.')
+
+        session = reader.get_session()
+        with self.assertRaises(sqlalchemy.exc.OperationalError):
+            self.add_test_user(self.anather_client_id, session)
+        session.close()
+
+    def test_migration(self):
+        with tempfile.TemporaryDirectory() as tmp_path:
+            db_path = pathlib.Path(tmp_path) / 'old.db'
+            with sqlite3.connect(db_path) as connection:
+                connection.executescript((FIXTURES / 'schema_v1.sql').read_text(encoding='utf-8'))
+                connection.execute(
+                    "INSERT INTO media (id, label, year, status, type, kinopoisk_id) "
+                    "VALUES (4, 'Дубль', 2011, 'IN_PROGRESS', 'SERIALS', '1')"
+                )
+                connection.execute("INSERT INTO serial (id, season) VALUES (4, 1)")
+                connection.execute(
+                    "INSERT INTO media (id, label, year, status, type, kinopoisk_id) "
+                    "VALUES (5, 'Дубль', 2011, 'IN_PROGRESS', 'SERIALS', '1')"
+                )
+                connection.execute("INSERT INTO serial (id, season) VALUES (5, 1)")
+            connection.close()
+            config = DbConfig(dns='sqlite:///{}'.format(db_path), db_name='old', admin_id='1')
+
+            with self.assertLogs('media_bot_v2.database.alch_db.migrations', 'ERROR'):
+                init_db(config.dns).dispose()
+            insp = inspect(sqlalchemy.create_engine(config.dns))
+            self.assertNotIn('uq_serial_kinopoisk_id_season', {ix['name'] for ix in insp.get_indexes('serial')})
+
+            with sqlite3.connect(db_path) as connection:
+                connection.execute('DELETE FROM serial WHERE id = 5')
+                connection.execute('DELETE FROM media WHERE id = 5')
+            connection.close()
+            # Повторный запуск дозавершает миграцию и ничего не ломает
+            init_db(config.dns).dispose()
+            enj = init_db(config.dns)
+
+            insp = inspect(enj)
+            self.assertIn('kinopoisk_id', {column['name'] for column in insp.get_columns('serial')})
+            self.assertEqual(
+                {ix['name']: ix['unique'] for ix in insp.get_indexes('serial')},
+                {'uq_serial_kinopoisk_id_season': 1}
+            )
+            self.assertTrue({'ix_media_kinopoisk_id', 'ix_media_status'} <= {ix['name'] for ix in insp.get_indexes('media')})
+            self.assertIn('ix_users_client_id', {ix['name'] for ix in insp.get_indexes('users')})
+            self.assertIn('ix_user_options_option_value', {ix['name'] for ix in insp.get_indexes('user_options')})
+            enj.dispose()
+
+            db = DbManager(config)
+            serial = db.find_media(464963, MediaType.SERIALS, 2)
+            self.assertEqual(serial.current_series, 10, 'Не найден сериал из старой базы.')
+            session = db.get_session()
+            with self.assertRaises(sqlalchemy.exc.IntegrityError):
+                db.add_serial(1, 464963, 'Игра престолов', 2011, 1, '', session=session)
+            session.close()
+            dispose_engines()
+
+    def test_read_only_schema(self):
+        with tempfile.TemporaryDirectory() as tmp_path:
+            db_path = pathlib.Path(tmp_path) / 'old.db'
+            with sqlite3.connect(db_path) as connection:
+                connection.executescript((FIXTURES / 'schema_v1.sql').read_text(encoding='utf-8'))
+            connection.close()
+            config = DbConfig(dns='sqlite:///{}'.format(db_path), db_name='old', admin_id='1')
+
+            reader = DbManager(config, read_only=True)
+            insp = inspect(reader.engine)
+            self.assertNotIn(
+                'kinopoisk_id', {column['name'] for column in insp.get_columns('serial')},
+                'Engine только для чтения не должен изменять схему.'
+            )
+            dispose_engines()
+
+    def test_migration_race(self):
+        with tempfile.TemporaryDirectory() as tmp_path:
+            db_path = pathlib.Path(tmp_path) / 'old.db'
+            with sqlite3.connect(db_path) as connection:
+                connection.executescript((FIXTURES / 'schema_v1.sql').read_text(encoding='utf-8'))
+                connection.execute('DELETE FROM serial')
+            connection.close()
+
+            # Другой процесс успевает выполнить то же изменение схемы между проверкой и изменением
+            other = sqlite3.connect(db_path, isolation_level=None)
+
+            def race(conn, cursor, statement, parameters, context, executemany):
+                if statement.lstrip().startswith(('ALTER TABLE', 'CREATE INDEX', 'CREATE UNIQUE INDEX')):
+                    other.execute(statement)
+
+            enj = sqlalchemy.create_engine('sqlite:///{}'.format(db_path))
+            sqlalchemy.event.listen(enj, 'before_cursor_execute', race)
+            migrate(enj, Base.metadata)
+            other.close()
+
+            insp = inspect(enj)
+            self.assertIn('kinopoisk_id', {column['name'] for column in insp.get_columns('serial')})
+            self.assertIn('uq_serial_kinopoisk_id_season', {ix['name'] for ix in insp.get_indexes('serial')})
+            enj.dispose()
+
+    def test_notification_client_ids(self):
+        session = self.db.get_session()
+        for client_id in (self.client_id, self.anather_client_id, 3, 4):
+            self.add_test_user(client_id, session=session)
+        self.db.change_user_option(4, UserOptions.NOTIFICATION, 1, session=session)
+
+        self.add_test_serial(
+            session=session, client_id=self.anather_client_id, kinopoisk_id=1, label='Игра', year=1988,
+            season=1, url='ru/kinop'
+        )
+        self.add_test_serial(
+            session=session, client_id=3, kinopoisk_id=1, label='Игра', year=1988, season=2, url='ru/kinop'
+        )
+        self.add_test_film(session=session, client_id=self.client_id, kinopoisk_id=1, label='Игра', year=1988, url='')
+
+        self.assertEqual(self.db.get_notification_client_ids(1, MediaType.SERIALS, 1, session), [2, 4])
+        self.assertEqual(self.db.get_notification_client_ids(1, MediaType.SERIALS, 2, session), [3, 4])
+        self.assertEqual(self.db.get_notification_client_ids(1, MediaType.FILMS, session=session), [1, 4])
+        self.assertEqual(self.db.find_client_ids([4, 2, 2, 99], session), [2, 4])
+        self.assertEqual(self.db.get_all_client_ids(session), [1, 2, 3, 4])
+        session.close()
+
     def tearDown(self):
         self.test_content.clear_test_db()
 
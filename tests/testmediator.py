@@ -1,3 +1,4 @@
+import multiprocessing
 from queue import Empty
 from unittest import TestCase, TextTestRunner, defaultTestLoader
 from media_bot_v2.mediator import *
@@ -34,6 +35,80 @@ class TestMediator(TestCase):
         except Empty:
             self.assertTrue(False, 'Сообщение не дошло до клиента')
 
+    def test_routes(self):
+        key = (ComponentType.CLIENT.value, ActionType.SEND_MESSAGE.value)
+        self.assertEqual(self.mediator.routes[key], (self.test_client,), 'Клиент не попал в таблицу маршрутизации')
+
+        new_client = self.test_content.get_client(ComponentType.CLIENT)
+        self.mediator.add_client(new_client)
+        self.assertEqual(self.mediator.routes[key], (new_client,), 'Таблица маршрутизации не обновилась')
+
+    def test_send_message_fan_out(self):
+        clients = [self.test_content.get_client(ComponentType.CLIENT) for _ in range(2)]
+        mediator = AppMediator(self.test_content.mediator_q, clients)
+
+        msg = MediatorActionMessage(ComponentType.CLIENT, ActionType.SEND_MESSAGE, ComponentType.CLIENT)
+        msg.data = ClientData(1, 'test', [])
+        mediator.send_message(message=msg)
+
+        for client in clients:
+            try:
+                client.queue.get(timeout=3)
+            except Empty:
+                self.assertTrue(False, 'Сообщение не дошло до одного из клиентов')
+
+    def test_batch_messages(self):
+        batcher = MessageBatcher(self.mediator.in_queue, 0.5, 10)
+        for i in range(3):
+            msg = MediatorActionMessage(ComponentType.CLIENT, ActionType.SEND_MESSAGE, ComponentType.CLIENT)
+            msg.data = ClientData(i, 'test', [])
+            batcher.put(msg)
+
+        try:
+            batch = self.mediator.in_queue.get(timeout=3)
+        except Empty:
+            self.assertTrue(False, 'Пакет сообщений не дошел до медиатора')
+        messages = unpack_messages(batch)
+        self.assertEqual([m.data.user_id for m in messages], [0, 1, 2], 'Сообщения не объединены в пакет')
+
+        self.mediator.send_messages(messages)
+        try:
+            batch = self.test_client.queue.get(timeout=3)
+        except Empty:
+            self.assertTrue(False, 'Пакет сообщений не дошел до клиента')
+        self.assertEqual(len(unpack_messages(batch)), 3, 'Сообщения для клиента не объединены в пакет')
+
+    def test_batch_flush_on_exit(self):
+        batcher = MessageBatcher(self.mediator.in_queue, 60, 10)
+
+        def client_process():
+            msg = MediatorActionMessage(ComponentType.CLIENT, ActionType.SEND_MESSAGE, ComponentType.CLIENT)
+            msg.data = ClientData(1, 'test', [])
+            batcher.put(msg)
+
+        process = multiprocessing.get_context('fork').Process(target=client_process)
+        process.start()
+        try:
+            batch = self.mediator.in_queue.get(timeout=3)
+        except Empty:
+            self.assertTrue(False, 'Накопленные сообщения потеряны при завершении процесса')
+        process.join()
+        self.assertEqual([m.data.user_id for m in unpack_messages(batch)], [1])
+
+    def test_shared_blob(self):
+        data = bytes(range(256)) * 1024
+        blob = share_blob(data)
+
+        self.assertIsInstance(blob, SharedBlob, 'Данные не размещены в разделяемой памяти')
+        msg = crawler_message(ComponentType.CRAWLER, 1, {'torrent_data': blob}, ActionType.ADD_TORRENT_TO_TORRENT_CLIENT)
+        self.test_client.send_message(message=msg)
+        received = self.mediator.in_queue.get(timeout=3)
+
+        self.assertEqual(load_blob(received.data.torrent_data), data, 'Данные из разделяемой памяти искажены')
+        release_blob(received.data.torrent_data)
+        self.assertRaises(FileNotFoundError, blob.read)
+        self.assertEqual(share_blob(b'small'), b'small', 'Небольшие данные должны передаваться в сообщении')
+
     def tearDown(self):
         self.test_content.clear_test_db()
         print('Test end')
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Локальная заглушка трекеров, отдающая сохраненные html страницы из fixtures.
+
+"""
+
+import hashlib
+import pathlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from media_bot_v2.config import AuthCfg, TorrentTrackersConfig
+from media_bot_v2.crawler.Workers.TorrentTrackers.Trackers import Rutor, Rutracker
+
+FIXTURES = pathlib.Path(__file__).parent / 'fixtures'
+
+ROUTES = [
+    # (часть пути, файл, кодировка)
+    ('/rutor/search/', 'rutor_search.html', 'utf-8'),
+    ('/rutor//torrent/', 'rutor_theam.html', 'utf-8'),
+    ('/rutracker/tracker.php', 'rutracker_search.html', 'windows-1251'),
+    ('/rutracker/viewtopic.php', 'rutracker_theam.html', 'windows-1251'),
+]
+
+
+class TrackerStub(ThreadingHTTPServer):
+    """
+    HTTP сервер с искусственной задержкой ответа, имитирующей сетевые издержки
+
+    """
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.05):
+        super(TrackerStub, self).__init__(('127.0.0.1', 0), StubHandler)
+        self.delay = delay
+        self.requests = 0
+        self.not_modified = 0
+        # Количество следующих запросов, на которые ответить 429
+        self.throttle = 0
+        # Статусы ошибок, которые один раз вернуть на запрос пути
+        self.errors = {}
+        self.pages = {prefix: ((FIXTURES / name).read_bytes(), encoding) for prefix, name, encoding in ROUTES}
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.server.requests += 1
+        time.sleep(self.server.delay)
+        if self.server.throttle > 0:
+            self.server.throttle -= 1
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        status = self.server.errors.pop(self.path, None)
+        if status is not None:
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        for prefix, (body, encoding) in self.server.pages.items():
+            if self.path.startswith(prefix):
+                etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+                if self.headers.get('If-None-Match') == etag:
+                    self.server.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'text/html; charset={}'.format(encoding))
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubRutor(Rutor):
+
+    def __init__(self, config, url):
+        super(StubRutor, self).__init__(config)
+        self.url = url
+
+    @property
+    def site_domain(self):
+        return '{}/rutor'.format(self.url)
+
+
+class StubRutracker(Rutracker):
+
+    def __init__(self, config, url):
+        super(StubRutracker, self).__init__(config)
+        self.url = url
+        self._film_forums = '7'
+        self._serial_forums = '189'
+
+    def login(self):
+        return True
+
+    @property
+    def site_domain(self):
+        return '{}/rutracker'.format(self.url)
+
+
+def get_stub_config(tmp_path, **kwargs) -> TorrentTrackersConfig:
+    # Локальную заглушку не нужно защищать от частых запросов
+    kwargs.setdefault('requests_per_second', 1000)
+    kwargs.setdefault('requests_burst', 100)
+    return TorrentTrackersConfig(
+        tmp_path=tmp_path,
+        credentials={'rutracker': AuthCfg(user_name='user', password='password')},
+        **kwargs
+    )
+
+
+def get_stub_trackers(config, url) -> list:
+    return [StubRutor(config, url), StubRutracker(config, url)]
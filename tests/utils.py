@@ -6,7 +6,7 @@ import pathlib
 
 from media_bot_v2.app.logging import configure_logger
 from media_bot_v2.config import read_config
-from media_bot_v2.database import DbManager
+from media_bot_v2.database import DbManager, dispose_engines
 from media_bot_v2.app_enums import ComponentType
 from media_bot_v2.mediator import AppMediator
 from media_bot_v2.parser import Parser
@@ -42,8 +42,11 @@ class TestEnvCreator:
     def db(self):
         if self._db is None:
             test_db_path = pathlib.Path("test_db.db")
-            if test_db_path.exists():
-                os.remove(test_db_path)
+            # Соединения общего engine держат открытым удаляемый файл базы
+            dispose_engines()
+            for path in (test_db_path, test_db_path.with_name('test_db.db-wal'), test_db_path.with_name('test_db.db-shm')):
+                if path.exists():
+                    os.remove(path)
             test_db_path.touch(exist_ok=True)
             self._db = DbManager(self.conf.db_cfg)
         return self._db